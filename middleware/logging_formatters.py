@@ -0,0 +1,89 @@
+import json
+import logging
+import time
+
+try:
+    import orjson
+except ImportError:  # the stdlib encoder is used when orjson is not installed
+    orjson = None
+
+from project.settings import correlation_id_var
+
+# Set by QueueStreamHandler when a record changes threads, since the listener thread
+# cannot see the request's ContextVar.
+CONTEXT_CORRELATION_ATTR = '_context_correlation_id'
+
+STANDARD_ATTRS = frozenset(logging.LogRecord('', 0, '', 0, '', (), None).__dict__) | {
+    'message', 'asctime', 'taskName', CONTEXT_CORRELATION_ATTR,
+}
+
+_stdlib_encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=str).encode
+
+
+def dumps(payload):
+    if orjson is not None:
+        return orjson.dumps(payload, default=str).decode()
+    return _stdlib_encode(payload)
+
+
+def record_correlation_id(record):
+    """An explicit `correlation_id` extra wins, then the ContextVar seen when the record was made."""
+    fields = record.__dict__
+    if fields.get('correlation_id') is not None:
+        return fields['correlation_id']
+    if CONTEXT_CORRELATION_ATTR in fields:
+        return fields[CONTEXT_CORRELATION_ATTR]
+    return correlation_id_var.get()
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record.
+
+    `fields` is the logger's schema: those record attributes are always emitted, as null
+    when a record lacks them, so no filter has to patch defaults in. `static` adds constant
+    keys, and `include_extra` also emits any other `extra=` attribute (for loggers without
+    a fixed schema). Values are encoded by a real JSON encoder (orjson when installed), so
+    quotes and newlines in messages are escaped.
+    """
+
+    def __init__(self, fields=(), static=None, include_extra=False):
+        super().__init__()
+        self.fields = tuple(fields)
+        self.static = dict(static or {})
+        self.include_extra = include_extra
+        self.reserved = STANDARD_ATTRS | {'timestamp', 'level', 'logger', 'correlation_id'} | set(self.static)
+        self._second = (None, '')
+
+    def timestamp(self, created):
+        seconds = int(created)
+        cached_second, prefix = self._second
+        if seconds != cached_second:
+            prefix = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(seconds))
+            self._second = (seconds, prefix)
+        return f"{prefix}.{int((created - seconds) * 1000):03d}Z"
+
+    def format(self, record):
+        fields = record.__dict__
+        payload = {
+            "timestamp": self.timestamp(record.created),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "correlation_id": record_correlation_id(record),
+            **self.static,
+        }
+        for name in self.fields:
+            payload[name] = fields.get(name)
+        if self.include_extra:
+            for name, value in fields.items():
+                if name not in self.reserved and name not in payload:
+                    payload[name] = value
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exc_info"] = record.exc_text
+        if record.stack_info:
+            payload["stack_info"] = self.formatStack(record.stack_info)
+        return dumps(payload)
@@ -0,0 +1,81 @@
+import atexit
+import copy
+import logging
+import os
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+from project.settings import correlation_id_var
+from .logging_formatters import CONTEXT_CORRELATION_ATTR
+
+DEFAULT_QUEUE_SIZE = 10_000
+
+
+class DrainingQueueListener(QueueListener):
+    def enqueue_sentinel(self):
+        # Wait for room instead of raising on a full queue: stopping drains it anyway.
+        self.queue.put(self._sentinel)
+
+
+class QueueStreamHandler(QueueHandler):
+    """
+    Non-blocking stream handler: the calling thread only enqueues the record and a
+    QueueListener thread formats and writes it.
+
+    A slow stdout or log collector therefore cannot add latency to requests or tasks.
+    When the queue is full, records are dropped and counted in `dropped` rather than
+    blocking the caller. The listener is started per process, so handlers configured
+    before a fork (gunicorn --preload, Celery prefork) still work in the children.
+    """
+
+    def __init__(self, stream=None, maxsize=DEFAULT_QUEUE_SIZE):
+        super().__init__(queue.Queue(maxsize))
+        self.target = logging.StreamHandler(stream or sys.stderr)
+        self.maxsize = maxsize
+        self.dropped = 0
+        self.listener = None
+        self._pid = None
+
+    def setFormatter(self, fmt):
+        # Formatting happens on the listener thread.
+        self.target.setFormatter(fmt)
+
+    def _start(self):
+        self.queue = queue.Queue(self.maxsize)
+        self.listener = DrainingQueueListener(self.queue, self.target)
+        self.listener.start()
+        self._pid = os.getpid()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Write out queued records and stop the listener thread."""
+        if self.listener is not None and self._pid == os.getpid():
+            self.listener.stop()
+            self.listener = None
+            self._pid = None
+
+    def emit(self, record):
+        if self._pid != os.getpid():
+            self._start()
+        super().emit(record)
+
+    def prepare(self, record):
+        # Same process, so no pickling: keep extras and exc_info, only freeze the message.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        # The listener thread runs outside the caller's context.
+        setattr(record, CONTEXT_CORRELATION_ATTR, correlation_id_var.get())
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        self.stop()
+        self.target.close()
+        super().close()
@@ -1,63 +1,114 @@
 import time
-import uuid
+import random
 import logging
-import json
+from django.conf import settings
 from django.utils.deprecation import MiddlewareMixin
 from project.settings import set_correlation_id, get_correlation_id
+from .profiling import Profile, request_profiling_enabled, should_profile_request
 http_logger = logging.getLogger("observability.http")
 
+DEFAULT_SAMPLE_RATE = 1.0
+DEFAULT_SLOW_REQUEST_SECONDS = 1.0
 
 
+def content_length(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
 
 class ObservabilityMiddleware(MiddlewareMixin):
+    """
+    Correlation ids plus request/response log lines.
+
+    Never touches the request body: the payload size comes from Content-Length, so large
+    and streamed uploads are read once, by the view. Requests are logged at
+    HTTP_LOG_SAMPLE_RATE, or at the rate of the longest matching prefix in
+    HTTP_LOG_SAMPLE_RATES. Errors and slow requests are always logged.
+
+    Requests with the PROFILING_TOKEN header, or sampled at PROFILING_SAMPLE_RATE, run
+    under middleware.profiling.Profile. With both unset, no per-request check is made.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.default_rate = getattr(settings, 'HTTP_LOG_SAMPLE_RATE', DEFAULT_SAMPLE_RATE)
+        self.path_rates = sorted(
+            getattr(settings, 'HTTP_LOG_SAMPLE_RATES', {}).items(),
+            key=lambda item: len(item[0]),
+            reverse=True,
+        )
+        self.slow_seconds = getattr(settings, 'HTTP_LOG_SLOW_REQUEST_SECONDS', DEFAULT_SLOW_REQUEST_SECONDS)
+        self.profiling = request_profiling_enabled()
+
+    def __call__(self, request):
+        if self.profiling and should_profile_request(request):
+            with Profile('request', f"{request.method} {request.path}"):
+                return super().__call__(request)
+        return super().__call__(request)
+
+    def sample_rate(self, path):
+        for prefix, rate in self.path_rates:
+            if path.startswith(prefix):
+                return rate
+        return self.default_rate
 
     def process_request(self, request):
-        request._start_time = time.time()
+        request.start_time = time.perf_counter()
 
         # correlation id (from header or new)
-        cid = request.headers.get("X-Correlation-ID")
-        set_correlation_id(cid)
-
-        request.correlation_id = get_correlation_id()
-
-        request.start_time = time.time()
-        json_data = json.loads(request.body)
-        http_logger.info(
-            "request_started",
-            extra={
-                "type":"request",
-                "correlation_id": request.correlation_id,
-                "method": request.method,
-                "path": request.path,
-                "client_ip": request.META.get("REMOTE_ADDR"),
-                "user_agent": request.headers.get("User-Agent"),
-                "status_code":0,
-                "response_bytes":0,
-                "duration_sec": 0,
-            }
-        )
+        request.correlation_id = set_correlation_id(request.headers.get("X-Correlation-ID"))
+
+        rate = self.sample_rate(request.path)
+        request.log_sampled = rate >= 1.0 or random.random() < rate
+        if request.log_sampled and http_logger.isEnabledFor(logging.INFO):
+            http_logger.info(
+                "request_started",
+                extra={
+                    "type": "request",
+                    "correlation_id": request.correlation_id,
+                    "method": request.method,
+                    "path": request.path,
+                    "client_ip": request.META.get("REMOTE_ADDR"),
+                    "user_agent": request.headers.get("User-Agent"),
+                    "request_bytes": content_length(request.META.get("CONTENT_LENGTH")),
+                    "status_code": 0,
+                    "response_bytes": 0,
+                    "duration_sec": 0,
+                }
+            )
 
     def process_response(self, request, response):
-        correlation_id = getattr(request, "correlation_id", get_correlation_id())
-        duration = None
-
-        if hasattr(request, "start_time"):
-            duration = round(time.time() - request.start_time, 4)
-
-        http_logger.info(
-            "request_completed",
-            extra={
-                "type":"response",
-                "correlation_id": correlation_id,
-                "method": getattr(request, "method", None),
-                "path": getattr(request, "path", None),
-                "client_ip": request.META.get("REMOTE_ADDR"),
-                "user_agent": request.headers.get("User-Agent"),
-                "status_code": response.status_code,
-                "duration_sec": duration,
-                "response_bytes": getattr(response, "content", None).__sizeof__() if hasattr(response, "content") else None,
-            }
+        correlation_id = getattr(request, "correlation_id", None) or get_correlation_id()
+        start_time = getattr(request, "start_time", None)
+        duration = round(time.perf_counter() - start_time, 4) if start_time is not None else None
+
+        log = (
+            getattr(request, "log_sampled", True)
+            or response.status_code >= 400
+            or (duration is not None and duration >= self.slow_seconds)
         )
+        if log and http_logger.isEnabledFor(logging.INFO):
+            if response.streaming:
+                response_bytes = content_length(response.get("Content-Length"))
+            else:
+                response_bytes = len(response.content)
+            http_logger.info(
+                "request_completed",
+                extra={
+                    "type": "response",
+                    "correlation_id": correlation_id,
+                    "method": request.method,
+                    "path": request.path,
+                    "client_ip": request.META.get("REMOTE_ADDR"),
+                    "user_agent": request.headers.get("User-Agent"),
+                    "request_bytes": content_length(request.META.get("CONTENT_LENGTH")),
+                    "status_code": response.status_code,
+                    "duration_sec": duration,
+                    "response_bytes": response_bytes,
+                }
+            )
 
         # Attach correlation ID to client response
         response["X-Correlation-ID"] = correlation_id
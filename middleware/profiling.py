@@ -0,0 +1,146 @@
+import cProfile
+import datetime
+import hmac
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from project.settings import get_correlation_id
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILING_DIR = 'profiles'
+PROFILE_HEADER = 'X-Profile-Token'
+TOP_FUNCTIONS = 30
+# Correlation ids come from a request header; only these characters reach the file system.
+UNSAFE_PATH_CHARS = re.compile(r'[^A-Za-z0-9_.-]')
+
+
+def profiling_dir():
+    return getattr(settings, 'PROFILING_DIR', DEFAULT_PROFILING_DIR)
+
+
+def request_profiling_enabled():
+    return bool(getattr(settings, 'PROFILING_TOKEN', '')) or getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0) > 0
+
+
+def should_profile_request(request):
+    """True for a request carrying the PROFILING_TOKEN header, or one picked at PROFILING_SAMPLE_RATE."""
+    token = getattr(settings, 'PROFILING_TOKEN', '')
+    supplied = request.headers.get(PROFILE_HEADER)
+    if token and supplied and hmac.compare_digest(supplied.encode(), token.encode()):
+        return True
+    rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+    return rate > 0 and random.random() < rate
+
+
+def should_profile_task():
+    rate = getattr(settings, 'PROFILING_TASK_SAMPLE_RATE', 0.0)
+    return rate > 0 and random.random() < rate
+
+
+def safe_name(value):
+    return UNSAFE_PATH_CHARS.sub('_', value)[:128].lstrip('.') or 'unknown'
+
+
+class Profile:
+    """
+    cProfile plus a SQL query log for one request or task.
+
+    Used as a context manager around the work. On exit, two files are written to
+    PROFILING_DIR/<correlation_id>/: a pstats dump (`.prof`, for snakeviz or pstats) and a
+    JSON report with the duration, query count and time, every query in order, and the top
+    functions by cumulative time. Requests queue their tasks with their correlation id
+    (transactions.tasks.enqueue_batch_enrichment), so a request and the tasks it starts end
+    up in the same directory. Query parameters are not recorded.
+    """
+
+    def __init__(self, kind, target, directory=None):
+        self.kind = kind
+        self.target = target
+        self.directory = directory or profiling_dir()
+        self.profiler = cProfile.Profile()
+        self.queries = []
+        self.duration = None
+        self._wrappers = None
+        self._start = None
+
+    def __enter__(self):
+        self._wrappers = ExitStack()
+        for connection in connections.all():
+            self._wrappers.enter_context(connection.execute_wrapper(self.record_query))
+        self._start = time.perf_counter()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler.disable()
+        self.duration = time.perf_counter() - self._start
+        self._wrappers.close()
+        try:
+            self.save(get_correlation_id() or 'unknown')
+        except OSError as e:
+            # Profiling must never fail the request or task it observes.
+            logger.warning("profile_write_failed", extra={"target": self.target, "error": str(e)})
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                "alias": context['connection'].alias,
+                "sql": sql,
+                "many": many,
+                "duration_sec": round(time.perf_counter() - start, 6),
+            })
+
+    def top_functions(self, limit=TOP_FUNCTIONS):
+        stats = pstats.Stats(self.profiler).stats
+        rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+        return [
+            {
+                "function": f"{filename}:{line}({name})",
+                "calls": calls,
+                "own_sec": round(own, 6),
+                "cumulative_sec": round(cumulative, 6),
+            }
+            for (filename, line, name), (_, calls, own, cumulative, _) in rows
+        ]
+
+    def save(self, correlation_id):
+        directory = os.path.join(self.directory, safe_name(correlation_id))
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.datetime.now(datetime.timezone.utc).strftime('%Y%m%dT%H%M%S%fZ')
+        base = os.path.join(directory, f"{self.kind}-{safe_name(self.target)}-{stamp}")
+
+        self.profiler.dump_stats(f"{base}.prof")
+        report = {
+            "correlation_id": correlation_id,
+            "kind": self.kind,
+            "target": self.target,
+            "duration_sec": round(self.duration, 6),
+            "query_count": len(self.queries),
+            "query_time_sec": round(sum(query["duration_sec"] for query in self.queries), 6),
+            "queries": self.queries,
+            "top_functions": self.top_functions(),
+        }
+        with open(f"{base}.json", 'w') as f:
+            json.dump(report, f, indent=2)
+
+        logger.info("profile_written", extra={
+            "correlation_id": correlation_id,
+            "target": self.target,
+            "path": f"{base}.json",
+            "duration_sec": report["duration_sec"],
+            "query_count": report["query_count"],
+        })
+        return base
@@ -0,0 +1,94 @@
+"""
+Process-wide connection management for Redis and the database.
+
+Redis: one `redis.ConnectionPool` per (URL, options) per process. `redis_client()` (health
+checks) and the Django cache (CACHES OPTIONS: `pool_class` plus `redis_pool_options()`)
+build their pools with the same options, so they share one bounded pool when CACHE_URL
+and REDIS_URL are the same URL, and threads share sockets instead of each opening their
+own. redis-py discards pooled connections inherited across a fork, so pools created
+before gunicorn/Celery fork their workers are safe.
+
+Database: `database_config()` builds DATABASES['default'] with persistent connections
+(CONN_MAX_AGE) checked before reuse (CONN_HEALTH_CHECKS).
+"""
+import threading
+
+import redis
+from django.conf import settings
+
+DEFAULT_REDIS_URL = 'redis://redis:6379/0'
+DEFAULT_REDIS_MAX_CONNECTIONS = 50
+DEFAULT_REDIS_SOCKET_TIMEOUT = 0.5
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _pool_key(url, options):
+    return url, tuple(sorted((name, repr(value)) for name, value in options.items()))
+
+
+class SharedConnectionPool(redis.ConnectionPool):
+    """ConnectionPool whose from_url() returns the process-wide pool for that URL and options."""
+
+    @classmethod
+    def from_url(cls, url, **options):
+        key = _pool_key(url, options)
+        pool = _pools.get(key)
+        if pool is None:
+            with _pools_lock:
+                pool = _pools.get(key)
+                if pool is None:
+                    pool = _pools[key] = redis.ConnectionPool.from_url(url, **options)
+        return pool
+
+
+def redis_pool_options(max_connections=None, socket_timeout=None):
+    """
+    Pool options for every Redis user in the process. settings.py passes its values
+    explicitly when building CACHES; other callers read them from settings.
+    """
+    if max_connections is None:
+        max_connections = getattr(settings, 'REDIS_MAX_CONNECTIONS', DEFAULT_REDIS_MAX_CONNECTIONS)
+    if socket_timeout is None:
+        socket_timeout = getattr(settings, 'REDIS_SOCKET_TIMEOUT', DEFAULT_REDIS_SOCKET_TIMEOUT)
+    return {
+        'max_connections': max_connections,
+        'socket_connect_timeout': socket_timeout,
+        'socket_timeout': socket_timeout,
+        # Ping connections idle this long before reuse instead of failing on a dropped socket.
+        'health_check_interval': 30,
+        # Django's cache always passes a parser class; naming the same one keeps one pool key.
+        'parser_class': redis.connection.DefaultParser,
+    }
+
+
+def redis_pool(url=None):
+    return SharedConnectionPool.from_url(
+        url or getattr(settings, 'REDIS_URL', DEFAULT_REDIS_URL), **redis_pool_options()
+    )
+
+
+def redis_client(url=None):
+    """A client on the shared pool; cheap to create, it holds no connection of its own."""
+    return redis.Redis(connection_pool=redis_pool(url))
+
+
+def close_redis_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.disconnect()
+
+
+def database_config(config, conn_max_age=60, connect_timeout=5):
+    """Add connection reuse settings to a DATABASES entry (e.g. from dj_database_url.parse)."""
+    config = dict(config)
+    options = dict(config.get('OPTIONS', {}))
+    if 'postgresql' in config.get('ENGINE', ''):
+        options.setdefault('connect_timeout', connect_timeout)
+    config['CONN_MAX_AGE'] = conn_max_age
+    config['OPTIONS'] = options
+    config['CONN_HEALTH_CHECKS'] = True
+    return config
@@ -4,6 +4,8 @@ import dj_database_url
 import logging
 import uuid
 
+from project.connections import database_config, redis_pool_options
+
 # --- CORRELATION ID CONTEXT (THREAD/ASYNC SAFE) ---
 from contextvars import ContextVar
 
@@ -62,7 +64,11 @@ WSGI_APPLICATION = 'project.wsgi.application'
 
 DATABASE_URL = os.getenv('DATABASE_URL', '')
 if DATABASE_URL:
-    DATABASES = {'default': dj_database_url.parse(DATABASE_URL)}
+    # Persistent connections reused for DB_CONN_MAX_AGE seconds
+    DATABASES = {'default': database_config(
+        dj_database_url.parse(DATABASE_URL),
+        conn_max_age=int(os.getenv('DB_CONN_MAX_AGE', '60')),
+    )}
 else:
     DATABASES = {
         'default': {
@@ -80,81 +86,170 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+# Ingestion
+# 'fast' uses the compiled validator in transactions/fast_validation.py, 'drf' the plain serializers.
+# The default mirrors fast_validation.DEFAULT_VALIDATOR, which is canonical.
+INGEST_VALIDATOR = os.getenv('INGEST_VALIDATOR', 'fast')
+INGEST_INSERT_CHUNK_SIZE = int(os.getenv('INGEST_INSERT_CHUNK_SIZE', '2000'))
+INGEST_STREAM_CHUNK_SIZE = int(os.getenv('INGEST_STREAM_CHUNK_SIZE', '1000'))
+
 # Celery
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://redis:6379/0')
 CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'redis://redis:6379/0')
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_ACKS_LATE = True
 
+# Transactions per enrichment chunk task fanned out by process_batch_enrichment
+ENRICHMENT_CHUNK_SIZE = int(os.getenv('ENRICHMENT_CHUNK_SIZE', '100'))
+# Enrichment results are written with bulk_update every N rows or T seconds
+ENRICHMENT_FLUSH_ROWS = int(os.getenv('ENRICHMENT_FLUSH_ROWS', '200'))
+ENRICHMENT_FLUSH_SECONDS = float(os.getenv('ENRICHMENT_FLUSH_SECONDS', '2.0'))
+# Rows left in `processing` longer than this (worker died) may be claimed again
+ENRICHMENT_CLAIM_TIMEOUT = int(os.getenv('ENRICHMENT_CLAIM_TIMEOUT', '600'))
+# A finalized batch with rows still pending/processing is re-dispatched after this delay
+# (after ENRICHMENT_CLAIM_TIMEOUT while rows are held by another worker), at most N times
+ENRICHMENT_REDISPATCH_DELAY = int(os.getenv('ENRICHMENT_REDISPATCH_DELAY', '30'))
+ENRICHMENT_MAX_REDISPATCHES = int(os.getenv('ENRICHMENT_MAX_REDISPATCHES', '3'))
+# How the external enrichment call runs inside a task: serial | threads | asyncio
+ENRICHMENT_EXECUTOR = os.getenv('ENRICHMENT_EXECUTOR', 'threads')
+ENRICHMENT_MAX_IN_FLIGHT = int(os.getenv('ENRICHMENT_MAX_IN_FLIGHT', '16'))
+ENRICHMENT_CALL_TIMEOUT = float(os.getenv('ENRICHMENT_CALL_TIMEOUT', '5.0'))
+# Categorizer used by enrichment: a registered name or a dotted path (see transactions/categorizer.py)
+CATEGORIZER = os.getenv('CATEGORIZER', 'rule_based')
+# JSON/YAML keyword rules for the rule-based categorizer; unset uses the built-in rules
+CATEGORIZER_RULES_FILE = os.getenv('CATEGORIZER_RULES_FILE') or None
+CATEGORIZER_RULES_RELOAD_SECONDS = float(os.getenv('CATEGORIZER_RULES_RELOAD_SECONDS', '30'))
+ENRICHMENT_CATEGORIZE_BATCH_SIZE = int(os.getenv('ENRICHMENT_CATEGORIZE_BATCH_SIZE', '50'))
+# Two-tier merchant -> category cache: per-process LRU in front of the shared cache below
+CATEGORIZATION_CACHE_ENABLED = os.getenv('CATEGORIZATION_CACHE_ENABLED', 'true').lower() == 'true'
+CATEGORIZATION_CACHE_LOCAL_ENTRIES = int(os.getenv('CATEGORIZATION_CACHE_LOCAL_ENTRIES', '50000'))
+CATEGORIZATION_CACHE_TTL = int(os.getenv('CATEGORIZATION_CACHE_TTL', '86400'))
+CATEGORIZATION_CACHE_ALIAS = 'default'
+
+# Serve account summaries from daily rollups (closed days) plus raw rows for today
+SUMMARY_USE_ROLLUPS = os.getenv('SUMMARY_USE_ROLLUPS', 'true').lower() == 'true'
+# Summary responses cached per (account, data_version, range); writes bump the version
+SUMMARY_CACHE_ENABLED = os.getenv('SUMMARY_CACHE_ENABLED', 'true').lower() == 'true'
+SUMMARY_CACHE_TTL = int(os.getenv('SUMMARY_CACHE_TTL', '86400'))
+SUMMARY_CACHE_ALIAS = 'default'
+# Upper bound on account_ids per portfolio summary request
+PORTFOLIO_MAX_ACCOUNTS = int(os.getenv('PORTFOLIO_MAX_ACCOUNTS', '500'))
+# Rows fetched per server-side cursor round trip by transaction exports
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '2000'))
+# Nightly Parquet snapshots (export_warehouse): root directory, rows per chunk, and how far
+# before the previous watermark to re-read for late-committing writes
+WAREHOUSE_EXPORT_DIR = os.getenv('WAREHOUSE_EXPORT_DIR', str(BASE_DIR / 'warehouse'))
+WAREHOUSE_EXPORT_CHUNK_SIZE = int(os.getenv('WAREHOUSE_EXPORT_CHUNK_SIZE', '50000'))
+WAREHOUSE_EXPORT_OVERLAP_SECONDS = int(os.getenv('WAREHOUSE_EXPORT_OVERLAP_SECONDS', '600'))
+# run_benchmarks: where per-database baselines live and the slowdown that fails a run
+BENCHMARK_BASELINE_DIR = os.getenv('BENCHMARK_BASELINE_DIR', str(BASE_DIR / 'benchmarks'))
+BENCHMARK_REGRESSION_THRESHOLD = float(os.getenv('BENCHMARK_REGRESSION_THRESHOLD', '0.25'))
+
+# Shared Redis pool for health checks and the cache (project/connections.py); one per URL per process
+REDIS_URL = os.getenv('REDIS_URL', 'redis://redis:6379/0')
+REDIS_MAX_CONNECTIONS = int(os.getenv('REDIS_MAX_CONNECTIONS', '50'))
+REDIS_SOCKET_TIMEOUT = float(os.getenv('REDIS_SOCKET_TIMEOUT', '0.5'))
+
+# Shared cache: Redis when CACHE_URL is a redis:// URL (set in docker-compose); unset or any
+# other URL (e.g. locmem://) uses process memory, so local runs never wait on a missing Redis
+CACHE_URL = os.getenv('CACHE_URL', '')
+if CACHE_URL.startswith(('redis://', 'rediss://')):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+            'OPTIONS': {
+                'pool_class': 'project.connections.SharedConnectionPool',
+                **redis_pool_options(REDIS_MAX_CONNECTIONS, REDIS_SOCKET_TIMEOUT),
+            },
+        }
+    }
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+# Readiness checks run in parallel, each bounded by HEALTH_CHECK_TIMEOUT; results are reused
+# for HEALTH_CACHE_SECONDS so frequent probes do not each hit the database and Redis
+HEALTH_CHECK_TIMEOUT = float(os.getenv('HEALTH_CHECK_TIMEOUT', '1.0'))
+HEALTH_CACHE_SECONDS = float(os.getenv('HEALTH_CACHE_SECONDS', '2.0'))
+
+
+# Request logging: default sample rate, per path-prefix rates (longest prefix wins), and
+# the duration above which a request is logged regardless of sampling. Errors always are.
+HTTP_LOG_SAMPLE_RATE = float(os.getenv('HTTP_LOG_SAMPLE_RATE', '1.0'))
+HTTP_LOG_SAMPLE_RATES = {
+    '/api/health/': float(os.getenv('HTTP_LOG_HEALTH_SAMPLE_RATE', '0.01')),
+    '/api/batches/': float(os.getenv('HTTP_LOG_PROGRESS_SAMPLE_RATE', '0.1')),
+    '/api/metrics': float(os.getenv('HTTP_LOG_METRICS_SAMPLE_RATE', '0.01')),
+}
+HTTP_LOG_SLOW_REQUEST_SECONDS = float(os.getenv('HTTP_LOG_SLOW_REQUEST_SECONDS', '1.0'))
+# Records buffered per log handler before new ones are dropped instead of blocking
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+# Opt-in profiling (cProfile + SQL query log) written under PROFILING_DIR/<correlation_id>/.
+# Requests are profiled when X-Profile-Token matches PROFILING_TOKEN or at PROFILING_SAMPLE_RATE,
+# Celery tasks at PROFILING_TASK_SAMPLE_RATE. Everything is off by default.
+PROFILING_DIR = os.getenv('PROFILING_DIR', str(BASE_DIR / 'profiles'))
+PROFILING_TOKEN = os.getenv('PROFILING_TOKEN', '')
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_TASK_SAMPLE_RATE = float(os.getenv('PROFILING_TASK_SAMPLE_RATE', '0'))
 
 # --- FORMATTERS ---
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
 
+    # JSON per record; each logger's fields are emitted (null when absent) in this order.
     "formatters": {
         # -----------------------------
         # HTTP REQUEST/RESPONSE FORMATTER
         # -----------------------------
         "http_json": {
-            "format": (
-                '{'
-                '"timestamp":"%(asctime)s",'
-                '"level":"%(levelname)s",'
-                '"logger":"%(name)s",'
-                '"message":"%(message)s",'
-                '"correlation_id":"%(correlation_id)s",'
-                '"method":"%(method)s",'
-                '"path":"%(path)s",'
-                '"type":"http",'
-                '"client_ip":"%(client_ip)s",'
-                '"user_agent":"%(user_agent)s",'
-                '"status_code":"%(status_code)s",'
-                '"response_bytes":"%(response_bytes)s",'
-                '"duration_sec":"%(duration_sec)s"'
-                '}'
-            )
+            "()": "middleware.logging_formatters.JsonFormatter",
+            "fields": [
+                "method", "path", "client_ip", "user_agent", "request_bytes",
+                "status_code", "response_bytes", "duration_sec",
+            ],
+            "static": {"type": "http"},
         },
 
         # -----------------------------
         # CELERY TASK FORMATTER
         # -----------------------------
         "celery_json": {
-            "format": (
-                '{'
-                '"timestamp":"%(asctime)s",'
-                '"level":"%(levelname)s",'
-                '"logger":"%(name)s",'
-                '"message":"%(message)s",'
-                '"correlation_id":"%(correlation_id)s",'
-                '"task_name":"%(task_name)s",'
-                '"task_id":"%(task_id)s",'
-                '"queue":"%(queue)s",'
-                '"retries":"%(retries)s",'
-                '"duration_sec":"%(duration_sec)s",'
-                '"type":"celery"'
-                '}'
-            )
+            "()": "middleware.logging_formatters.JsonFormatter",
+            "fields": ["task_name", "task_id", "queue", "retries", "duration_sec"],
+            "static": {"type": "celery"},
+        },
+
+        # -----------------------------
+        # APPLICATION FORMATTER (every extra= field)
+        # -----------------------------
+        "app_json": {
+            "()": "middleware.logging_formatters.JsonFormatter",
+            "include_extra": True,
         },
     },
 
+    # Handlers only enqueue; a listener thread per handler formats and writes to stderr.
     "handlers": {
         # HTTP handler
         "http_handler": {
-            "class": "logging.StreamHandler",
+            "class": "middleware.logging_handlers.QueueStreamHandler",
+            "maxsize": LOG_QUEUE_SIZE,
             "formatter": "http_json",
         },
 
         # Celery handler
         "celery_handler": {
-            "class": "logging.StreamHandler",
+            "class": "middleware.logging_handlers.QueueStreamHandler",
+            "maxsize": LOG_QUEUE_SIZE,
             "formatter": "celery_json",
         },
 
         # Fallback debug logger
         "console": {
-            "class": "logging.StreamHandler",
-            "formatter": "http_json",
+            "class": "middleware.logging_handlers.QueueStreamHandler",
+            "maxsize": LOG_QUEUE_SIZE,
+            "formatter": "app_json",
         },
     },
 
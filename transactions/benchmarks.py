@@ -0,0 +1,319 @@
+"""
+Benchmark suite behind `manage.py run_benchmarks`.
+
+Each benchmark in BENCHMARKS takes a BenchmarkConfig and returns Results: the median of
+`repeat` timed runs, with per-run setup (fresh payloads, pending batches) kept outside
+the timing. Results are saved as JSON and compared with a baseline from an earlier run
+on the same database vendor; a case is a regression when its median is more than
+`threshold` slower than the baseline (and at least MIN_REGRESSION_SECONDS slower, so
+millisecond-scale noise does not fail a run).
+"""
+import copy
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import time
+from dataclasses import asdict, dataclass, field
+from decimal import Decimal
+from unittest import mock
+
+import django
+from django.db import connection, transaction as db_transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .categorizer import RuleBasedCategorizer
+from .enrichment import SimulatedEnrichmentClient
+from .fast_validation import fast_validator_class
+from .ingestion import ingest_batch
+from .loader import _copy_value
+from .models import Account, Batch, Transaction
+from .rollups import rebuild_rollups
+from .serializers import IngestBatchSerializer
+from .synthetic import MERCHANTS, make_categorizer_records, make_payload
+from .tasks import process_batch_enrichment
+
+DEFAULT_SIZES = (100, 1_000, 10_000)
+DEFAULT_DATASET_SIZE = 100_000
+DEFAULT_CATEGORIZER_ROWS = 100_000
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.25
+MIN_REGRESSION_SECONDS = 0.005
+DATASET_ACCOUNTS = 20
+DATASET_DAYS = 365
+CATEGORIES = ['Transportation', 'Food & Drink', 'Software', 'Shopping', 'Uncategorized']
+
+
+@dataclass
+class BenchmarkConfig:
+    sizes: tuple = DEFAULT_SIZES
+    dataset_size: int = DEFAULT_DATASET_SIZE
+    categorizer_rows: int = DEFAULT_CATEGORIZER_ROWS
+    repeat: int = DEFAULT_REPEAT
+    seed: int = 42
+
+
+@dataclass
+class Result:
+    name: str
+    rows: int
+    seconds: float
+    runs: list = field(default_factory=list)
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def as_dict(self):
+        return {**asdict(self), "rows_per_sec": round(self.rows_per_sec, 1)}
+
+
+def measure(name, rows, run, setup=None, repeat=DEFAULT_REPEAT):
+    """Median of `repeat` timed calls of run(setup()) (or run() without setup)."""
+    runs = []
+    for _ in range(repeat):
+        state = setup() if setup else None
+        start = time.perf_counter()
+        run(state) if setup else run()
+        runs.append(time.perf_counter() - start)
+    return Result(name, rows, statistics.median(runs), [round(elapsed, 6) for elapsed in runs])
+
+
+def as_validated(payload):
+    """Coerce a raw payload to the types IngestBatchSerializer would produce, without its cost."""
+    for tx in payload['transactions']:
+        tx['amount'] = Decimal(str(tx['amount']))
+        tx['date'] = parse_datetime(tx['date'])
+        tx['authorized_date'] = parse_date(tx['authorized_date'])
+    return payload
+
+
+DATASET_COLUMNS = [
+    'transaction_id', 'account_id', 'amount', 'currency', 'date', 'authorized_date', 'merchant_name',
+    'description', 'category', 'ingestion_status', 'batch_id', 'created_at', 'updated_at',
+]
+
+
+def _dataset_rows(n, account_pks, batch_pk, seed):
+    """Completed transactions spread over DATASET_DAYS; sequential ids keep generation cheap."""
+    rng = random.Random(seed)
+    now = timezone.now()
+    first_day = now - datetime.timedelta(days=DATASET_DAYS)
+    prefix = f"bench_{seed}_{now.timestamp():.0f}"
+    for i in range(n):
+        # The first account gets about half the rows, so its summary covers a large share.
+        account_pk = account_pks[0] if i % 2 == 0 else account_pks[i % len(account_pks)]
+        date = first_day + datetime.timedelta(seconds=rng.randrange(DATASET_DAYS * 86400))
+        merchant = MERCHANTS[i % len(MERCHANTS)]
+        yield (
+            f"{prefix}_{i}", account_pk, Decimal(rng.randrange(-150000, 150000)) / 100, 'USD', date, date.date(),
+            merchant, merchant, CATEGORIES[i % len(CATEGORIES)], Transaction.INGESTION_STATUS_COMPLETED,
+            batch_pk, now, now,
+        )
+
+
+def load_synthetic_dataset(n, accounts=DATASET_ACCOUNTS, seed=42, chunk_size=50_000):
+    """
+    Insert n completed transactions over `accounts` accounts and build their rollups.
+
+    PostgreSQL loads the rows with COPY, other backends with bulk_create. Returns
+    (busiest account_id, its row count, start date, end date) for summary requests.
+    """
+    tag = f"bench_{seed}_{int(time.time())}"
+    account_objs = Account.objects.bulk_create([
+        Account(account_id=f"{tag}_acc{i}", name="Benchmark", type="depository") for i in range(accounts)
+    ])
+    account_pks = list(
+        Account.objects.filter(account_id__in=[a.account_id for a in account_objs])
+        .order_by('account_id').values_list('id', flat=True)
+    )
+    batch = Batch.objects.create(request_id=tag, total_transactions=n, status=Batch.STATUS_COMPLETED)
+
+    rows = _dataset_rows(n, account_pks, batch.pk, seed)
+    if connection.vendor == 'postgresql':
+        table = connection.ops.quote_name(Transaction._meta.db_table)
+        copy_sql = f"COPY {table} ({', '.join(DATASET_COLUMNS)}) FROM STDIN"
+        while True:
+            buffer = io.StringIO()
+            written = 0
+            for row in rows:
+                buffer.write('\t'.join(_copy_value(value) for value in row))
+                buffer.write('\n')
+                written += 1
+                if written == chunk_size:
+                    break
+            if not written:
+                break
+            buffer.seek(0)
+            with connection.cursor() as cursor:
+                raw = cursor.cursor
+                if hasattr(raw, 'copy_expert'):
+                    raw.copy_expert(copy_sql, buffer)
+                else:
+                    with raw.copy(copy_sql) as copy_:
+                        copy_.write(buffer.getvalue())
+    else:
+        chunk = []
+        for row in rows:
+            chunk.append(Transaction(**dict(zip(DATASET_COLUMNS, row))))
+            if len(chunk) == chunk_size:
+                Transaction.objects.bulk_create(chunk, batch_size=chunk_size)
+                chunk = []
+        Transaction.objects.bulk_create(chunk, batch_size=chunk_size)
+
+    Batch.objects.filter(pk=batch.pk).update(completed_transactions=n)
+    busiest = account_objs[0].account_id
+    rebuild_rollups(account_ids=[a.account_id for a in account_objs])
+    today = timezone.now().date()
+    start = today - datetime.timedelta(days=DATASET_DAYS)
+    count = Transaction.objects.filter(account__account_id=busiest).count()
+    return busiest, count, start.isoformat(), today.isoformat()
+
+
+def bench_categorizer(config):
+    records = make_categorizer_records(config.categorizer_rows, rng=random.Random(config.seed))
+    categorizer = RuleBasedCategorizer()
+
+    def run():
+        for i in range(0, len(records), 500):
+            categorizer.categorize_many(records[i:i + 500])
+
+    return [measure('categorizer.categorize_many', len(records), run, repeat=config.repeat)]
+
+
+def bench_serializer(config):
+    results = []
+    for size in config.sizes:
+        payload = make_payload(size, n_accounts=5, rng=random.Random(config.seed))
+        for label, validator_class in (('drf', IngestBatchSerializer), ('fast', fast_validator_class(IngestBatchSerializer))):
+            def run(data, validator_class=validator_class):
+                validator = validator_class(data=data)
+                if not validator.is_valid():
+                    raise RuntimeError(f"{label} rejected a synthetic payload: {validator.errors}")
+
+            results.append(measure(
+                f'serializer.{label}[{size}]', size, run, setup=lambda: copy.deepcopy(payload), repeat=config.repeat,
+            ))
+    return results
+
+
+def bench_ingest_api(config):
+    client = Client()
+    results = []
+    for size in config.sizes:
+        rng = random.Random(config.seed)
+
+        def setup():
+            return json.dumps(make_payload(size, n_accounts=5, rng=rng))
+
+        def run(body):
+            response = client.post('/api/integrations/transactions/', body, content_type='application/json')
+            if response.status_code != 202:
+                raise RuntimeError(f"ingest returned {response.status_code}: {response.content[:200]!r}")
+
+        # Enrichment dispatch is not part of the measured path (and must not reach real workers).
+        with mock.patch.object(process_batch_enrichment, 'apply_async'):
+            results.append(measure(f'ingest_api[{size}]', size, run, setup=setup, repeat=config.repeat))
+    return results
+
+
+def bench_enrichment(config):
+    results = []
+    for size in config.sizes:
+        rng = random.Random(config.seed)
+
+        def setup():
+            with db_transaction.atomic():
+                return str(ingest_batch(as_validated(make_payload(size, n_accounts=5, rng=rng))).batch.batch_id)
+
+        # External call latency stubbed out: claim, categorize, write and rollups are measured.
+        with mock.patch.object(SimulatedEnrichmentClient, 'latency', (0, 0)):
+            results.append(measure(
+                f'enrichment[{size}]', size, lambda batch_id: process_batch_enrichment(batch_id),
+                setup=setup, repeat=config.repeat,
+            ))
+    return results
+
+
+def bench_summary(config):
+    account_id, rows, start, end = load_synthetic_dataset(config.dataset_size, seed=config.seed)
+    client = Client()
+    url = f'/api/reports/account/{account_id}/summary?start_date={start}&end_date={end}'
+
+    def run():
+        response = client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f"summary returned {response.status_code}")
+
+    results = []
+    for label, use_rollups in (('rollups', True), ('raw', False)):
+        with override_settings(SUMMARY_CACHE_ENABLED=False, SUMMARY_USE_ROLLUPS=use_rollups):
+            run()  # warm up connections and query plans
+            results.append(measure(f'summary_api.{label}[{config.dataset_size}]', rows, run, repeat=config.repeat))
+    return results
+
+
+BENCHMARKS = {
+    'categorizer': bench_categorizer,
+    'serializer': bench_serializer,
+    'ingest_api': bench_ingest_api,
+    'enrichment': bench_enrichment,
+    'summary': bench_summary,
+}
+
+
+def environment():
+    return {
+        "vendor": connection.vendor,
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def run_suite(names, config, report=None):
+    """Run the named benchmarks; returns the JSON document saved as results/baseline."""
+    results = {}
+    for name in names:
+        for result in BENCHMARKS[name](config):
+            results[result.name] = result.as_dict()
+            if report:
+                report(result)
+    return {
+        "created_at": timezone.now().isoformat(),
+        "environment": environment(),
+        "config": {**asdict(config), "sizes": list(config.sizes)},
+        "results": results,
+    }
+
+
+@dataclass
+class Comparison:
+    name: str
+    baseline: float
+    current: float
+    regressed: bool
+
+    @property
+    def change(self):
+        return self.current / self.baseline - 1 if self.baseline else 0.0
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """Compare cases present in both documents with the same row count."""
+    comparisons = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None or base["rows"] != result["rows"]:
+            continue
+        slower_by = result["seconds"] - base["seconds"]
+        regressed = result["seconds"] > base["seconds"] * (1 + threshold) and slower_by >= MIN_REGRESSION_SECONDS
+        comparisons.append(Comparison(name, base["seconds"], result["seconds"], regressed))
+    return comparisons
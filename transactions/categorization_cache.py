@@ -0,0 +1,199 @@
+"""
+Two-tier merchant -> category cache in front of a categorizer.
+
+Bank feeds repeat the same merchant strings over and over, so enrichment looks
+categories up by normalized (merchant_name, description) before calling the categorizer:
+first in a per-process LRU, then in the shared Django cache (Redis in production) with a
+TTL. Keys are namespaced by categorizer name and version, so a rule set or model change
+starts a fresh namespace: the local tier is cleared and stale shared entries age out.
+
+Normalization collapses whitespace runs and ignores case; on a miss the categorizer sees
+the whitespace-collapsed values, so cached and uncached answers agree for categorizers
+that ignore case (the rule engine does).
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .categorizer import DEFAULT_CATEGORIZER, BaseCategorizer, get_categorizer
+from .metrics import CATEGORIZATION_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOCAL_ENTRIES = 50_000
+DEFAULT_TTL = 24 * 3600
+DEFAULT_CACHE_ALIAS = 'default'
+KEY_PREFIX = 'categorization'
+# After a shared-tier error, skip it for this long instead of paying a timeout per batch.
+SHARED_RETRY_SECONDS = 30
+
+
+def collapse(value):
+    return ' '.join(value.split()) if value else ''
+
+
+class CachedCategorizer(BaseCategorizer):
+    def __init__(self, categorizer, name, max_entries=None, ttl=None, cache_alias=None):
+        self.categorizer = categorizer
+        self.name = name
+        self.max_entries = max_entries or getattr(
+            settings, 'CATEGORIZATION_CACHE_LOCAL_ENTRIES', DEFAULT_LOCAL_ENTRIES
+        )
+        self.ttl = ttl or getattr(settings, 'CATEGORIZATION_CACHE_TTL', DEFAULT_TTL)
+        self.cache_alias = cache_alias or getattr(settings, 'CATEGORIZATION_CACHE_ALIAS', DEFAULT_CACHE_ALIAS)
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._namespace = None
+        self._shared_retry_at = 0.0
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.shared_errors = 0
+
+    @property
+    def version(self):
+        return self.categorizer.version
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "shared_errors": self.shared_errors,
+            "size": len(self._local),
+        }
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+
+    def categorize(self, merchant_name, description):
+        return self.categorize_many([(merchant_name, description)])[0]
+
+    def categorize_many(self, records):
+        namespace = self._current_namespace()
+        values = [(collapse(merchant_name), collapse(description)) for merchant_name, description in records]
+        keys = [(merchant_name.casefold(), description.casefold()) for merchant_name, description in values]
+
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._local:
+                    self._local.move_to_end(key)
+                    found[key] = self._local[key]
+        local_hits = sum(1 for key in keys if key in found)
+        self.hits += local_hits
+        CATEGORIZATION_LOOKUPS.labels(self.name, 'local').inc(local_hits)
+
+        missing = {}
+        for key, value in zip(keys, values):
+            if key not in found:
+                missing.setdefault(key, value)
+        if not missing:
+            return [found[key] for key in keys]
+
+        shared = self._shared_get(namespace, missing)
+        shared_hits = sum(1 for key in keys if key in shared)
+        self.shared_hits += shared_hits
+        CATEGORIZATION_LOOKUPS.labels(self.name, 'shared').inc(shared_hits)
+        found.update(shared)
+
+        computed = {}
+        to_compute = [(key, value) for key, value in missing.items() if key not in shared]
+        if to_compute:
+            categories = self.categorizer.categorize_many([value for _, value in to_compute])
+            computed = {key: category for (key, _), category in zip(to_compute, categories)}
+            misses = sum(1 for key in keys if key in computed)
+            self.misses += misses
+            CATEGORIZATION_LOOKUPS.labels(self.name, 'computed').inc(misses)
+            found.update(computed)
+            self._shared_set(namespace, computed)
+
+        self._store_local(namespace, {**shared, **computed})
+        return [found[key] for key in keys]
+
+    def _current_namespace(self):
+        namespace = hashlib.sha1(f"{self.name}:{self.categorizer.version}".encode()).hexdigest()[:12]
+        if namespace != self._namespace:
+            with self._lock:
+                if self._namespace is not None:
+                    self.invalidations += 1
+                    logger.info("categorization_cache_invalidated", extra={
+                        "categorizer": self.name,
+                        "dropped_entries": len(self._local),
+                    })
+                self._local.clear()
+                self._namespace = namespace
+        return namespace
+
+    def _store_local(self, namespace, entries):
+        with self._lock:
+            if namespace != self._namespace:
+                return  # the rules changed while we were categorizing
+            for key, category in entries.items():
+                self._local[key] = category
+                self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+                self.evictions += 1
+
+    def _shared_key(self, namespace, key):
+        digest = hashlib.sha1('\x1f'.join(key).encode()).hexdigest()
+        return f"{KEY_PREFIX}:{namespace}:{digest}"
+
+    def _shared_get(self, namespace, keys):
+        if time.monotonic() < self._shared_retry_at:
+            return {}
+        shared_keys = {self._shared_key(namespace, key): key for key in keys}
+        try:
+            values = caches[self.cache_alias].get_many(list(shared_keys))
+        except Exception as e:
+            self._shared_failed(e)
+            return {}
+        return {shared_keys[shared_key]: category for shared_key, category in values.items()}
+
+    def _shared_set(self, namespace, entries):
+        if time.monotonic() < self._shared_retry_at:
+            return
+        try:
+            caches[self.cache_alias].set_many(
+                {self._shared_key(namespace, key): category for key, category in entries.items()},
+                timeout=self.ttl,
+            )
+        except Exception as e:
+            self._shared_failed(e)
+
+    def _shared_failed(self, error):
+        self.shared_errors += 1
+        self._shared_retry_at = time.monotonic() + SHARED_RETRY_SECONDS
+        logger.warning("categorization_cache_shared_error", extra={
+            "categorizer": self.name,
+            "error": str(error),
+            "retry_in_sec": SHARED_RETRY_SECONDS,
+        })
+
+
+@lru_cache(maxsize=None)
+def _load_cached_categorizer(name):
+    return CachedCategorizer(get_categorizer(name), name)
+
+
+def get_enrichment_categorizer(name=None):
+    """
+    The categorizer enrichment should use: the process-wide CachedCategorizer wrapping
+    get_categorizer(name), or the bare categorizer when CATEGORIZATION_CACHE_ENABLED is off.
+    """
+    name = name or getattr(settings, 'CATEGORIZER', DEFAULT_CATEGORIZER)
+    if not getattr(settings, 'CATEGORIZATION_CACHE_ENABLED', True):
+        return get_categorizer(name)
+    return _load_cached_categorizer(name)
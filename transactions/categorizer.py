@@ -1,22 +1,136 @@
-import re
-from typing import Optional
+import logging
+import threading
+import time
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .rules import RuleSet, file_signature, load_rules_file
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATEGORIZER = 'rule_based'
+DEFAULT_RULES_RELOAD_SECONDS = 30
+
+CATEGORIZERS = {}
+
+
+def register_categorizer(name):
+    """Class decorator making a categorizer selectable by name via settings.CATEGORIZER."""
+    def decorator(cls):
+        CATEGORIZERS[name] = cls
+        return cls
+    return decorator
+
+
+@lru_cache(maxsize=None)
+def _load_categorizer(name):
+    cls = CATEGORIZERS[name] if name in CATEGORIZERS else import_string(name)
+    return cls()
+
+
+def get_categorizer(name=None):
+    """
+    Return the process-wide categorizer instance for `name` (default settings.CATEGORIZER).
+
+    `name` is a registered name or a dotted path to a BaseCategorizer subclass. Instances
+    are cached so model-backed categorizers load once per worker.
+    """
+    return _load_categorizer(name or getattr(settings, 'CATEGORIZER', DEFAULT_CATEGORIZER))
+
 
 class BaseCategorizer:
+    # Bump when a categorizer's output changes for the same input; cached results are keyed on it.
+    version = '1'
+
     def categorize(self, merchant_name: Optional[str], description: Optional[str]) -> Optional[str]:
         raise NotImplementedError
 
+    def categorize_many(self, records: Iterable[Tuple[Optional[str], Optional[str]]]) -> List[Optional[str]]:
+        """
+        Categorize (merchant_name, description) pairs, returning categories in input order.
+
+        Override for batched inference; the default loops over categorize().
+        """
+        return [self.categorize(merchant_name, description) for merchant_name, description in records]
+
+
+@register_categorizer(DEFAULT_CATEGORIZER)
 class RuleBasedCategorizer(BaseCategorizer):
-    RULES = [
-        (re.compile(r'\bamazon\b', re.I), 'Shopping'),
-        (re.compile(r'\bstripe\b|\bpaypal\b', re.I), 'Income'),
-        (re.compile(r'\buber\b|\blyft\b', re.I), 'Transport'),
-        (re.compile(r'\baws\b|\bazure\b|\bgoogle cloud\b|\bgooglecloud\b', re.I), 'Software'),
-        (re.compile(r'\bstarbucks\b|\bmcdonalds\b|\bcoffee\b', re.I), 'Food'),
+    """
+    Keyword rules compiled into a single-pass matcher; the first matching rule wins.
+
+    Rules come from settings.CATEGORIZER_RULES_FILE (JSON, or YAML when PyYAML is
+    installed) and fall back to DEFAULT_RULES. The file is re-checked at most every
+    CATEGORIZER_RULES_RELOAD_SECONDS; a changed file is compiled off to the side and
+    swapped in with one reference assignment, so concurrent callers always see a
+    complete rule set. A file that fails to load leaves the current rules in place.
+    """
+
+    DEFAULT_RULES = [
+        ('Shopping', ['amazon']),
+        ('Income', ['stripe', 'paypal']),
+        ('Transport', ['uber', 'lyft']),
+        ('Software', ['aws', 'azure', 'google cloud', 'googlecloud']),
+        ('Food', ['starbucks', 'mcdonalds', 'coffee']),
     ]
+    DEFAULT_CATEGORY = 'Other'
+
+    def __init__(self, rules=None, rules_file=None, reload_interval=None):
+        if rules_file is None and rules is None:
+            rules_file = getattr(settings, 'CATEGORIZER_RULES_FILE', None)
+        if reload_interval is None:
+            reload_interval = getattr(settings, 'CATEGORIZER_RULES_RELOAD_SECONDS', DEFAULT_RULES_RELOAD_SECONDS)
+        self.rules_file = rules_file
+        self.reload_interval = reload_interval
+        self._reload_lock = threading.Lock()
+        self._signature = None
+        self._checked_at = time.monotonic()
+        if rules_file:
+            self._signature = file_signature(rules_file)
+            self.ruleset = load_rules_file(rules_file)
+        else:
+            self.ruleset = RuleSet.compile(self.DEFAULT_RULES if rules is None else rules)
+
+    @property
+    def version(self):
+        """Fingerprint of the active rule set; changes whenever the rules do."""
+        return self.current_ruleset().version
+
+    def current_ruleset(self):
+        if self.rules_file and time.monotonic() - self._checked_at >= self.reload_interval:
+            self.reload()
+        return self.ruleset
+
+    def reload(self, force=False):
+        """Swap in the rules file if it changed since the last load. Returns True on swap."""
+        if not self.rules_file or not self._reload_lock.acquire(blocking=False):
+            return False
+        try:
+            self._checked_at = time.monotonic()
+            signature = file_signature(self.rules_file)
+            if signature == self._signature and not force:
+                return False
+            # Remembered even if loading fails, so a broken file is reported once, not every interval.
+            self._signature = signature
+            ruleset = load_rules_file(self.rules_file)
+        except (OSError, ValueError, ImportError) as e:
+            logger.error("categorizer_rules_reload_failed", extra={"path": self.rules_file, "error": str(e)})
+            return False
+        else:
+            previous, self.ruleset = self.ruleset.version, ruleset
+            logger.info("categorizer_rules_reloaded", extra={
+                "path": self.rules_file,
+                "rules": len(ruleset.rules),
+                "previous_version": previous,
+                "version": ruleset.version,
+            })
+            return True
+        finally:
+            self._reload_lock.release()
 
     def categorize(self, merchant_name, description):
         text = ' '.join(filter(None, [merchant_name or '', description or '']))
-        for pattern, category in self.RULES:
-            if pattern.search(text):
-                return category
-        return 'Other'
+        return self.current_ruleset().matcher.match(text) or self.DEFAULT_CATEGORY
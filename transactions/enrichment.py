@@ -0,0 +1,440 @@
+import asyncio
+import datetime
+import logging
+import queue
+import random
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import count
+
+from django.conf import settings
+from django.db import connection, transaction as db_transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .categorization_cache import get_enrichment_categorizer
+from .metrics import ENRICHMENT_STAGE_SECONDS
+from .models import Transaction
+from .progress import move_batch_counters
+from .rollups import apply_rollup_changes
+
+logger = logging.getLogger("")
+
+DEFAULT_FLUSH_ROWS = 200
+DEFAULT_FLUSH_SECONDS = 2.0
+DEFAULT_CLAIM_TIMEOUT = 600
+DEFAULT_EXECUTOR = 'threads'
+DEFAULT_MAX_IN_FLIGHT = 16
+DEFAULT_CALL_TIMEOUT = 5.0
+# How long past the call timeout the asyncio executor waits for its loop thread.
+LOOP_GRACE_SECONDS = 1.0
+DEFAULT_CATEGORIZE_BATCH_SIZE = 50
+
+RESULT_FIELDS = ['category', 'ingestion_status', 'updated_at']
+
+
+def claimable_filter():
+    """
+    Rows a worker may claim: pending or failed rows, plus rows stuck in `processing`
+    longer than ENRICHMENT_CLAIM_TIMEOUT (their worker died before flushing).
+    """
+    timeout = getattr(settings, 'ENRICHMENT_CLAIM_TIMEOUT', DEFAULT_CLAIM_TIMEOUT)
+    stale_before = timezone.now() - datetime.timedelta(seconds=timeout)
+    return (
+        Q(ingestion_status__in=[Transaction.INGESTION_STATUS_PENDING, Transaction.INGESTION_STATUS_FAILED])
+        | Q(ingestion_status=Transaction.INGESTION_STATUS_PROCESSING, updated_at__lt=stale_before)
+    )
+
+
+def claim_transactions(batch, transaction_ids):
+    """
+    Atomically flip claimable rows to `processing` and return them.
+
+    On PostgreSQL this is a single UPDATE ... FROM (SELECT ... FOR UPDATE SKIP LOCKED)
+    RETURNING, so concurrent workers never claim the same row. Other backends select the
+    ids and update them inside one transaction.
+    """
+    now = timezone.now()
+    with db_transaction.atomic():
+        candidates = (
+            batch.transactions
+            .filter(claimable_filter(), id__in=transaction_ids)
+            .select_for_update(skip_locked=True)
+        )
+        if connection.vendor == 'postgresql':
+            # The FROM subquery locks the rows and carries their status from before the claim.
+            subquery, params = candidates.values('id', 'ingestion_status').query.sql_with_params()
+            table = connection.ops.quote_name(Transaction._meta.db_table)
+            claimed = list(Transaction.objects.raw(
+                f"UPDATE {table} t SET ingestion_status = %s, updated_at = %s "
+                f"FROM ({subquery}) AS c (id, previous_status) WHERE t.id = c.id "
+                f"RETURNING t.id, t.transaction_id, t.account_id, t.amount, t.date, t.merchant_name, "
+                f"t.description, t.category, t.batch_id, c.previous_status",
+                [Transaction.INGESTION_STATUS_PROCESSING, now, *params],
+            ))
+            previous = Counter(tx.previous_status for tx in claimed)
+        else:
+            rows = list(candidates.values_list('id', 'ingestion_status'))
+            ids = [pk for pk, _ in rows]
+            Transaction.objects.filter(id__in=ids).update(
+                ingestion_status=Transaction.INGESTION_STATUS_PROCESSING, updated_at=now
+            )
+            claimed = list(
+                Transaction.objects
+                .filter(id__in=ids)
+                .only('id', 'transaction_id', 'account_id', 'amount', 'date', 'merchant_name', 'description',
+                      'category', 'batch_id')
+            )
+            statuses = dict(rows)
+            for tx in claimed:
+                tx.previous_status = statuses[tx.id]
+            previous = Counter(statuses.values())
+        for tx in claimed:
+            # The rollup group the row sits in until its result is flushed.
+            tx.claimed_category = tx.category
+        # Status counts in the summary's rollups and the batch's progress move with the claim.
+        # The claim is transient, so it does not invalidate cached summaries; the flush does.
+        apply_rollup_changes(
+            (
+                (tx.account_id, tx.date, tx.amount, (tx.category, tx.previous_status),
+                 (tx.category, Transaction.INGESTION_STATUS_PROCESSING))
+                for tx in claimed
+            ),
+            bump=False,
+        )
+        move_batch_counters(batch.pk, {
+            (status, Transaction.INGESTION_STATUS_PROCESSING): rows for status, rows in previous.items()
+        })
+        return claimed
+
+
+class ResultWriter:
+    """Buffers enrichment results and writes them with bulk_update every N rows or T seconds."""
+
+    def __init__(self, flush_rows=None, flush_seconds=None):
+        self.flush_rows = flush_rows or getattr(settings, 'ENRICHMENT_FLUSH_ROWS', DEFAULT_FLUSH_ROWS)
+        self.flush_seconds = flush_seconds or getattr(settings, 'ENRICHMENT_FLUSH_SECONDS', DEFAULT_FLUSH_SECONDS)
+        self.pending = []
+        self.last_flush = time.monotonic()
+        self.flushes = 0
+
+    def add(self, tx):
+        self.pending.append(tx)
+        if len(self.pending) >= self.flush_rows or time.monotonic() - self.last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            start = time.perf_counter()
+            now = timezone.now()
+            for tx in self.pending:
+                tx.updated_at = now
+            with db_transaction.atomic():
+                Transaction.objects.bulk_update(self.pending, RESULT_FIELDS, batch_size=self.flush_rows)
+                apply_rollup_changes(
+                    (tx.account_id, tx.date, tx.amount,
+                     (tx.claimed_category, Transaction.INGESTION_STATUS_PROCESSING),
+                     (tx.category, tx.ingestion_status))
+                    for tx in self.pending
+                )
+                # Results only land on claimed rows, so every one leaves `processing`.
+                transitions = {}
+                for tx in self.pending:
+                    key = (Transaction.INGESTION_STATUS_PROCESSING, tx.ingestion_status)
+                    transitions.setdefault(tx.batch_id, Counter())[key] += 1
+                for batch_pk in sorted(transitions):
+                    move_batch_counters(batch_pk, transitions[batch_pk])
+            ENRICHMENT_STAGE_SECONDS.labels('flush').observe(time.perf_counter() - start)
+            self.pending = []
+            self.flushes += 1
+        self.last_flush = time.monotonic()
+
+
+class SimulatedEnrichmentClient:
+    """Stand-in for the external enrichment service: only adds latency."""
+
+    latency = (0.5, 1.0)
+
+    def call(self, tx):
+        time.sleep(random.uniform(*self.latency))
+
+    async def acall(self, tx):
+        await asyncio.sleep(random.uniform(*self.latency))
+
+
+class SerialExecutor:
+    """One call at a time on the task thread. The timeout cannot interrupt a blocking call."""
+
+    def __init__(self, max_in_flight=1, timeout=None):
+        self.timeout = timeout
+
+    def run(self, client, items):
+        for item in items:
+            start = time.monotonic()
+            try:
+                client.call(item)
+            except Exception as e:
+                yield item, e, time.monotonic() - start
+            else:
+                yield item, None, time.monotonic() - start
+
+
+class ThreadPoolEnrichmentExecutor:
+    """
+    Runs client.call in a bounded thread pool and yields results in completion order.
+
+    At most `max_in_flight` calls run at once; a call exceeding `timeout` is reported as
+    TimeoutError. Its thread is abandoned, not killed, and keeps its slot until the call
+    returns, so no new call queues behind it. The timeout clock starts when a worker
+    begins the call. If every slot is held by an abandoned call for another `timeout`,
+    the remaining items are reported as TimeoutError without being sent.
+    """
+
+    def __init__(self, max_in_flight, timeout):
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+
+    def run(self, client, items):
+        pending = deque(items)
+        pool = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix='enrichment')
+        keys = count()
+        in_flight = {}  # future -> (key, item)
+        started = {}  # key -> when the worker began the call
+        abandoned = set()  # timed-out futures whose thread is still in the call
+
+        def call(key, item):
+            started[key] = time.monotonic()
+            return client.call(item)
+
+        def fill():
+            while pending and len(in_flight) + len(abandoned) < self.max_in_flight:
+                key, item = next(keys), pending.popleft()
+                in_flight[pool.submit(call, key, item)] = (key, item)
+
+        try:
+            fill()
+            while in_flight or pending:
+                deadlines = [started[key] + self.timeout for key, _ in in_flight.values() if key in started]
+                remaining = max(0.0, min(deadlines) - time.monotonic()) if deadlines else self.timeout
+                done, _ = wait([*in_flight, *abandoned], timeout=remaining, return_when=FIRST_COMPLETED)
+                now = time.monotonic()
+                abandoned -= done
+                for future in [future for future in done if future in in_flight]:
+                    key, item = in_flight.pop(future)
+                    yield item, future.exception(), now - started.get(key, now)
+                for future, (key, item) in list(in_flight.items()):
+                    if key in started and now - started[key] >= self.timeout:
+                        del in_flight[future]
+                        abandoned.add(future)
+                        yield item, TimeoutError(f"enrichment call exceeded {self.timeout}s"), now - started[key]
+                if pending and not in_flight and not done:
+                    # Every slot is still held by a call that already timed out.
+                    while pending:
+                        yield pending.popleft(), TimeoutError(
+                            f"no enrichment slot freed within {self.timeout}s; {len(abandoned)} calls hung"
+                        ), 0.0
+                fill()
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+class AsyncioEnrichmentExecutor:
+    """
+    Runs client.acall on an event loop in a helper thread, bounded by a semaphore.
+
+    Results are handed back through a queue so the caller (and its DB connection)
+    stays on the task thread, outside any async context. Every call reports a result,
+    whatever it raises; if none arrives within `timeout` plus a grace period, the
+    missing items are reported as TimeoutError. Closing the generator early cancels
+    the calls still on the loop.
+    """
+
+    def __init__(self, max_in_flight, timeout):
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+
+    def run(self, client, items):
+        items = list(items)
+        results = queue.Queue()
+
+        async def one(semaphore, index, item):
+            async with semaphore:
+                start = time.monotonic()
+                try:
+                    await asyncio.wait_for(client.acall(item), self.timeout)
+                except Exception as e:
+                    results.put((index, e, time.monotonic() - start))
+                except BaseException as e:
+                    # CancelledError and friends: still report the row, then let it propagate.
+                    results.put((index, e, time.monotonic() - start))
+                    raise
+                else:
+                    results.put((index, None, time.monotonic() - start))
+
+        async def main():
+            semaphore = asyncio.Semaphore(self.max_in_flight)
+            # return_exceptions: a call that raises CancelledError must not end the others early.
+            await asyncio.gather(
+                *(one(semaphore, index, item) for index, item in enumerate(items)), return_exceptions=True
+            )
+
+        loop = asyncio.new_event_loop()
+        task = loop.create_task(main())
+
+        def run_loop():
+            try:
+                loop.run_until_complete(task)
+            except BaseException:
+                pass  # each call already reported its own outcome
+            finally:
+                loop.close()
+
+        loop_thread = threading.Thread(target=run_loop, name='enrichment-loop', daemon=True)
+        loop_thread.start()
+        unreported = set(range(len(items)))
+        try:
+            while unreported:
+                try:
+                    index, error, elapsed = results.get(timeout=self.timeout + LOOP_GRACE_SECONDS)
+                except queue.Empty:
+                    waited = self.timeout + LOOP_GRACE_SECONDS
+                    for index in sorted(unreported):
+                        yield items[index], TimeoutError(f"no enrichment result within {waited}s"), waited
+                    unreported.clear()
+                    break
+                unreported.discard(index)
+                yield items[index], error, elapsed
+        finally:
+            if loop_thread.is_alive():
+                try:
+                    loop.call_soon_threadsafe(task.cancel)
+                except RuntimeError:
+                    pass  # the loop closed in the meantime
+            loop_thread.join(timeout=LOOP_GRACE_SECONDS)
+
+
+EXECUTORS = {
+    'serial': SerialExecutor,
+    'threads': ThreadPoolEnrichmentExecutor,
+    'asyncio': AsyncioEnrichmentExecutor,
+}
+
+
+def get_executor():
+    mode = getattr(settings, 'ENRICHMENT_EXECUTOR', DEFAULT_EXECUTOR)
+    return EXECUTORS[mode](
+        max_in_flight=getattr(settings, 'ENRICHMENT_MAX_IN_FLIGHT', DEFAULT_MAX_IN_FLIGHT),
+        timeout=getattr(settings, 'ENRICHMENT_CALL_TIMEOUT', DEFAULT_CALL_TIMEOUT),
+    )
+
+
+class CategorizeBuffer:
+    """
+    Collects rows whose external call succeeded and categorizes them with
+    categorize_many() in batches of ENRICHMENT_CATEGORIZE_BATCH_SIZE.
+
+    If a batched call raises, the rows are retried one by one so a single bad row
+    only fails itself. `on_result(tx, elapsed, error)` receives every outcome.
+    """
+
+    def __init__(self, categorizer, on_result, batch_size=None):
+        self.categorizer = categorizer
+        self.on_result = on_result
+        self.batch_size = batch_size or getattr(
+            settings, 'ENRICHMENT_CATEGORIZE_BATCH_SIZE', DEFAULT_CATEGORIZE_BATCH_SIZE
+        )
+        self.pending = []
+
+    def add(self, tx, elapsed):
+        self.pending.append((tx, elapsed))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        rows, self.pending = self.pending, []
+        if not rows:
+            return
+        with ENRICHMENT_STAGE_SECONDS.labels('categorize').time():
+            outcomes = self._categorize(rows)
+        for tx, elapsed, error in outcomes:
+            self.on_result(tx, elapsed, error)
+
+    def _categorize(self, rows):
+        """(tx, elapsed, error) per row. Reported after timing, so flushes triggered by on_result don't count."""
+        try:
+            categories = self.categorizer.categorize_many(
+                [(tx.merchant_name, tx.description) for tx, _ in rows]
+            )
+        except Exception:
+            outcomes = []
+            for tx, elapsed in rows:
+                try:
+                    tx.category = self.categorizer.categorize(tx.merchant_name, tx.description)
+                except Exception as e:
+                    outcomes.append((tx, elapsed, e))
+                else:
+                    outcomes.append((tx, elapsed, None))
+            return outcomes
+        outcomes = []
+        for (tx, elapsed), category in zip(rows, categories):
+            tx.category = category
+            outcomes.append((tx, elapsed, None))
+        return outcomes
+
+
+def enrich_transactions(batch, transaction_ids, correlation_id, client=None, categorizer=None):
+    """Enrich the given transactions of a batch; returns per-status counts for this call."""
+    categorizer = categorizer or get_enrichment_categorizer()
+    client = client or SimulatedEnrichmentClient()
+    counts = {"completed": 0, "failed": 0, "skipped": 0}
+
+    with ENRICHMENT_STAGE_SECONDS.labels('claim').time():
+        claimed = claim_transactions(batch, transaction_ids)
+    counts["skipped"] = len(transaction_ids) - len(claimed)
+    writer = ResultWriter()
+
+    def record(tx, elapsed, error):
+        tx_info = {
+            "correlation_id": correlation_id,
+            "batch_id": str(batch.batch_id),
+            "transaction_id": tx.transaction_id
+        }
+        if error is None:
+            tx.ingestion_status = Transaction.INGESTION_STATUS_COMPLETED
+            counts["completed"] += 1
+            logger.info(
+                "transaction_completed",
+                extra={**tx_info, "duration_sec": round(elapsed, 4)}
+            )
+        else:
+            logger.error(
+                "transaction_failed",
+                exc_info=error,
+                extra={**tx_info, "error": str(error), "duration_sec": round(elapsed, 4)}
+            )
+            tx.ingestion_status = Transaction.INGESTION_STATUS_FAILED
+            counts["failed"] += 1
+        writer.add(tx)
+
+    categorize = CategorizeBuffer(categorizer, record)
+
+    # External calls run concurrently; categorization and writes stay on this thread.
+    # Each row succeeds or fails on its own; results are written in bulk.
+    external_call = ENRICHMENT_STAGE_SECONDS.labels('external_call')
+    for tx, error, elapsed in get_executor().run(client, claimed):
+        external_call.observe(elapsed)
+        if error is not None:
+            record(tx, elapsed, error)
+        else:
+            categorize.add(tx, elapsed)
+
+    categorize.flush()
+    writer.flush()
+    if hasattr(categorizer, 'stats'):
+        logger.info(
+            "categorization_cache_stats",
+            extra={"correlation_id": correlation_id, "batch_id": str(batch.batch_id), **categorizer.stats()}
+        )
+    return counts
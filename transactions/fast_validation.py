@@ -0,0 +1,333 @@
+"""
+Compiled fast-path validation for the ingest hot path.
+
+`fast_validator_class(SerializerClass)` compiles a DRF serializer once per process into
+plain per-field check functions. A check either returns the value DRF would produce or
+`_FALLBACK`, in which case the original DRF field validates that single value, so
+invalid input yields exactly the errors the serializer would have raised. Well-formed
+rows never touch DRF field machinery, OrderedDicts or error dicts.
+"""
+import decimal
+from collections.abc import Mapping
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import ISO_8601, serializers
+from rest_framework.exceptions import ErrorDetail, ValidationError
+from rest_framework.fields import SkipField, empty, get_error_detail
+from rest_framework.settings import api_settings
+
+from .serializers import list_errors
+
+VALIDATOR_DRF = 'drf'
+VALIDATOR_FAST = 'fast'
+# The canonical default when settings.INGEST_VALIDATOR is unset; project/settings.py matches it.
+DEFAULT_VALIDATOR = VALIDATOR_FAST
+
+_FALLBACK = object()
+
+
+def _always_fallback(value):
+    return _FALLBACK
+
+
+def _iso_only(formats):
+    return [f.lower() for f in formats] == [ISO_8601]
+
+
+def _char_check(field):
+    expected_validators = 2 + (field.max_length is not None)  # null / surrogate characters
+    if (type(field) is not serializers.CharField or not field.trim_whitespace
+            or field.min_length is not None or len(field.validators) != expected_validators):
+        return _always_fallback
+    max_length, allow_blank, allow_null = field.max_length, field.allow_blank, field.allow_null
+
+    def check(value):
+        # ASCII without NUL cannot trip the null/surrogate character validators.
+        if type(value) is str and value.isascii() and '\x00' not in value:
+            value = value.strip()
+            if value:
+                if max_length is None or len(value) <= max_length:
+                    return value
+            elif allow_blank:
+                return ''
+        elif value is None and allow_null:
+            return None
+        return _FALLBACK
+    return check
+
+
+def _decimal_check(field):
+    if (type(field) is not serializers.DecimalField or field.localize or field.validators
+            or field.max_digits is None or field.decimal_places is None):
+        return _always_fallback
+    max_digits, max_places, max_whole = field.max_digits, field.decimal_places, field.max_whole_digits
+    quantum = decimal.Decimal('.1') ** max_places
+    rounding = field.rounding
+    context = decimal.getcontext().copy()
+    context.prec = max_digits
+
+    def check(value):
+        if type(value) not in (str, int, float):
+            return _FALLBACK
+        text = str(value).strip()
+        if len(text) > field.MAX_STRING_LENGTH:
+            return _FALLBACK
+        try:
+            number = decimal.Decimal(text)
+        except decimal.DecimalException:
+            return _FALLBACK
+        if not number.is_finite():
+            return _FALLBACK
+        _, digits, exponent = number.as_tuple()
+        if exponent >= 0:
+            total = whole = len(digits) + exponent
+            places = 0
+        elif len(digits) > -exponent:
+            total = len(digits)
+            places = -exponent
+            whole = total - places
+        else:
+            total = places = -exponent
+            whole = 0
+        if total > max_digits or places > max_places or whole > max_whole:
+            return _FALLBACK
+        return number.quantize(quantum, rounding=rounding, context=context)
+    return check
+
+
+def _datetime_check(field):
+    input_formats = getattr(field, 'input_formats', api_settings.DATETIME_INPUT_FORMATS)
+    if type(field) is not serializers.DateTimeField or field.validators or not _iso_only(input_formats):
+        return _always_fallback
+    allow_null = field.allow_null
+
+    def check(value):
+        if type(value) is str:
+            try:
+                parsed = parse_datetime(value)
+            except (ValueError, TypeError):
+                return _FALLBACK
+            # Naive datetimes need make_aware() validity checks; leave them to DRF.
+            if parsed is not None and parsed.utcoffset() is not None:
+                tz = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+                if tz is not None:
+                    try:
+                        return parsed.astimezone(tz)
+                    except OverflowError:
+                        return _FALLBACK
+        elif value is None and allow_null:
+            return None
+        return _FALLBACK
+    return check
+
+
+def _date_check(field):
+    input_formats = getattr(field, 'input_formats', api_settings.DATE_INPUT_FORMATS)
+    if type(field) is not serializers.DateField or field.validators or not _iso_only(input_formats):
+        return _always_fallback
+    allow_null = field.allow_null
+
+    def check(value):
+        if type(value) is str:
+            try:
+                parsed = parse_date(value)
+            except (ValueError, TypeError):
+                return _FALLBACK
+            if parsed is not None:
+                return parsed
+        elif value is None and allow_null:
+            return None
+        return _FALLBACK
+    return check
+
+
+def _boolean_check(field):
+    if type(field) is not serializers.BooleanField or field.validators:
+        return _always_fallback
+    allow_null = field.allow_null
+
+    def check(value):
+        if value is True or value is False or (value is None and allow_null):
+            return value
+        return _FALLBACK
+    return check
+
+
+def _integer_check(field):
+    if type(field) is not serializers.IntegerField or field.validators:
+        return _always_fallback
+
+    def check(value):
+        return value if type(value) is int else _FALLBACK
+    return check
+
+
+FIELD_COMPILERS = {
+    serializers.CharField: _char_check,
+    serializers.DecimalField: _decimal_check,
+    serializers.DateTimeField: _datetime_check,
+    serializers.DateField: _date_check,
+    serializers.BooleanField: _boolean_check,
+    serializers.IntegerField: _integer_check,
+}
+
+
+def compile_field(field):
+    if isinstance(field, serializers.ListSerializer):
+        return CompiledList(field)
+    compiler = FIELD_COMPILERS.get(type(field))
+    return compiler(field) if compiler else _always_fallback
+
+
+class CompiledSerializer:
+    """Mirrors Serializer.run_validation for a bound serializer instance."""
+
+    def __init__(self, serializer):
+        self.serializer = serializer
+        self.fields = []
+        self.exact = not serializer.validators
+        for name, field in serializer.fields.items():
+            if field.read_only:
+                continue
+            if field.source_attrs != [name]:
+                self.exact = False
+            self.fields.append((name, field, compile_field(field)))
+        self.validate = None
+        if type(serializer).validate is not serializers.Serializer.validate:
+            self.validate = serializer.validate
+
+    def run(self, data):
+        if not self.exact or not isinstance(data, Mapping):
+            return self.serializer.run_validation(data)
+
+        ret = {}
+        errors = {}
+        for name, field, check in self.fields:
+            value = data.get(name, empty)
+            try:
+                validated = _FALLBACK if value is empty else check(value)
+                if validated is _FALLBACK:
+                    validated = field.run_validation(value)
+            except ValidationError as exc:
+                errors[name] = exc.detail
+            except DjangoValidationError as exc:
+                errors[name] = get_error_detail(exc)
+            except SkipField:
+                pass
+            else:
+                ret[name] = validated
+        if errors:
+            raise ValidationError(errors)
+
+        if self.validate is not None:
+            try:
+                ret = self.validate(ret)
+            except (ValidationError, DjangoValidationError) as exc:
+                raise ValidationError(detail=serializers.as_serializer_error(exc))
+        return ret
+
+
+class CompiledList:
+    """Mirrors ListSerializer.run_validation; non-list input is handed back to DRF."""
+
+    def __init__(self, list_serializer):
+        self.list_serializer = list_serializer
+        self.exact = (
+            type(list_serializer) is serializers.ListSerializer
+            and isinstance(list_serializer.child, serializers.Serializer)
+            and list_serializer.allow_empty
+            and getattr(list_serializer, 'max_length', None) is None
+            and getattr(list_serializer, 'min_length', None) is None
+            and not list_serializer.validators
+        )
+        self.child = CompiledSerializer(list_serializer.child) if self.exact else None
+
+    def __call__(self, value):
+        if not self.exact or type(value) is not list:
+            return _FALLBACK
+        ret = []
+        errors = {}
+        run = self.child.run
+        for index, item in enumerate(value):
+            try:
+                ret.append(run(item))
+            except ValidationError as exc:
+                errors[index] = exc.detail
+        if errors:
+            raise ValidationError(list_errors(errors, len(value)))
+        return ret
+
+    def run(self, data):
+        result = self(data)
+        if result is _FALLBACK:
+            return self.list_serializer.run_validation(data)
+        return result
+
+
+class FastValidator:
+    """Serializer-compatible facade: is_valid(), errors, validated_data."""
+
+    serializer_class = None
+    _compiled = None
+    _compiled_many = None
+
+    def __init__(self, data=empty, many=False):
+        self.initial_data = data
+        self.many = many
+
+    @classmethod
+    def compiled(cls, many=False):
+        # Built lazily and cached per class; field objects are only read during validation.
+        if many:
+            if cls._compiled_many is None:
+                cls._compiled_many = CompiledList(cls.serializer_class(many=True))
+            return cls._compiled_many
+        if cls._compiled is None:
+            cls._compiled = CompiledSerializer(cls.serializer_class())
+        return cls._compiled
+
+    def is_valid(self, *, raise_exception=False):
+        if not hasattr(self, '_validated_data'):
+            try:
+                self._validated_data = self.compiled(self.many).run(self.initial_data)
+            except ValidationError as exc:
+                self._validated_data = [] if self.many else {}
+                self._errors = exc.detail
+            else:
+                self._errors = [] if self.many else {}
+
+        if self._errors and raise_exception:
+            raise ValidationError(self.errors)
+        return not bool(self._errors)
+
+    @property
+    def errors(self):
+        ret = self._errors
+        if isinstance(ret, list) and len(ret) == 1 and getattr(ret[0], 'code', None) == 'null':
+            # Same edge case as Serializer.errors when no data is passed.
+            ret = {api_settings.NON_FIELD_ERRORS_KEY: [ErrorDetail('No data provided', code='null')]}
+        return ret
+
+    @property
+    def validated_data(self):
+        return self._validated_data
+
+
+_fast_classes = {}
+
+
+def fast_validator_class(serializer_class):
+    if serializer_class not in _fast_classes:
+        _fast_classes[serializer_class] = type(
+            f'Fast{serializer_class.__name__}', (FastValidator,), {'serializer_class': serializer_class}
+        )
+    return _fast_classes[serializer_class]
+
+
+def get_validator_class(serializer_class):
+    """Return the serializer itself or its compiled twin, per settings.INGEST_VALIDATOR."""
+    if getattr(settings, 'INGEST_VALIDATOR', DEFAULT_VALIDATOR) == VALIDATOR_FAST:
+        return fast_validator_class(serializer_class)
+    return serializer_class
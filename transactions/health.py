@@ -0,0 +1,120 @@
+"""
+Readiness checks behind /api/health/ready.
+
+The database and Redis checks run in parallel, each on its own single-thread executor, and
+each has HEALTH_CHECK_TIMEOUT to answer; a check still running then is reported as a
+timeout. A check that has not returned is not submitted again: later probes wait on the
+same call, so a hung dependency holds one thread, and the probe after it recovers gets a
+fresh answer. The checks carry their own timeouts too (PostgreSQL statement_timeout, the
+Redis pool's socket timeouts, the database connect_timeout). The combined result is
+reused for HEALTH_CACHE_SECONDS, so load balancers and orchestrators probing every second
+cost one round trip per dependency per process, not one per probe; probes that arrive
+while it is being refreshed wait for that refresh instead of starting their own.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import close_old_connections, connection, connections, transaction
+
+from project.connections import redis_client
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 1.0
+DEFAULT_CACHE_SECONDS = 2.0
+
+_executors = {}
+_running = {}
+_cached = None
+_cached_until = 0.0
+_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+
+
+def check_timeout():
+    return getattr(settings, 'HEALTH_CHECK_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def check_database():
+    # The check thread keeps its own persistent connection; drop it if broken or expired.
+    close_old_connections()
+    with transaction.atomic(), connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SET LOCAL statement_timeout = %s", [max(1, int(check_timeout() * 1000))])
+        cursor.execute("SELECT 1")
+
+
+def check_redis():
+    # The shared pool's socket timeouts (REDIS_SOCKET_TIMEOUT) bound connect and reply.
+    redis_client().ping()
+
+
+CHECKS = {
+    "database": check_database,
+    "redis": check_redis,
+}
+
+
+def _submit(name, check):
+    """The check's running call if it has not returned yet, else a new one."""
+    future = _running.get(name)
+    if future is None or future.done():
+        executor = _executors.get(name)
+        if executor is None:
+            executor = _executors[name] = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'health-{name}')
+        future = _running[name] = executor.submit(check)
+    return future
+
+
+def run_checks(timeout=None):
+    """Run every check in parallel; returns {name: "ok" | "error: ..."}."""
+    timeout = timeout if timeout is not None else check_timeout()
+    with _lock:
+        futures = {name: _submit(name, check) for name, check in CHECKS.items()}
+    wait(futures.values(), timeout=timeout)
+    results = {}
+    for name, future in futures.items():
+        if not future.done():
+            error = f"timed out after {timeout}s"
+        elif future.exception() is not None:
+            error = str(future.exception())
+        else:
+            results[name] = "ok"
+            continue
+        logger.error(f"{name}_unhealthy", extra={"error": error})
+        results[name] = f"error: {error}"
+    return results
+
+
+def readiness():
+    """Cached check results and whether they were served from the cache."""
+    global _cached, _cached_until
+    # Single flight: probes arriving while the cache is refreshed wait for that result
+    # instead of each running the checks.
+    with _refresh_lock:
+        with _lock:
+            if _cached is not None and time.monotonic() < _cached_until:
+                return _cached, True
+        results = run_checks()
+        with _lock:
+            _cached = results
+            _cached_until = time.monotonic() + getattr(settings, 'HEALTH_CACHE_SECONDS', DEFAULT_CACHE_SECONDS)
+    return results, False
+
+
+def reset():
+    """Forget cached results and running checks, and close the check threads' connections."""
+    global _cached, _cached_until
+    with _lock:
+        _cached, _cached_until = None, 0.0
+        executors = list(_executors.values())
+        _executors.clear()
+        _running.clear()
+    closing = [executor.submit(connections.close_all) for executor in executors]
+    for executor in executors:
+        executor.shutdown(wait=False)
+    # A hung check delays its thread's close; do not wait on it for long.
+    wait(closing, timeout=check_timeout())
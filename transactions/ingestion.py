@@ -0,0 +1,296 @@
+import logging
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import IntegrityError, transaction as db_transaction
+
+from .models import Account, Batch, Transaction
+from .fast_validation import get_validator_class
+from .progress import move_batch_counters
+from .rollups import apply_rollup_changes
+from .serializers import AccountSerializer, TransactionItemSerializer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INSERT_CHUNK_SIZE = 2000
+DEFAULT_STREAM_CHUNK_SIZE = 1000
+
+ACCOUNT_UPSERT_FIELDS = ['name', 'mask', 'updated_at']
+
+
+@dataclass
+class IngestResult:
+    batch: Batch
+    received: int
+    inserted: int
+    duplicates: int
+
+
+def insert_chunk_size():
+    return getattr(settings, 'INGEST_INSERT_CHUNK_SIZE', DEFAULT_INSERT_CHUNK_SIZE)
+
+
+def upsert_accounts(accounts):
+    """
+    Resolve payload accounts to {account_id: pk} with a constant number of queries.
+
+    Existing accounts are fetched in one query; new accounts and accounts whose
+    name/mask changed are written with a single INSERT ... ON CONFLICT DO UPDATE.
+    """
+    payload = {}
+    for acc in accounts:
+        payload[acc['account_id']] = acc
+
+    existing = {
+        row['account_id']: row
+        for row in Account.objects
+        .filter(account_id__in=list(payload))
+        .values('id', 'account_id', 'name', 'mask')
+    }
+
+    to_upsert = []
+    for account_id, acc in payload.items():
+        current = existing.get(account_id)
+        if current is not None and current['name'] == acc['name'] and current['mask'] == acc.get('mask'):
+            continue
+        to_upsert.append(Account(
+            account_id=account_id,
+            name=acc['name'],
+            type=acc['type'],
+            subtype=acc.get('subtype'),
+            mask=acc.get('mask'),
+        ))
+
+    ids = {account_id: row['id'] for account_id, row in existing.items()}
+    if to_upsert:
+        Account.objects.bulk_create(
+            to_upsert,
+            update_conflicts=True,
+            unique_fields=['account_id'],
+            update_fields=ACCOUNT_UPSERT_FIELDS,
+        )
+        missing = [a.account_id for a in to_upsert if a.account_id not in ids]
+        if missing:
+            ids.update(
+                Account.objects
+                .filter(account_id__in=missing)
+                .values_list('account_id', 'id')
+            )
+    return ids
+
+
+def build_transaction(tx, account_pk, batch):
+    return Transaction(
+        transaction_id=tx['transaction_id'],
+        account_id=account_pk,
+        amount=tx['amount'],
+        currency=tx['iso_currency_code'],
+        date=tx['date'],
+        authorized_date=tx.get('authorized_date'),
+        merchant_name=tx.get('merchant_name') or tx.get('name'),
+        description=tx.get('name'),
+        ingestion_status=Transaction.INGESTION_STATUS_PENDING,
+        batch=batch,
+    )
+
+
+def resolve_account_ids(account_ids):
+    """Map already-persisted account_ids to pks in one query."""
+    return dict(
+        Account.objects
+        .filter(account_id__in=list(account_ids))
+        .values_list('account_id', 'id')
+    )
+
+
+def insert_transactions(transactions, account_ids, batch, chunk_size=None, owned=0):
+    """
+    Insert transactions that do not exist yet and return how many rows this batch now owns.
+
+    Known transaction_ids are filtered with one bulk lookup, the remainder goes out as
+    multi-row INSERT ... ON CONFLICT DO NOTHING so concurrent ingests of the same
+    transaction_id cannot fail the batch. `owned` is the row count the batch already had
+    from earlier calls (streamed ingestion). Must run inside the caller's atomic block.
+    """
+    chunk_size = chunk_size or insert_chunk_size()
+
+    unique = {}
+    for tx in transactions:
+        if tx['account_id'] not in account_ids:
+            raise IntegrityError(f"Account {tx['account_id']} missing in payload")
+        unique.setdefault(tx['transaction_id'], tx)
+
+    existing = set()
+    tx_ids = list(unique)
+    for start in range(0, len(tx_ids), chunk_size):
+        existing.update(
+            Transaction.objects
+            .filter(transaction_id__in=tx_ids[start:start + chunk_size])
+            .values_list('transaction_id', flat=True)
+        )
+
+    new_objs = [
+        build_transaction(tx, account_ids[tx['account_id']], batch)
+        for transaction_id, tx in unique.items()
+        if transaction_id not in existing
+    ]
+    if not new_objs:
+        return owned
+
+    Transaction.objects.bulk_create(new_objs, batch_size=chunk_size, ignore_conflicts=True)
+    # ignore_conflicts gives no per-row feedback; rows that lost a race to another batch
+    # are not attached to ours, so re-checking just the ids we tried to insert is exact.
+    new_ids = [obj.transaction_id for obj in new_objs]
+    ours = set()
+    for start in range(0, len(new_ids), chunk_size):
+        ours.update(
+            Transaction.objects
+            .filter(batch=batch, transaction_id__in=new_ids[start:start + chunk_size])
+            .values_list('transaction_id', flat=True)
+        )
+    # Only rows this batch inserted enter the daily rollups, in the same transaction.
+    apply_rollup_changes(
+        (obj.account_id, obj.date, obj.amount, None, (obj.category, obj.ingestion_status))
+        for obj in new_objs
+        if obj.transaction_id in ours
+    )
+    move_batch_counters(batch.pk, {(None, Transaction.INGESTION_STATUS_PENDING): len(ours)})
+    return owned + len(ours)
+
+
+def ingest_batch(data, chunk_size=None):
+    """
+    Set-based ingestion of a validated IngestBatchSerializer payload.
+
+    Must be called inside a transaction; the whole batch commits or rolls back together.
+    """
+    transactions = data['transactions']
+    batch = Batch.objects.create(
+        request_id=data.get('request_id'),
+        total_transactions=len(transactions),
+    )
+    account_ids = upsert_accounts(data['accounts'])
+    inserted = insert_transactions(transactions, account_ids, batch, chunk_size=chunk_size)
+
+    return IngestResult(
+        batch=batch,
+        received=len(transactions),
+        inserted=inserted,
+        duplicates=len(transactions) - inserted,
+    )
+
+
+class StreamRecordError(Exception):
+    """A streamed record failed validation; chunks before it are already committed."""
+
+    def __init__(self, line, errors):
+        super().__init__(f"line {line}: {errors}")
+        self.line = line
+        self.errors = errors
+
+
+def stream_chunk_size():
+    return getattr(settings, 'INGEST_STREAM_CHUNK_SIZE', DEFAULT_STREAM_CHUNK_SIZE)
+
+
+class StreamIngestor:
+    """
+    Ingests an unbounded stream of NDJSON records into one batch, committing per chunk.
+
+    Records carrying a `transaction_id` are validated with TransactionItemSerializer,
+    all others with AccountSerializer. Accounts may be declared earlier in the stream
+    or already exist in the database. Only the current chunk and the account_id -> pk
+    map are held in memory, so peak memory does not depend on the stream length.
+    """
+
+    def __init__(self, request_id=None, chunk_size=None):
+        self.chunk_size = chunk_size or stream_chunk_size()
+        self.batch = Batch.objects.create(request_id=request_id, total_transactions=0)
+        self.account_ids = {}
+        self.received = 0
+        self.owned = 0
+        self.chunks = 0
+        # Summed over chunks for the per-request ingest metrics.
+        self.validation_seconds = 0.0
+        self.write_seconds = 0.0
+
+    def consume(self, records):
+        """Consume (line_number, record) tuples, e.g. from NDJSONParser."""
+        chunk = []
+        for item in records:
+            chunk.append(item)
+            if len(chunk) >= self.chunk_size:
+                self.ingest_chunk(chunk)
+                chunk = []
+        if chunk:
+            self.ingest_chunk(chunk)
+
+    def ingest_chunk(self, chunk):
+        start = time.perf_counter()
+        try:
+            accounts, transactions, tx_lines = self.validate_chunk(chunk)
+        finally:
+            self.validation_seconds += time.perf_counter() - start
+
+        start = time.perf_counter()
+        try:
+            with db_transaction.atomic():
+                self.resolve_accounts(accounts, transactions, tx_lines)
+                self.owned = insert_transactions(transactions, self.account_ids, self.batch, owned=self.owned)
+                self.received += len(transactions)
+                Batch.objects.filter(pk=self.batch.pk).update(total_transactions=self.received)
+        finally:
+            self.write_seconds += time.perf_counter() - start
+
+        self.batch.total_transactions = self.received
+        self.chunks += 1
+
+    def validate_chunk(self, chunk):
+        """Split a chunk into validated accounts and transactions (plus transaction line numbers)."""
+        account_lines, account_records, tx_lines, tx_records = [], [], [], []
+        for line_number, record in chunk:
+            if 'transaction_id' in record:
+                tx_lines.append(line_number)
+                tx_records.append(record)
+            else:
+                account_lines.append(line_number)
+                account_records.append(record)
+
+        accounts = self._validate(AccountSerializer, account_records, account_lines)
+        transactions = self._validate(TransactionItemSerializer, tx_records, tx_lines)
+        return accounts, transactions, tx_lines
+
+    def resolve_accounts(self, accounts, transactions, tx_lines):
+        """Upsert declared accounts and make sure every referenced account_id has a pk."""
+        if accounts:
+            self.account_ids.update(upsert_accounts(accounts))
+        unknown = {tx['account_id'] for tx in transactions} - self.account_ids.keys()
+        if unknown:
+            self.account_ids.update(resolve_account_ids(unknown))
+        for line_number, tx in zip(tx_lines, transactions):
+            if tx['account_id'] not in self.account_ids:
+                raise StreamRecordError(
+                    line_number, {"account_id": [f"Account {tx['account_id']} is unknown"]}
+                )
+
+    def result(self):
+        return IngestResult(
+            batch=self.batch,
+            received=self.received,
+            inserted=self.owned,
+            duplicates=self.received - self.owned,
+        )
+
+    def _validate(self, serializer_class, records, lines):
+        if not records:
+            return []
+        serializer = get_validator_class(serializer_class)(data=records, many=True)
+        if not serializer.is_valid():
+            errors = serializer.errors
+            # ListSerializer errors are a list in older DRF releases, a sparse dict in newer ones.
+            indexed = errors.items() if isinstance(errors, dict) else enumerate(errors)
+            for index, item_errors in sorted(indexed, key=lambda pair: pair[0]):
+                if item_errors:
+                    raise StreamRecordError(lines[index], item_errors)
+        return serializer.validated_data
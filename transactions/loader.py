@@ -0,0 +1,190 @@
+import csv
+import io
+from dataclasses import dataclass
+
+from django.db import connection, transaction as db_transaction
+
+from .ingestion import StreamIngestor, insert_transactions
+from .models import Account, Batch, Transaction
+from .progress import move_batch_counters
+from .rollups import apply_rollup_changes
+from .parsers import iter_ndjson
+
+DEFAULT_LOAD_CHUNK_SIZE = 50_000
+
+# CSV rows are flat: these optional columns declare the row's account inline.
+CSV_ACCOUNT_COLUMNS = {
+    'account_name': 'name',
+    'account_type': 'type',
+    'account_subtype': 'subtype',
+    'account_mask': 'mask',
+}
+CSV_NULLABLE_COLUMNS = {'authorized_date', 'payment_channel'}
+
+STAGING_TABLE = 'transactions_load_staging'
+STAGING_COLUMNS = [
+    ('line', 'integer'),
+    ('transaction_id', 'varchar(255)'),
+    ('account_id', 'varchar(128)'),
+    ('amount', 'numeric(12, 2)'),
+    ('currency', 'varchar(3)'),
+    ('date', 'timestamptz'),
+    ('authorized_date', 'date'),
+    ('merchant_name', 'varchar(255)'),
+    ('description', 'text'),
+]
+
+
+def iter_jsonl(path):
+    with open(path, 'rb') as f:
+        yield from iter_ndjson(f)
+
+
+def iter_csv(path):
+    """Yield (line_number, record) for account declarations and transactions in a CSV file."""
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        declared = set()
+        for row in reader:
+            row = {
+                key: (None if value == '' and key in CSV_NULLABLE_COLUMNS else value)
+                for key, value in row.items()
+            }
+            account = {
+                field: row.pop(column)
+                for column, field in CSV_ACCOUNT_COLUMNS.items()
+                if column in row
+            }
+            if account.get('name') and row.get('account_id') not in declared:
+                declared.add(row.get('account_id'))
+                account['subtype'] = account.get('subtype') or None
+                account['mask'] = account.get('mask') or None
+                yield reader.line_num, {'account_id': row.get('account_id'), **account}
+            yield reader.line_num, row
+
+
+def iter_records(path, fmt=None):
+    fmt = fmt or ('csv' if str(path).lower().endswith('.csv') else 'jsonl')
+    return iter_csv(path) if fmt == 'csv' else iter_jsonl(path)
+
+
+@dataclass
+class ChunkResult:
+    batch: Batch
+    received: int
+    inserted: int
+
+    @property
+    def duplicates(self):
+        return self.received - self.inserted
+
+
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    text = value.isoformat() if hasattr(value, 'isoformat') else str(value)
+    return text.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+class BulkLoader(StreamIngestor):
+    """
+    Loads historical transactions in large chunks, one Batch per chunk.
+
+    On PostgreSQL each chunk is streamed with COPY into a temporary staging table and
+    merged with a single INSERT ... SELECT ... ON CONFLICT (transaction_id) DO NOTHING.
+    The staging table is created ON COMMIT DROP inside the chunk's transaction, so a
+    killed or failed load leaves nothing behind.
+    Other backends (SQLite in dev) fall back to the set-based ORM path used by the API.
+    Validation and account handling are shared with the streaming ingest endpoint.
+    """
+
+    def __init__(self, request_id=None, chunk_size=None):
+        self.chunk_size = chunk_size or DEFAULT_LOAD_CHUNK_SIZE
+        self.request_id = request_id
+        self.account_ids = {}
+        self.received = 0
+        self.owned = 0
+        self.chunks = 0
+        self.results = []
+        self.use_copy = connection.vendor == 'postgresql'
+
+    def ingest_chunk(self, chunk):
+        accounts, transactions, tx_lines = self.validate_chunk(chunk)
+
+        with db_transaction.atomic():
+            self.resolve_accounts(accounts, transactions, tx_lines)
+            batch = Batch.objects.create(request_id=self.request_id, total_transactions=len(transactions))
+            if self.use_copy:
+                inserted = self._copy_merge(transactions, tx_lines, batch)
+            else:
+                inserted = insert_transactions(transactions, self.account_ids, batch)
+
+        self.received += len(transactions)
+        self.owned += inserted
+        self.chunks += 1
+        self.results.append(ChunkResult(batch=batch, received=len(transactions), inserted=inserted))
+
+    def _copy_merge(self, transactions, tx_lines, batch):
+        buffer = io.StringIO()
+        for line_number, tx in zip(tx_lines, transactions):
+            row = (
+                line_number,
+                tx['transaction_id'],
+                tx['account_id'],
+                tx['amount'],
+                tx['iso_currency_code'],
+                tx['date'],
+                tx.get('authorized_date'),
+                tx.get('merchant_name') or tx.get('name'),
+                tx.get('name'),
+            )
+            buffer.write('\t'.join(_copy_value(value) for value in row))
+            buffer.write('\n')
+        buffer.seek(0)
+
+        qn = connection.ops.quote_name
+        tx_table = qn(Transaction._meta.db_table)
+        account_table = qn(Account._meta.db_table)
+        columns = ', '.join(name for name, _ in STAGING_COLUMNS)
+
+        staging_columns = ', '.join(f'{name} {sql_type}' for name, sql_type in STAGING_COLUMNS)
+
+        with connection.cursor() as cursor:
+            # Runs inside ingest_chunk's atomic block; the table is dropped when it commits.
+            cursor.execute(f'CREATE TEMP TABLE {STAGING_TABLE} ({staging_columns}) ON COMMIT DROP')
+            raw = cursor.cursor
+            copy_sql = f'COPY {STAGING_TABLE} ({columns}) FROM STDIN'
+            if hasattr(raw, 'copy_expert'):
+                raw.copy_expert(copy_sql, buffer)
+            else:
+                with raw.copy(copy_sql) as copy:
+                    copy.write(buffer.getvalue())
+
+            cursor.execute(
+                f"""
+                INSERT INTO {tx_table} (
+                    transaction_id, account_id, amount, currency, date, authorized_date,
+                    merchant_name, description, ingestion_status, batch_id, created_at, updated_at
+                )
+                SELECT DISTINCT ON (s.transaction_id)
+                    s.transaction_id, a.id, s.amount, s.currency, s.date, s.authorized_date,
+                    s.merchant_name, s.description, %s, %s, now(), now()
+                FROM {STAGING_TABLE} s
+                JOIN {account_table} a ON a.account_id = s.account_id
+                ORDER BY s.transaction_id, s.line
+                ON CONFLICT (transaction_id) DO NOTHING
+                RETURNING account_id, date, amount
+                """,
+                [Transaction.INGESTION_STATUS_PENDING, batch.pk],
+            )
+            # Only rows this chunk inserted come back; conflicting ones belong to another batch.
+            inserted_rows = cursor.fetchall()
+            # Dropped now as well, in case the caller wraps several chunks in one transaction.
+            cursor.execute(f'DROP TABLE {STAGING_TABLE}')
+        if inserted_rows:
+            pending = (None, Transaction.INGESTION_STATUS_PENDING)
+            apply_rollup_changes(
+                (account_pk, date, amount, None, pending) for account_pk, date, amount in inserted_rows
+            )
+            move_batch_counters(batch.pk, {(None, Transaction.INGESTION_STATUS_PENDING): len(inserted_rows)})
+        return len(inserted_rows)
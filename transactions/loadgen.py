@@ -0,0 +1,269 @@
+"""
+Load generation for `simulate_integration`.
+
+PayloadFactory builds synthetic ingest payloads (or replay_payloads reads recorded
+ones), run_load sends them from N concurrent workers at an optional target rate, and
+wait_for_batches polls the batch progress endpoint for end-to-end enrichment lag.
+Transport is left to the caller: `send(payload)` returns (status_code, body) and
+`get_progress(batch_id)` returns the GET /api/batches/<id> body.
+"""
+import asyncio
+import datetime
+import json
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from .synthetic import make_account, make_transaction
+
+MODES = ('threads', 'asyncio')
+DEFAULT_ID_HISTORY = 100_000
+# Sends starting this long after their due time count as late (sleep jitter stays below it).
+LATE_TOLERANCE = 0.01
+
+
+def parse_batch_size(spec):
+    """
+    Batch size distribution from a spec: '12' (fixed), '10-15' (uniform, inclusive) or
+    '10,100,1000' (one of, equally likely). Returns a function of an RNG.
+    """
+    try:
+        if ',' in spec:
+            sizes = [int(value) for value in spec.split(',')]
+        elif '-' in spec:
+            low, high = (int(value) for value in spec.split('-', 1))
+            sizes = range(low, high + 1)
+        else:
+            sizes = [int(spec)]
+    except ValueError:
+        sizes = []
+    if not sizes or min(sizes) <= 0:
+        raise ValueError(f"invalid batch size spec {spec!r}: use N, MIN-MAX or N1,N2,...")
+    return lambda rng: rng.choice(sizes)
+
+
+class PayloadFactory:
+    """
+    Ingest payloads over a fixed pool of `accounts`.
+
+    Each transaction reuses an already-sent transaction_id with probability
+    `duplicate_ratio` (drawn from the last `id_history` sent), so the server's duplicate
+    handling is exercised at a known rate. Thread-safe.
+    """
+
+    def __init__(self, batch_size, accounts=1, duplicate_ratio=0.0, seed=None, id_history=DEFAULT_ID_HISTORY):
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+        self.accounts = {account["account_id"]: account for account in (make_account() for _ in range(accounts))}
+        self.account_ids = list(self.accounts)
+        self.duplicate_ratio = duplicate_ratio
+        self.id_history = id_history
+        self.sent = []
+        self.duplicates = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            now = datetime.datetime.now(datetime.timezone.utc)
+            transactions = []
+            for _ in range(self.batch_size(self.rng)):
+                if self.sent and self.rng.random() < self.duplicate_ratio:
+                    transactions.append(self.rng.choice(self.sent))
+                    self.duplicates += 1
+                else:
+                    transactions.append(make_transaction(self.rng.choice(self.account_ids), now=now, rng=self.rng))
+            self.sent.extend(transactions)
+            if len(self.sent) > 2 * self.id_history:
+                del self.sent[:-self.id_history]
+            request_id = f"req_{self.rng.getrandbits(32):08x}"
+
+        account_ids = dict.fromkeys(tx["account_id"] for tx in transactions)
+        return {
+            "accounts": [self.accounts[account_id] for account_id in account_ids],
+            "transactions": transactions,
+            "total_transactions": len(transactions),
+            "request_id": request_id,
+        }
+
+
+def replay_payloads(path):
+    """Recorded ingest payloads, one JSON object per line (blank lines skipped)."""
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+@dataclass
+class RequestResult:
+    status: int | None  # None when the request raised
+    latency: float
+    rows: int
+    batch_id: str | None = None
+    error: str | None = None
+    send_lag: float = 0.0  # how long after its due time the request was sent (rate > 0 only)
+
+
+class _Schedule:
+    """Hands out (payload, due time) pairs; due times are spaced 1/rate apart (open loop)."""
+
+    def __init__(self, payloads, total, rate):
+        self.payloads = iter(payloads)
+        self.total = total
+        self.interval = 1.0 / rate if rate else 0.0
+        self.issued = 0
+        self.start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def next(self):
+        with self._lock:
+            if self.total is not None and self.issued >= self.total:
+                return None
+            payload = next(self.payloads, None)
+            if payload is None:
+                return None
+            due = self.start + self.issued * self.interval
+            self.issued += 1
+            return payload, due
+
+
+def _send_one(send, payload, due=None):
+    rows = len(payload.get("transactions", ()))
+    send_lag = max(0.0, time.monotonic() - due) if due is not None else 0.0
+    start = time.perf_counter()
+    try:
+        status, body = send(payload)
+    except Exception as e:
+        return RequestResult(
+            None, time.perf_counter() - start, rows, error=f"{type(e).__name__}: {e}", send_lag=send_lag
+        )
+    batch_id = body.get("batch_id") if status == 202 and isinstance(body, dict) else None
+    return RequestResult(status, time.perf_counter() - start, rows, batch_id=batch_id, send_lag=send_lag)
+
+
+def run_load(send, payloads, total=None, concurrency=1, rate=0.0, mode='threads'):
+    """
+    Send payloads with `concurrency` workers and return (results, elapsed seconds).
+
+    With `rate` > 0 request i is not sent before start + i / rate. It is sent later when
+    every worker is still waiting on a slow server, which lowers the offered load; each
+    result records that delay as `send_lag`, and summarize() counts the late sends, so
+    such a run is reported rather than passed off as meeting the target. Latency is
+    measured per request from send to response. In 'asyncio' mode the workers are
+    coroutines and the blocking `send` runs in a pool of `concurrency` threads.
+    """
+    schedule = _Schedule(payloads, total, rate)
+    results = []
+
+    def worker():
+        while (item := schedule.next()) is not None:
+            payload, due = item
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            results.append(_send_one(send, payload, due if rate else None))
+
+    async def async_main():
+        loop = asyncio.get_running_loop()
+        pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='loadgen')
+
+        async def async_worker():
+            while (item := schedule.next()) is not None:
+                payload, due = item
+                delay = due - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                results.append(await loop.run_in_executor(pool, _send_one, send, payload, due if rate else None))
+
+        try:
+            await asyncio.gather(*(async_worker() for _ in range(concurrency)))
+        finally:
+            pool.shutdown(wait=False)
+
+    if mode not in MODES:
+        raise ValueError(f"unknown mode {mode!r}")
+    start = time.monotonic()
+    if mode == 'asyncio':
+        asyncio.run(async_main())
+    else:
+        threads = [threading.Thread(target=worker, name=f'loadgen-{i}') for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return results, time.monotonic() - start
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an ascending list (None when empty)."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def latency_summary(values):
+    values = sorted(values)
+    return {
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": values[-1] if values else None,
+    }
+
+
+def summarize(results, elapsed):
+    accepted = [r for r in results if r.status == 202]
+    late = [r.send_lag for r in results if r.send_lag > LATE_TOLERANCE]
+    errors = Counter(r.status if r.status is not None else r.error.split(':', 1)[0] for r in results if r.status != 202)
+    return {
+        "requests": len(results),
+        "accepted": len(accepted),
+        "errors": dict(errors),
+        "elapsed_sec": elapsed,
+        "requests_per_sec": len(results) / elapsed if elapsed else 0.0,
+        "rows_per_sec": sum(r.rows for r in accepted) / elapsed if elapsed else 0.0,
+        "latency_sec": latency_summary([r.latency for r in results]),
+        # Requests sent behind schedule because no worker was free: the target rate was not offered.
+        "late_requests": len(late),
+        "max_send_lag_sec": max(late, default=0.0),
+    }
+
+
+def enrichment_lag(progress):
+    """Seconds from batch creation to the end of enrichment, from the server's timestamps."""
+    if not progress.get("finished") or not progress.get("finished_at"):
+        return None
+    created = datetime.datetime.fromisoformat(progress["created_at"])
+    finished = datetime.datetime.fromisoformat(progress["finished_at"])
+    return (finished - created).total_seconds()
+
+
+def wait_for_batches(get_progress, batch_ids, interval=1.0, timeout=120.0, concurrency=1):
+    """
+    Poll until every batch has finished or `timeout` passes; returns {batch_id: last progress}.
+    Batches that could not be fetched are missing from the result.
+    """
+    last = {}
+    pending = list(batch_ids)
+    deadline = time.monotonic() + timeout
+
+    def fetch(batch_id):
+        try:
+            return batch_id, get_progress(batch_id)
+        except Exception:
+            return batch_id, None
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='loadgen-poll') as pool:
+        while pending:
+            for batch_id, progress in pool.map(fetch, pending):
+                if progress is not None:
+                    last[batch_id] = progress
+            pending = [batch_id for batch_id in pending if not last.get(batch_id, {}).get("finished")]
+            if not pending or time.monotonic() >= deadline:
+                break
+            time.sleep(interval)
+    return last
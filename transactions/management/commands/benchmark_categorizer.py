@@ -0,0 +1,83 @@
+import re
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions.categorizer import CATEGORIZERS, RuleBasedCategorizer, get_categorizer
+from transactions.synthetic import make_categorizer_records, make_rules
+
+
+def sequential_categorize(patterns, merchant_name, description):
+    """The pre-compiled-matcher behaviour: one regex per rule, tried in order."""
+    text = ' '.join(filter(None, [merchant_name or '', description or '']))
+    for pattern, category in patterns:
+        if pattern.search(text):
+            return category
+    return RuleBasedCategorizer.DEFAULT_CATEGORY
+
+
+class Command(BaseCommand):
+    help = "Measure rows/sec of registered categorizers, row by row and through categorize_many"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categorizer', action='append', dest='categorizers',
+                            help="Registered name or dotted path (repeatable; default: all registered)")
+        parser.add_argument('--rows', type=int, default=100_000)
+        parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 50, 500])
+        parser.add_argument('--rule-counts', type=int, nargs='+',
+                            help="Instead, measure the rule engine with this many synthetic rules (e.g. 5 100 1000 10000)")
+        parser.add_argument('--sequential', action='store_true',
+                            help="With --rule-counts, also time the one-regex-per-rule loop for comparison")
+
+    def handle(self, *args, **options):
+        records = make_categorizer_records(options['rows'])
+        if options['rule_counts']:
+            return self._rule_scaling(records, options['rule_counts'], options['sequential'])
+
+        names = options['categorizers'] or sorted(CATEGORIZERS)
+
+        for name in names:
+            try:
+                categorizer = get_categorizer(name)
+            except (KeyError, ImportError) as e:
+                raise CommandError(f"Unknown categorizer {name}: {e}")
+
+            start = time.perf_counter()
+            for merchant_name, description in records:
+                categorizer.categorize(merchant_name, description)
+            self._report(name, 'categorize', len(records), time.perf_counter() - start)
+
+            for batch_size in options['batch_sizes']:
+                start = time.perf_counter()
+                for i in range(0, len(records), batch_size):
+                    categorizer.categorize_many(records[i:i + batch_size])
+                self._report(name, f'many[{batch_size}]', len(records), time.perf_counter() - start)
+
+    def _rule_scaling(self, records, rule_counts, sequential):
+        for n_rules in rule_counts:
+            rules = make_rules(n_rules)
+            start = time.perf_counter()
+            categorizer = RuleBasedCategorizer(rules=rules)
+            compile_elapsed = time.perf_counter() - start
+            self.stdout.write(f"rules={n_rules:<6} compile={compile_elapsed * 1000:.1f}ms")
+
+            start = time.perf_counter()
+            for merchant_name, description in records:
+                categorizer.categorize(merchant_name, description)
+            self._report(f"rules={n_rules}", 'compiled', len(records), time.perf_counter() - start)
+
+            if sequential:
+                patterns = [
+                    (re.compile('|'.join(rf'\b{re.escape(k)}\b' for k in keywords), re.I), category)
+                    for category, keywords in rules
+                ]
+                start = time.perf_counter()
+                for merchant_name, description in records:
+                    sequential_categorize(patterns, merchant_name, description)
+                self._report(f"rules={n_rules}", 'sequential', len(records), time.perf_counter() - start)
+
+    def _report(self, name, mode, rows, elapsed):
+        self.stdout.write(
+            f"{name:<20} {mode:<12} rows={rows:<8} elapsed={elapsed:.3f}s rows/sec={rows / elapsed:,.0f} "
+            f"per_row={elapsed / rows * 1e6:.2f}us"
+        )
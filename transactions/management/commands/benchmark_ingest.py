@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction as db_transaction
+
+from transactions.benchmarks import as_validated
+from transactions.ingestion import ingest_batch
+from transactions.models import Account, Batch
+from transactions.synthetic import make_payload
+
+
+class Command(BaseCommand):
+    help = "Measure rows/sec of the set-based ingestion engine at several batch sizes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100, 10_000, 100_000])
+        parser.add_argument('--accounts', type=int, default=5)
+        parser.add_argument('--duplicate-pass', action='store_true',
+                            help="Re-ingest each payload to measure the all-duplicates path")
+
+    def handle(self, *args, **options):
+        for size in options['sizes']:
+            payload = as_validated(make_payload(size, n_accounts=options['accounts']))
+            account_ids = [a['account_id'] for a in payload['accounts']]
+            batch_ids = []
+            try:
+                self._run(payload, size, 'insert', batch_ids)
+                if options['duplicate_pass']:
+                    self._run(payload, size, 'duplicate', batch_ids)
+            finally:
+                Batch.objects.filter(batch_id__in=batch_ids).delete()
+                Account.objects.filter(account_id__in=account_ids).delete()
+
+    def _run(self, payload, size, label, batch_ids):
+        start = time.perf_counter()
+        with db_transaction.atomic():
+            result = ingest_batch(payload)
+        elapsed = time.perf_counter() - start
+        batch_ids.append(result.batch.batch_id)
+
+        self.stdout.write(
+            f"{label:<10} rows={size:<8} inserted={result.inserted:<8} duplicates={result.duplicates:<8} "
+            f"elapsed={elapsed:.3f}s rows/sec={size / elapsed:,.0f}"
+        )
@@ -0,0 +1,101 @@
+import json
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from middleware import logging_formatters
+from middleware.logging_formatters import JsonFormatter
+
+# The %-template formatter and default-patching filter the JSON formatter replaced.
+LEGACY_HTTP_FORMAT = (
+    '{'
+    '"timestamp":"%(asctime)s",'
+    '"level":"%(levelname)s",'
+    '"logger":"%(name)s",'
+    '"message":"%(message)s",'
+    '"correlation_id":"%(correlation_id)s",'
+    '"method":"%(method)s",'
+    '"path":"%(path)s",'
+    '"type":"http",'
+    '"client_ip":"%(client_ip)s",'
+    '"user_agent":"%(user_agent)s",'
+    '"status_code":"%(status_code)s",'
+    '"response_bytes":"%(response_bytes)s",'
+    '"duration_sec":"%(duration_sec)s"'
+    '}'
+)
+LEGACY_DEFAULTS = {
+    "correlation_id": "-", "method": "-", "type": "-", "client_ip": "-", "user_agent": "-",
+    "path": "-", "status_code": "-", "response_bytes": "-", "duration_sec": "-",
+    "task_name": "-", "task_id": "-", "queue": "-", "retries": "-",
+}
+HTTP_FIELDS = ["method", "path", "client_ip", "user_agent", "request_bytes", "status_code", "response_bytes",
+               "duration_sec"]
+
+
+def legacy_filter(record):
+    for key, value in LEGACY_DEFAULTS.items():
+        if not hasattr(record, key):
+            setattr(record, key, value)
+    return True
+
+
+def make_record(i, quoted):
+    message = 'request_completed "bulk" import\n' if quoted else "request_completed"
+    record = logging.LogRecord('observability.http', logging.INFO, __file__, 0, message, (), None)
+    record.__dict__.update({
+        "type": "response",
+        "correlation_id": f"cid-{i}",
+        "method": "POST",
+        "path": "/api/integrations/transactions/",
+        "client_ip": "10.0.0.1",
+        "user_agent": "python-requests/2.32",
+        "request_bytes": 81_234,
+        "status_code": 202,
+        "response_bytes": 180,
+        "duration_sec": 0.0123,
+    })
+    return record
+
+
+class Command(BaseCommand):
+    help = "Records/sec of the JSON log formatter against the old %-template formatter plus field filter"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', type=int, default=200_000)
+        parser.add_argument('--quoted-every', type=int, default=100,
+                            help="Every Nth message contains quotes and a newline")
+
+    def handle(self, *args, **options):
+        n, every = options['records'], options['quoted_every']
+        stacks = [
+            ('legacy', logging.Formatter(LEGACY_HTTP_FORMAT), legacy_filter),
+            ('json', JsonFormatter(fields=HTTP_FIELDS, static={"type": "http"}), None),
+        ]
+        encoder = 'orjson' if logging_formatters.orjson is not None else 'json'
+        self.stdout.write(f"records={n} encoder={encoder}")
+
+        rates = {}
+        for label, formatter, record_filter in stacks:
+            # Fresh records per stack: the filter mutates them.
+            records = [make_record(i, every and i % every == 0) for i in range(n)]
+            start = time.perf_counter()
+            lines = []
+            for record in records:
+                if record_filter is not None:
+                    record_filter(record)
+                lines.append(formatter.format(record))
+            elapsed = time.perf_counter() - start
+            rates[label] = n / elapsed
+
+            invalid = 0
+            for line in lines:
+                try:
+                    json.loads(line)
+                except ValueError:
+                    invalid += 1
+            self.stdout.write(
+                f"{label:<7} elapsed={elapsed:.3f}s records/sec={rates[label]:,.0f} invalid_json={invalid}"
+            )
+        self.stdout.write(f"speedup {rates['json'] / rates['legacy']:.2f}x")
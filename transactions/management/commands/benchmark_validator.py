@@ -0,0 +1,37 @@
+import copy
+import time
+
+from django.core.management.base import BaseCommand
+
+from transactions.fast_validation import fast_validator_class
+from transactions.serializers import IngestBatchSerializer
+from transactions.synthetic import make_payload
+
+
+class Command(BaseCommand):
+    help = "Compare IngestBatchSerializer with the compiled fast-path validator at several batch sizes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+        parser.add_argument('--accounts', type=int, default=5)
+
+    def handle(self, *args, **options):
+        validators = [
+            ('drf', IngestBatchSerializer),
+            ('fast', fast_validator_class(IngestBatchSerializer)),
+        ]
+        for size in options['sizes']:
+            payload = make_payload(size, n_accounts=options['accounts'])
+            timings = {}
+            for label, validator_class in validators:
+                data = copy.deepcopy(payload)
+                start = time.perf_counter()
+                validator = validator_class(data=data)
+                if not validator.is_valid():
+                    raise RuntimeError(f"{label} rejected a synthetic payload: {validator.errors}")
+                timings[label] = time.perf_counter() - start
+
+                self.stdout.write(
+                    f"{label:<5} rows={size:<8} elapsed={timings[label]:.3f}s rows/sec={size / timings[label]:,.0f}"
+                )
+            self.stdout.write(f"speedup rows={size:<8} {timings['drf'] / timings['fast']:.1f}x")
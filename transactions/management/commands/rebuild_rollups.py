@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from transactions.rollups import rebuild_rollups
+
+
+def date_arg(value):
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(value)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = "Recompute daily account rollups from raw transactions for a date range"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date_arg, help="First day to rebuild (YYYY-MM-DD); default: all history")
+        parser.add_argument('--end', type=date_arg, help="Last day to rebuild (YYYY-MM-DD), inclusive")
+        parser.add_argument('--account', action='append', dest='accounts',
+                            help="account_id to rebuild (repeatable; default: all accounts)")
+
+    def handle(self, *args, **options):
+        start, end = options['start'], options['end']
+        if start and end and start > end:
+            raise CommandError("--start must not be after --end")
+
+        began = time.perf_counter()
+        written = rebuild_rollups(start=start, end=end, account_ids=options['accounts'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {written} rollup rows for {start or 'beginning'}..{end or 'today'} "
+            f"in {time.perf_counter() - began:.1f}s"
+        ))
@@ -0,0 +1,113 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_databases, teardown_databases
+
+from transactions.benchmarks import (
+    BENCHMARKS,
+    DEFAULT_CATEGORIZER_ROWS,
+    DEFAULT_DATASET_SIZE,
+    DEFAULT_REPEAT,
+    DEFAULT_SIZES,
+    DEFAULT_THRESHOLD,
+    BenchmarkConfig,
+    compare,
+    run_suite,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the benchmark suite in a throwaway test database, save the results as JSON and "
+        "fail when a case is slower than the baseline by more than the regression threshold"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', action='append', choices=sorted(BENCHMARKS),
+                            help="Benchmark to run (repeatable; default: all)")
+        parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                            help="Batch sizes for the serializer, ingest_api and enrichment benchmarks")
+        parser.add_argument('--dataset-size', type=int, default=DEFAULT_DATASET_SIZE,
+                            help="Transactions generated for the summary benchmark (e.g. 1000000)")
+        parser.add_argument('--categorizer-rows', type=int, default=DEFAULT_CATEGORIZER_ROWS)
+        parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="Timed runs per case; the median counts")
+        parser.add_argument('--output', help="Write this run's results to this JSON file")
+        parser.add_argument('--baseline',
+                            help="Baseline JSON to compare with (default: BENCHMARK_BASELINE_DIR/baseline-<vendor>.json)")
+        parser.add_argument('--save-baseline', action='store_true', help="Write this run's results as the new baseline")
+        parser.add_argument('--threshold', type=float,
+                            help=f"Allowed slowdown as a fraction (default: BENCHMARK_REGRESSION_THRESHOLD or {DEFAULT_THRESHOLD})")
+        parser.add_argument('--in-place', action='store_true',
+                            help="Use the configured database instead of a throwaway test database (rows are left behind)")
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError("--repeat must be at least 1")
+        names = options['only'] or list(BENCHMARKS)
+        config = BenchmarkConfig(
+            sizes=tuple(options['sizes']),
+            dataset_size=options['dataset_size'],
+            categorizer_rows=options['categorizer_rows'],
+            repeat=options['repeat'],
+        )
+        threshold = options['threshold']
+        if threshold is None:
+            threshold = getattr(settings, 'BENCHMARK_REGRESSION_THRESHOLD', DEFAULT_THRESHOLD)
+
+        if options['in_place']:
+            document = run_suite(names, config, report=self.report)
+        else:
+            old_config = setup_databases(verbosity=0, interactive=False)
+            try:
+                document = run_suite(names, config, report=self.report)
+            finally:
+                teardown_databases(old_config, verbosity=0)
+
+        if options['output']:
+            self.write_json(options['output'], document)
+
+        baseline_path = options['baseline'] or os.path.join(
+            getattr(settings, 'BENCHMARK_BASELINE_DIR', 'benchmarks'), f"baseline-{connection.vendor}.json"
+        )
+        if options['save_baseline']:
+            self.write_json(baseline_path, document)
+            self.stdout.write(f"Saved baseline {baseline_path}")
+            return
+        if not os.path.exists(baseline_path):
+            self.stdout.write(f"No baseline at {baseline_path}; run with --save-baseline to create one")
+            return
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        self.check_regressions(baseline, document, threshold, baseline_path)
+
+    def report(self, result):
+        self.stdout.write(
+            f"{result.name:<34} rows={result.rows:<9} median={result.seconds:.4f}s rows/sec={result.rows_per_sec:,.0f}"
+        )
+
+    def write_json(self, path, document):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(document, f, indent=2)
+
+    def check_regressions(self, baseline, document, threshold, baseline_path):
+        vendor, baseline_vendor = document['environment']['vendor'], baseline['environment']['vendor']
+        if vendor != baseline_vendor:
+            raise CommandError(f"{baseline_path} was recorded on {baseline_vendor}, this run used {vendor}")
+
+        comparisons = compare(baseline, document, threshold)
+        self.stdout.write(f"Compared {len(comparisons)} case(s) with {baseline_path} (threshold {threshold:.0%})")
+        for comparison in comparisons:
+            marker = 'REGRESSION' if comparison.regressed else 'ok'
+            self.stdout.write(
+                f"{comparison.name:<34} baseline={comparison.baseline:.4f}s current={comparison.current:.4f}s "
+                f"change={comparison.change:+.1%} {marker}"
+            )
+        regressions = [comparison.name for comparison in comparisons if comparison.regressed]
+        if regressions:
+            raise CommandError(f"{len(regressions)} benchmark(s) regressed beyond {threshold:.0%}: {', '.join(regressions)}")
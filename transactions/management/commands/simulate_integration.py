@@ -1,53 +1,179 @@
-from django.core.management.base import BaseCommand
-import uuid, random, datetime, requests
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
 from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions.models import Batch
+from transactions.loadgen import (
+    MODES,
+    PayloadFactory,
+    enrichment_lag,
+    latency_summary,
+    parse_batch_size,
+    replay_payloads,
+    run_load,
+    summarize,
+    wait_for_batches,
+)
+
 
 class Command(BaseCommand):
-    help = "Generate realistic batch of 10-15 transactions and post to ingestion endpoint"
+    help = (
+        "Post synthetic (or replayed) batches to the ingestion endpoint and report throughput, "
+        "latency percentiles, errors and enrichment lag. With no options: one batch of 10-15 "
+        "transactions, followed until it finishes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', help="Defaults to settings.SIMULATE_BASE_URL or http://web:8000")
+        parser.add_argument('--requests', type=int,
+                            help="Batches to post; default 1, or every line of --replay")
+        parser.add_argument('--concurrency', type=int, default=1, help="Requests in flight at once")
+        parser.add_argument('--mode', choices=MODES, default='threads')
+        parser.add_argument('--rate', type=float, default=0.0,
+                            help="Target requests/sec across all workers; 0 sends as fast as possible")
+        parser.add_argument('--batch-size', default='10-15', help="N, MIN-MAX (uniform) or N1,N2,... (one of)")
+        parser.add_argument('--accounts', type=int, default=1, help="Size of the account pool batches draw from")
+        parser.add_argument('--duplicate-ratio', type=float, default=0.0,
+                            help="Share of transactions that reuse an already-sent transaction_id")
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--replay', metavar='PATH',
+                            help="Post recorded payloads from a JSONL file (one ingest payload per line)")
+        parser.add_argument('--timeout', type=float, default=30.0, help="Per-request timeout in seconds")
+        parser.add_argument('--no-poll', action='store_true', help="Do not wait for enrichment to finish")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds between progress requests")
+        parser.add_argument('--poll-timeout', type=float, default=120.0, help="Stop following after this many seconds")
 
     def handle(self, *args, **options):
-        base_url = getattr(settings, 'SIMULATE_BASE_URL', 'http://web:8000')
+        base_url = (options['base_url'] or getattr(settings, 'SIMULATE_BASE_URL', 'http://web:8000')).rstrip('/')
         endpoint = f"{base_url}/api/integrations/transactions/"
-        req_id = f"req_{uuid.uuid4().hex[:8]}"
-        account_id = f"acc_{uuid.uuid4().hex[:8]}"
-
-        accounts = [{
-            "account_id": account_id,
-            "name": "Business Checking",
-            "type": "depository",
-            "subtype": "checking",
-            "mask": "1111"
-        }]
-
-        merchants = ["Amazon Marketplace", "Stripe", "Uber", "AWS", "Starbucks", "PayPal", "Lyft", "Adobe"]
-        txs = []
-        n = random.randint(10, 15)
-        now = datetime.datetime.utcnow()
-        for i in range(n):
-            txn = {
-                "transaction_id": f"tx_{uuid.uuid4().hex[:12]}",
-                "account_id": account_id,
-                "amount": round(random.choice([-1, 1]) * round(random.uniform(5, 1500), 2), 2),
-                "iso_currency_code": "USD",
-                "date": (now - datetime.timedelta(days=random.randint(0, 30))).isoformat() + "Z",
-                "authorized_date": (now - datetime.timedelta(days=random.randint(0, 30))).date().isoformat(),
-                "name": random.choice(merchants),
-                "merchant_name": random.choice(merchants),
-                "payment_channel": random.choice(["online", "in store"]),
-                "pending": False
-            }
-            txs.append(txn)
-
-        payload = {
-            "accounts": accounts,
-            "transactions": txs,
-            "total_transactions": len(txs),
-            "request_id": req_id
-        }
-
-        print("Posting batch with request_id:", req_id)
-        try:
-            resp = requests.post(endpoint, json=payload, timeout=10)
-            print("Status:", resp.status_code, resp.text)
-        except Exception as e:
-            print("Failed to post:", e)
+        total = options['requests']
+        if options['concurrency'] < 1 or (total is not None and total < 1):
+            raise CommandError("--concurrency and --requests must be at least 1")
+        if not 0 <= options['duplicate_ratio'] <= 1:
+            raise CommandError("--duplicate-ratio must be between 0 and 1")
+
+        factory = None
+        if options['replay']:
+            payloads = replay_payloads(options['replay'])
+        else:
+            try:
+                batch_size = parse_batch_size(options['batch_size'])
+            except ValueError as e:
+                raise CommandError(str(e))
+            factory = PayloadFactory(
+                batch_size,
+                accounts=options['accounts'],
+                duplicate_ratio=options['duplicate_ratio'],
+                seed=options['seed'],
+            )
+            payloads = iter(factory, None)
+            total = total or 1
+
+        session = requests.Session()
+        # One pooled connection per worker instead of a new TCP connection per request.
+        adapter = HTTPAdapter(pool_maxsize=options['concurrency'])
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        timeout = options['timeout']
+
+        def send(payload):
+            response = session.post(endpoint, json=payload, timeout=timeout)
+            try:
+                body = response.json()
+            except ValueError:
+                body = None
+            return response.status_code, body
+
+        def get_progress(batch_id):
+            response = session.get(f"{base_url}/api/batches/{batch_id}", timeout=timeout)
+            response.raise_for_status()
+            return response.json()
+
+        self.stdout.write(
+            f"Posting {total or 'all replayed'} batch(es) to {endpoint} "
+            f"(concurrency={options['concurrency']} mode={options['mode']} rate={options['rate'] or 'max'})"
+        )
+        results, elapsed = run_load(
+            send, payloads,
+            total=total,
+            concurrency=options['concurrency'],
+            rate=options['rate'],
+            mode=options['mode'],
+        )
+        self.report(summarize(results, elapsed))
+        if factory is not None and factory.duplicates:
+            self.stdout.write(f"duplicate transactions sent={factory.duplicates}")
+
+        batch_ids = [r.batch_id for r in results if r.batch_id]
+        if options['no_poll'] or not batch_ids:
+            return
+        if len(batch_ids) == 1:
+            self.follow(get_progress, batch_ids[0], options['poll_interval'], options['poll_timeout'])
+            return
+        self.stdout.write(f"Waiting for {len(batch_ids)} batches to finish enrichment...")
+        progress = wait_for_batches(
+            get_progress, batch_ids,
+            interval=options['poll_interval'],
+            timeout=options['poll_timeout'],
+            concurrency=options['concurrency'],
+        )
+        self.report_lag(batch_ids, progress)
+
+    def report(self, summary):
+        latency = summary['latency_sec']
+        self.stdout.write(
+            f"requests={summary['requests']} accepted={summary['accepted']} "
+            f"elapsed={summary['elapsed_sec']:.2f}s "
+            f"throughput={summary['requests_per_sec']:.1f} req/s {summary['rows_per_sec']:,.0f} rows/s"
+        )
+        if summary['requests']:
+            self.stdout.write(
+                "latency " + " ".join(f"{name}={value * 1000:.1f}ms" for name, value in latency.items())
+            )
+        errors = " ".join(f"{status}={count}" for status, count in sorted(summary['errors'].items(), key=str))
+        self.stdout.write(f"errors {errors or 'none'}")
+        if summary['late_requests']:
+            self.stdout.write(self.style.WARNING(
+                f"late sends={summary['late_requests']} max_lag={summary['max_send_lag_sec'] * 1000:.1f}ms: "
+                f"every worker was busy, so the target rate was not offered; raise --concurrency"
+            ))
+
+    def report_lag(self, batch_ids, progress):
+        lags = [lag for lag in (enrichment_lag(p) for p in progress.values()) if lag is not None]
+        failed = sum(1 for p in progress.values() if p.get("status") == Batch.STATUS_COMPLETED_WITH_ERRORS)
+        unfinished = len(batch_ids) - len(lags)
+        self.stdout.write(f"batches finished={len(lags)} with_errors={failed} unfinished={unfinished}")
+        if lags:
+            self.stdout.write(
+                "enrichment lag " + " ".join(f"{name}={value:.2f}s" for name, value in latency_summary(lags).items())
+            )
+
+    def follow(self, get_progress, batch_id, interval, timeout):
+        """Poll GET /api/batches/<id> until the batch finishes, printing each change."""
+        deadline = time.monotonic() + timeout
+        last = None
+        while time.monotonic() < deadline:
+            try:
+                progress = get_progress(batch_id)
+            except Exception as e:
+                self.stdout.write(f"Failed to poll: {e}")
+            else:
+                line = (
+                    f"{progress['status']:<22} {progress['percent_complete']:5.1f}%  "
+                    + "  ".join(f"{status}={count}" for status, count in progress['counts'].items())
+                )
+                if line != last:
+                    self.stdout.write(line)
+                    last = line
+                if progress['finished']:
+                    lag = enrichment_lag(progress)
+                    self.stdout.write(
+                        f"Batch {batch_id} finished in {progress['duration_sec']}s"
+                        + (f" (enrichment lag {lag:.2f}s)" if lag is not None else "")
+                    )
+                    return
+            time.sleep(interval)
+        self.stdout.write(f"Batch {batch_id} still running after {timeout:.0f}s")
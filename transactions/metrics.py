@@ -0,0 +1,85 @@
+"""
+Prometheus metrics for the API and the Celery workers.
+
+With PROMETHEUS_MULTIPROC_DIR set (gunicorn workers, Celery prefork children), every
+process writes its samples to mmap'd files in that directory and /api/metrics merges
+the files of all processes at scrape time. Without it the in-process registry is served.
+Only counters and histograms are used: they merge by summing, so no gauge mode or
+dead-process cleanup is needed.
+"""
+import os
+
+MULTIPROC_DIR_ENV = 'PROMETHEUS_MULTIPROC_DIR'
+
+if os.environ.get(MULTIPROC_DIR_ENV):
+    # Every process writes its own files here; create it before the first sample.
+    os.makedirs(os.environ[MULTIPROC_DIR_ENV], exist_ok=True)
+
+from prometheus_client import (  # noqa: E402
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+ROW_BUCKETS = (1, 10, 50, 100, 500, 1_000, 5_000, 10_000, 50_000, 100_000)
+
+INGEST_SECONDS = Histogram(
+    'lucro_ingest_duration_seconds', "Ingest request time, validation to enrichment dispatch",
+    ['endpoint'], buckets=LATENCY_BUCKETS,
+)
+INGEST_ROWS = Histogram(
+    'lucro_ingest_batch_rows', "Transactions received per ingest request",
+    ['endpoint'], buckets=ROW_BUCKETS,
+)
+INGEST_VALIDATION_SECONDS = Histogram(
+    'lucro_ingest_validation_seconds', "Payload validation (serializer) time per ingest request",
+    ['endpoint'], buckets=LATENCY_BUCKETS,
+)
+INGEST_DB_WRITE_SECONDS = Histogram(
+    'lucro_ingest_db_write_seconds', "Account upsert and transaction insert time per ingest request",
+    ['endpoint'], buckets=LATENCY_BUCKETS,
+)
+ENRICHMENT_STAGE_SECONDS = Histogram(
+    'lucro_enrichment_stage_seconds',
+    "Enrichment time per stage: claim and flush per chunk, categorize per categorize_many call, "
+    "external_call per transaction",
+    ['stage'], buckets=LATENCY_BUCKETS,
+)
+CATEGORIZATION_LOOKUPS = Counter(
+    'lucro_categorization_lookups', "Categorization cache lookups by the tier that answered them",
+    ['categorizer', 'tier'],
+)
+SUMMARY_CACHE_LOOKUPS = Counter(
+    'lucro_summary_cache_lookups', "Account summary requests by cache result: hit, miss or not_modified (304)",
+    ['result'],
+)
+SUMMARY_CACHE_ERRORS = Counter(
+    'lucro_summary_cache_errors', "Shared cache failures while reading or writing account summaries",
+)
+SUMMARY_QUERY_SECONDS = Histogram(
+    'lucro_summary_query_seconds', "Time computing a summary from the database (cache misses only)",
+    ['report'], buckets=LATENCY_BUCKETS,
+)
+TASK_SECONDS = Histogram(
+    'lucro_task_duration_seconds', "Celery task run time",
+    ['task', 'outcome'], buckets=LATENCY_BUCKETS,
+)
+TASK_RETRIES = Counter('lucro_task_retries', "Celery task retries", ['task'])
+
+
+def registry():
+    if os.environ.get(MULTIPROC_DIR_ENV):
+        merged = CollectorRegistry()
+        multiprocess.MultiProcessCollector(merged)
+        return merged
+    return REGISTRY
+
+
+def exposition():
+    """(body, content type) of every metric in the text exposition format."""
+    return generate_latest(registry()), CONTENT_TYPE_LATEST
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='batch',
+            name='completed_transactions',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='batch',
+            name='failed_transactions',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='batch',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='batch',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='batch',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('completed', 'Completed'), ('completed_with_errors', 'Completed with errors')], default='pending', max_length=32),
+        ),
+    ]
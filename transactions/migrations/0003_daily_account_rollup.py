@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0002_batch_enrichment_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAccountRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('category', models.CharField(blank=True, default='', max_length=128)),
+                ('ingestion_status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed')], max_length=32)),
+                ('transaction_count', models.IntegerField(default=0)),
+                ('spend_total', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('income_total', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='transactions.account')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('account', 'day', 'category', 'ingestion_status'), name='unique_daily_account_rollup')],
+            },
+        ),
+    ]
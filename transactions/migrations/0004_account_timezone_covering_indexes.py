@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0003_daily_account_rollup'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='dailyaccountrollup',
+            name='unique_daily_account_rollup',
+        ),
+        migrations.AddField(
+            model_name='account',
+            name='timezone',
+            field=models.CharField(default='UTC', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['account', 'date'], include=('amount', 'category', 'ingestion_status'), name='tx_account_date_cover_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='transaction_account_4f6194_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='dailyaccountrollup',
+            constraint=models.UniqueConstraint(fields=('account', 'day', 'category', 'ingestion_status'), include=('transaction_count', 'spend_total', 'income_total'), name='unique_daily_account_rollup'),
+        ),
+    ]
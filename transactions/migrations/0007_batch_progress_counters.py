@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:29
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_counters(apps, schema_editor):
+    Batch = apps.get_model('transactions', 'Batch')
+    Transaction = apps.get_model('transactions', 'Transaction')
+    counters = {}
+    rows = Transaction.objects.values_list('batch_id', 'ingestion_status').annotate(count=Count('id')).order_by()
+    for batch_pk, status, count in rows:
+        counters.setdefault(batch_pk, {})[f'{status}_transactions'] = count
+    for batch_pk, values in counters.items():
+        Batch.objects.filter(pk=batch_pk).update(**values)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0006_transaction_account_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='batch',
+            name='pending_transactions',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='batch',
+            name='processing_transactions',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
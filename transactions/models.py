@@ -7,13 +7,38 @@ class Account(models.Model):
     type = models.CharField(max_length=64)
     subtype = models.CharField(max_length=64, null=True, blank=True)
     mask = models.CharField(max_length=32, null=True, blank=True)
+    # IANA zone the account's reporting days are computed in
+    timezone = models.CharField(max_length=64, default='UTC')
+    # Bumped by every write that changes the account's summary; keys the summary cache
+    data_version = models.BigIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
 class Batch(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_COMPLETED = 'completed'
+    STATUS_COMPLETED_WITH_ERRORS = 'completed_with_errors'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_COMPLETED_WITH_ERRORS, 'Completed with errors'),
+    ]
+
     batch_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     request_id = models.CharField(max_length=255, null=True, blank=True)
     total_transactions = models.IntegerField(default=0)
+    status = models.CharField(max_length=32, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    # Per-status transaction counters, kept current with F() updates by ingestion and
+    # enrichment so progress reads never count Transaction rows (transactions/progress.py).
+    pending_transactions = models.IntegerField(default=0)
+    processing_transactions = models.IntegerField(default=0)
+    completed_transactions = models.IntegerField(default=0)
+    failed_transactions = models.IntegerField(default=0)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
 class Transaction(models.Model):
@@ -45,6 +70,37 @@ class Transaction(models.Model):
 
     class Meta:
         indexes = [
-            models.Index(fields=['account', 'date']),
+            # Covers the summary's range scan so PostgreSQL can answer it index-only.
+            models.Index(
+                fields=['account', 'date'],
+                include=['amount', 'category', 'ingestion_status'],
+                name='tx_account_date_cover_idx',
+            ),
             models.Index(fields=['ingestion_status']),
+            # Keyset pagination of one account's rows (exports resume from the last id).
+            models.Index(fields=['account', 'id'], name='tx_account_id_idx'),
+        ]
+
+
+class DailyAccountRollup(models.Model):
+    """
+    Per-account daily aggregates by category and ingestion status, maintained by
+    transactions.rollups. Uncategorized rows roll up under category ''.
+    """
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='daily_rollups')
+    day = models.DateField()
+    category = models.CharField(max_length=128, blank=True, default='')
+    ingestion_status = models.CharField(max_length=32, choices=Transaction.INGESTION_STATUS_CHOICES)
+    transaction_count = models.IntegerField(default=0)
+    spend_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    income_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['account', 'day', 'category', 'ingestion_status'],
+                include=['transaction_count', 'spend_total', 'income_total'],
+                name='unique_daily_account_rollup',
+            ),
         ]
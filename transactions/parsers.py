@@ -0,0 +1,35 @@
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+def iter_ndjson(lines, encoding='utf-8'):
+    """Yield (line_number, record) from an iterable of byte lines, skipping blank lines."""
+    for line_number, raw in enumerate(lines, start=1):
+        line = raw.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line.decode(encoding))
+        except ValueError as exc:
+            raise ParseError(f"line {line_number}: JSON parse error - {exc}")
+        if not isinstance(record, dict):
+            raise ParseError(f"line {line_number}: expected a JSON object")
+        yield line_number, record
+
+
+class NDJSONParser(BaseParser):
+    """
+    Lazily parses newline-delimited JSON.
+
+    `request.data` becomes a generator of (line_number, record) tuples that reads the
+    body one line at a time, so the payload is never held in memory as a whole.
+    Blank lines are skipped; a malformed line raises ParseError when it is reached.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        return iter_ndjson(stream, encoding)
@@ -0,0 +1,82 @@
+"""
+Per-batch status counters.
+
+`Batch.{pending,processing,completed,failed}_transactions` move with every status change:
+ingestion adds pending rows, claims move rows to processing and result flushes move them
+to completed or failed. Each move is an F() update in the same transaction as the
+status write, so readers see counters and rows change together and progress polling
+costs one primary-key lookup. A row reclaimed after its worker stalled can be counted
+twice, so `finalize_batch_enrichment` recounts the batch once it is done.
+"""
+from collections import Counter
+
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Batch, Transaction
+
+COUNTER_FIELDS = {
+    Transaction.INGESTION_STATUS_PENDING: 'pending_transactions',
+    Transaction.INGESTION_STATUS_PROCESSING: 'processing_transactions',
+    Transaction.INGESTION_STATUS_COMPLETED: 'completed_transactions',
+    Transaction.INGESTION_STATUS_FAILED: 'failed_transactions',
+}
+FINISHED_STATUSES = (Batch.STATUS_COMPLETED, Batch.STATUS_COMPLETED_WITH_ERRORS)
+
+
+def move_batch_counters(batch_pk, transitions):
+    """
+    Apply a Counter of (from_status, to_status) -> rows to the batch's counters; use
+    None as from_status for new rows. Call inside the transaction doing the status write.
+    """
+    deltas = Counter()
+    for (from_status, to_status), rows in transitions.items():
+        if from_status == to_status:
+            continue
+        if from_status is not None:
+            deltas[COUNTER_FIELDS[from_status]] -= rows
+        deltas[COUNTER_FIELDS[to_status]] += rows
+    updates = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if updates:
+        Batch.objects.filter(pk=batch_pk).update(**updates)
+
+
+def reconcile_batch_counters(batch):
+    """Recount the batch's rows by status and store the exact counters; returns them by status."""
+    counts = dict(
+        batch.transactions
+        .values_list('ingestion_status')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    for status, field in COUNTER_FIELDS.items():
+        setattr(batch, field, counts.get(status, 0))
+    batch.save(update_fields=list(COUNTER_FIELDS.values()))
+    return {status: counts.get(status, 0) for status in COUNTER_FIELDS}
+
+
+def batch_progress(batch):
+    counts = {status: getattr(batch, field) for status, field in COUNTER_FIELDS.items()}
+    owned = sum(counts.values())
+    done = counts[Transaction.INGESTION_STATUS_COMPLETED] + counts[Transaction.INGESTION_STATUS_FAILED]
+    if owned:
+        percent = round(100 * done / owned, 1)
+    else:
+        percent = 100.0 if batch.status in FINISHED_STATUSES else 0.0
+    if batch.started_at:
+        duration = ((batch.finished_at or timezone.now()) - batch.started_at).total_seconds()
+    else:
+        duration = None
+    return {
+        "batch_id": str(batch.batch_id),
+        "request_id": batch.request_id,
+        "status": batch.status,
+        "total_transactions": batch.total_transactions,
+        "counts": counts,
+        "percent_complete": percent,
+        "finished": batch.status in FINISHED_STATUSES,
+        "created_at": batch.created_at.isoformat(),
+        "started_at": batch.started_at.isoformat() if batch.started_at else None,
+        "finished_at": batch.finished_at.isoformat() if batch.finished_at else None,
+        "duration_sec": round(duration, 3) if duration is not None else None,
+    }
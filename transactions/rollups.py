@@ -0,0 +1,577 @@
+"""
+Daily account rollups backing the BI summary endpoint.
+
+DailyAccountRollup holds one row per (account, day, category, ingestion_status) with
+count, spend and income. Every write that changes those groups (ingest inserts,
+enrichment claims and result flushes) applies its rows' (category, status) moves to the
+rollups as F()-style increments in its own transaction, so rollups and raw rows commit
+together and no write rescans a day. Finalizing a batch re-aggregates the batch's
+groups from raw rows (repairing rows a stalled and reclaimed worker counted twice), and
+`rebuild_rollups` recomputes any date range. Days are calendar days in the account's
+time zone. The summary reads closed days from rollups and the still-open current day
+(and anything later) from raw rows, so its answer matches the raw aggregation.
+"""
+import datetime
+import zoneinfo
+from collections import defaultdict, namedtuple
+from decimal import Decimal
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, transaction as db_transaction
+from django.db.models import Count, DateField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, Trunc, TruncDate
+from django.utils import timezone
+
+from .models import Account, DailyAccountRollup, Transaction
+from .summary_cache import bump_data_version
+
+UNCATEGORIZED = ''
+ROLLUP_LOCK_NAMESPACE = 0x6C75  # pg_advisory_xact_lock(namespace, account pk)
+DAYS_PER_QUERY = 500
+REBUILD_CHUNK_SIZE = 5000
+
+
+@lru_cache(maxsize=256)
+def account_tz(name):
+    return zoneinfo.ZoneInfo(name) if name else timezone.get_current_timezone()
+
+
+def day_start(day, tz):
+    """Aware start of `day` in `tz`; day ranges are half-open [day_start(a), day_start(b + 1))."""
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min), tz)
+
+
+def day_bounds(start, end, tz):
+    return day_start(start, tz), day_start(end + datetime.timedelta(days=1), tz)
+
+
+def _grouped(queryset, tz):
+    return (
+        queryset
+        .annotate(day=TruncDate('date', tzinfo=tz))
+        .values('account_id', 'day', 'category', 'ingestion_status')
+        .annotate(
+            count=Count('*'),
+            spend=Sum('amount', filter=Q(amount__lt=0)),
+            income=Sum('amount', filter=Q(amount__gt=0)),
+        )
+        .order_by()
+    )
+
+
+def _rollup(row):
+    return DailyAccountRollup(
+        account_id=row['account_id'],
+        day=row['day'],
+        category=row['category'] or UNCATEGORIZED,
+        ingestion_status=row['ingestion_status'],
+        transaction_count=row['count'],
+        spend_total=row['spend'] or 0,
+        income_total=row['income'] or 0,
+    )
+
+
+def _merge_rows(rows):
+    """Merge raw groups that share a rollup key (NULL and '' categories both map to '')."""
+    merged = {}
+    for row in rows:
+        rollup = _rollup(row)
+        key = (rollup.account_id, rollup.day, rollup.category, rollup.ingestion_status)
+        if key in merged:
+            existing = merged[key]
+            existing.transaction_count += rollup.transaction_count
+            existing.spend_total += rollup.spend_total
+            existing.income_total += rollup.income_total
+        else:
+            merged[key] = rollup
+    return list(merged.values())
+
+
+def _lock_account(account_pk, shared=False):
+    # Serializes re-aggregation of one account against every other rollup write, without
+    # locking the Account row that ingestion upserts. Increments commute, so they only
+    # take the lock shared. SQLite serializes writers on its own.
+    if connection.vendor == 'postgresql':
+        function = 'pg_advisory_xact_lock_shared' if shared else 'pg_advisory_xact_lock'
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT {function}(%s, %s)', [ROLLUP_LOCK_NAMESPACE, account_pk % 2**31])
+
+
+def refresh_account_days(account_pk, days, tz):
+    """Recompute the rollups of one account for the given (account-local) days from raw rows."""
+    days = sorted(set(days))
+    with db_transaction.atomic():
+        _lock_account(account_pk)
+        for i in range(0, len(days), DAYS_PER_QUERY):
+            chunk = days[i:i + DAYS_PER_QUERY]
+            lower, upper = day_bounds(chunk[0], chunk[-1], tz)
+            rows = _grouped(
+                Transaction.objects.filter(account_id=account_pk, date__gte=lower, date__lt=upper), tz
+            ).filter(day__in=chunk)
+            rollups = _merge_rows(rows)
+            DailyAccountRollup.objects.filter(account_id=account_pk, day__in=chunk).delete()
+            DailyAccountRollup.objects.bulk_create(rollups)
+        bump_data_version([account_pk])
+
+
+def rollup_deltas(changes):
+    """
+    Sum row changes into {(account pk, day, category, status): [count, spend, income]}.
+
+    `changes` are (account pk, aware date, amount, before, after) tuples, where `before`
+    and `after` are (category, ingestion_status) pairs, or None for a row that did not
+    exist before. Keys whose changes cancel out are dropped.
+    """
+    changes = list(changes)
+    if not changes:
+        return {}
+    zones = dict(Account.objects.filter(pk__in={change[0] for change in changes}).values_list('pk', 'timezone'))
+    deltas = defaultdict(lambda: [0, Decimal(0), Decimal(0)])
+    for account_pk, date, amount, before, after in changes:
+        day = timezone.localtime(date, account_tz(zones.get(account_pk))).date()
+        amount = Decimal(amount)
+        spend, income = (amount, 0) if amount < 0 else (0, amount)
+        for state, sign in ((before, -1), (after, 1)):
+            if state is not None:
+                category, status = state
+                delta = deltas[(account_pk, day, category or UNCATEGORIZED, status)]
+                delta[0] += sign
+                delta[1] += sign * spend
+                delta[2] += sign * income
+    return {key: delta for key, delta in sorted(deltas.items()) if any(delta)}
+
+
+def apply_rollup_changes(changes, bump=True):
+    """
+    Move rows between rollup groups inside the caller's transaction (see rollup_deltas for
+    `changes`). Groups are incremented in place and emptied groups are deleted, so the
+    cost follows the rows written, not the size of their days. With `bump`, the accounts'
+    data_version moves once the transaction commits. Returns the number of groups touched.
+    """
+    deltas = rollup_deltas(changes)
+    if not deltas:
+        return 0
+    account_pks = sorted({key[0] for key in deltas})
+    for account_pk in account_pks:
+        _lock_account(account_pk, shared=True)
+    if connection.vendor == 'postgresql':
+        _upsert_deltas(deltas)
+    else:
+        _update_deltas(deltas)
+    DailyAccountRollup.objects.filter(
+        account_id__in=account_pks, day__in={key[1] for key in deltas}, transaction_count=0
+    ).delete()
+    if bump:
+        db_transaction.on_commit(lambda: bump_data_version(account_pks), robust=True)
+    return len(deltas)
+
+
+def _upsert_deltas(deltas):
+    # One statement, relying on the unique (account, day, category, status) constraint.
+    # Keys are sorted, so concurrent writers lock shared groups in the same order.
+    table = connection.ops.quote_name(DailyAccountRollup._meta.db_table)
+    now = timezone.now()
+    values = []
+    for (account_pk, day, category, status), (count, spend, income) in deltas.items():
+        values.extend([account_pk, day, category, status, count, spend, income, now])
+    rows = ', '.join(['(%s, %s, %s, %s, %s, %s, %s, %s)'] * len(deltas))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} AS r (
+                account_id, day, category, ingestion_status, transaction_count, spend_total, income_total, updated_at
+            )
+            VALUES {rows}
+            ON CONFLICT (account_id, day, category, ingestion_status) DO UPDATE SET
+                transaction_count = r.transaction_count + EXCLUDED.transaction_count,
+                spend_total = r.spend_total + EXCLUDED.spend_total,
+                income_total = r.income_total + EXCLUDED.income_total,
+                updated_at = EXCLUDED.updated_at
+            """,
+            values,
+        )
+
+
+def _update_deltas(deltas):
+    # Backends without the unique constraint (SQLite skips covering constraints): F()
+    # increments for existing groups, then inserts for the rest. Writers are serialized.
+    now = timezone.now()
+    missing = []
+    for (account_pk, day, category, status), (count, spend, income) in deltas.items():
+        updated = DailyAccountRollup.objects.filter(
+            account_id=account_pk, day=day, category=category, ingestion_status=status
+        ).update(
+            transaction_count=F('transaction_count') + count,
+            spend_total=F('spend_total') + spend,
+            income_total=F('income_total') + income,
+            updated_at=now,
+        )
+        if not updated:
+            missing.append(DailyAccountRollup(
+                account_id=account_pk, day=day, category=category, ingestion_status=status,
+                transaction_count=count, spend_total=spend, income_total=income,
+            ))
+    DailyAccountRollup.objects.bulk_create(missing)
+
+
+def refresh_batch_rollups(batch):
+    """Refresh every (account, day) group that has rows in `batch`; returns the group count."""
+    accounts = (
+        Account.objects
+        .filter(pk__in=batch.transactions.values('account_id'))
+        .order_by('pk')
+        .values_list('pk', 'timezone')
+    )
+    refreshed = 0
+    for account_pk, tz_name in accounts:
+        tz = account_tz(tz_name)
+        days = list(
+            batch.transactions
+            .filter(account_id=account_pk)
+            .annotate(day=TruncDate('date', tzinfo=tz))
+            .values_list('day', flat=True)
+            .distinct()
+            .order_by()
+        )
+        refresh_account_days(account_pk, days, tz)
+        refreshed += len(days)
+    return refreshed
+
+
+def rebuild_rollups(start=None, end=None, account_ids=None):
+    """
+    Recompute rollups from raw rows for days in [start, end] (either bound optional),
+    optionally limited to the given account_ids. Returns the number of rollup rows written.
+    """
+    accounts = Account.objects.order_by('pk')
+    if account_ids:
+        accounts = accounts.filter(account_id__in=account_ids)
+
+    written = 0
+    for account_pk, tz_name in accounts.values_list('pk', 'timezone').iterator():
+        tz = account_tz(tz_name)
+        transactions = Transaction.objects.filter(account_id=account_pk)
+        rollups = DailyAccountRollup.objects.filter(account_id=account_pk)
+        if start:
+            transactions = transactions.filter(date__gte=day_start(start, tz))
+            rollups = rollups.filter(day__gte=start)
+        if end:
+            transactions = transactions.filter(date__lt=day_start(end + datetime.timedelta(days=1), tz))
+            rollups = rollups.filter(day__lte=end)
+
+        with db_transaction.atomic():
+            _lock_account(account_pk)
+            rollups.delete()
+            pending = []
+            for row in _grouped(transactions, tz).order_by('day').iterator(chunk_size=REBUILD_CHUNK_SIZE):
+                # Flush on day boundaries only, so NULL and '' categories of a day merge.
+                if len(pending) >= REBUILD_CHUNK_SIZE and pending[-1]['day'] != row['day']:
+                    written += _bulk_write(pending)
+                    pending = []
+                pending.append(row)
+            written += _bulk_write(pending)
+            bump_data_version([account_pk])
+    return written
+
+
+def _bulk_write(rows):
+    rollups = _merge_rows(rows)
+    DailyAccountRollup.objects.bulk_create(rollups, batch_size=REBUILD_CHUNK_SIZE)
+    return len(rollups)
+
+
+# --- summary ---------------------------------------------------------------
+
+def _summarize(groups):
+    """Build the summary payload from (category, ingestion_status, count, spend, income) groups."""
+    total_count = 0
+    total_spend = Decimal(0)
+    total_income = Decimal(0)
+    categories = {}
+    statuses = defaultdict(int)
+
+    for category, ingestion_status, count, spend, income in groups:
+        spend = spend or Decimal(0)
+        income = income or Decimal(0)
+        total_count += count
+        total_spend += spend
+        total_income += income
+        statuses[ingestion_status] += count
+        if category:
+            entry = categories.setdefault(category, [Decimal(0), 0])
+            entry[0] += spend
+            entry[1] += count
+
+    top = sorted(categories.items(), key=lambda item: (item[1][0], item[0]))[:3]
+    return {
+        "metrics": {
+            "total_transactions": total_count,
+            "total_spend": float(abs(total_spend)) if total_spend else 0.0,
+            "total_income": float(total_income) if total_income else 0.0,
+            "net": float(total_spend + total_income),
+        },
+        "top_categories": [
+            {
+                "category": category,
+                "total_spend": float(abs(spend)) if spend else 0.0,
+                "transaction_count": count,
+            }
+            for category, (spend, count) in top
+        ],
+        "processing_status": {
+            "pending": statuses[Transaction.INGESTION_STATUS_PENDING],
+            "processing": statuses[Transaction.INGESTION_STATUS_PROCESSING],
+            "completed": statuses[Transaction.INGESTION_STATUS_COMPLETED],
+            "failed": statuses[Transaction.INGESTION_STATUS_FAILED],
+        },
+    }
+
+
+GROUP_COLUMNS = ('category', 'ingestion_status', 'count', 'spend', 'income')
+
+
+def _raw_grouped(condition, by_account=False):
+    # Half-open bounds on the raw timestamp keep this a range scan on the covering
+    # (account, date) index; COUNT(*) means no column outside the index is read.
+    keys = ('account_id', 'category', 'ingestion_status') if by_account else ('category', 'ingestion_status')
+    return (
+        Transaction.objects
+        .filter(condition)
+        .values(*keys)
+        .annotate(
+            count=Count('*'),
+            spend=Sum('amount', filter=Q(amount__lt=0)),
+            income=Sum('amount', filter=Q(amount__gt=0)),
+        )
+        .order_by()
+        .values_list(*keys[:-2], *GROUP_COLUMNS)
+    )
+
+
+def _rollup_grouped(condition, by_account=False):
+    keys = ('account_id', 'category', 'ingestion_status') if by_account else ('category', 'ingestion_status')
+    return (
+        DailyAccountRollup.objects
+        .filter(condition)
+        .values(*keys)
+        .annotate(
+            count=Sum('transaction_count'),
+            spend=Sum('spend_total'),
+            income=Sum('income_total'),
+        )
+        .order_by()
+        .values_list(*keys[:-2], *GROUP_COLUMNS)
+    )
+
+
+def _raw_groups(account_pk, lower, upper):
+    return _raw_grouped(Q(account_id=account_pk, date__gte=lower, date__lt=upper))
+
+
+def _rollup_groups(account_pk, start, end):
+    return _rollup_grouped(Q(account_id=account_pk, day__gte=start, day__lte=end))
+
+
+AccountRef = namedtuple('AccountRef', ['pk', 'timezone', 'data_version'])
+
+
+def get_account_ref(account_id):
+    """What a summary needs to know about an account, in one query; None if it does not exist."""
+    row = Account.objects.filter(account_id=account_id).values_list('pk', 'timezone', 'data_version').first()
+    return AccountRef(*row) if row else None
+
+
+def get_account_refs(account_ids):
+    """{account_id: AccountRef} for the accounts that exist, in one query."""
+    rows = Account.objects.filter(account_id__in=list(account_ids)).values_list(
+        'account_id', 'pk', 'timezone', 'data_version'
+    )
+    return {account_id: AccountRef(*ref) for account_id, *ref in rows}
+
+
+def raw_account_summary(account_id, start, end):
+    """The summary aggregated straight from Transaction rows."""
+    account = get_account_ref(account_id)
+    if account is None:
+        return _summarize([])
+    return _summarize(_raw_groups(account.pk, *day_bounds(start, end, account_tz(account.timezone))))
+
+
+def _union(parts):
+    return parts[0].union(*parts[1:], all=True) if len(parts) > 1 else parts[0]
+
+
+def summary_groups(account_pk, tz, start, end, today=None):
+    """
+    One queryset yielding GROUP_COLUMNS tuples for [start, end]: closed days from rollups
+    and today onwards from raw rows, combined with UNION ALL so it is a single round trip.
+    """
+    today = today or timezone.localdate(timezone=tz)
+    parts = []
+    if start < today:
+        parts.append(_rollup_groups(account_pk, start, min(end, today - datetime.timedelta(days=1))))
+    if end >= today:
+        parts.append(_raw_groups(account_pk, *day_bounds(max(start, today), end, tz)))
+    return _union(parts)
+
+
+def portfolio_groups(accounts, start, end, today=None):
+    """
+    Like summary_groups for many accounts at once, with account pk as the first column.
+
+    Accounts are grouped by time zone (each zone has its own "today"); every zone adds one
+    OR-ed condition to a single rollup query and a single raw query, so the number of
+    queries does not depend on the number of accounts.
+    """
+    by_tz = defaultdict(list)
+    for account in accounts:
+        by_tz[account.timezone].append(account.pk)
+
+    rollup_condition, raw_condition = Q(), Q()
+    for tz_name, pks in by_tz.items():
+        tz = account_tz(tz_name)
+        local_today = today or timezone.localdate(timezone=tz)
+        if start < local_today:
+            last_closed = min(end, local_today - datetime.timedelta(days=1))
+            rollup_condition |= Q(account_id__in=pks, day__gte=start, day__lte=last_closed)
+        if end >= local_today:
+            lower, upper = day_bounds(max(start, local_today), end, tz)
+            raw_condition |= Q(account_id__in=pks, date__gte=lower, date__lt=upper)
+
+    parts = []
+    if rollup_condition:
+        parts.append(_rollup_grouped(rollup_condition, by_account=True))
+    if raw_condition:
+        parts.append(_raw_grouped(raw_condition, by_account=True))
+    return _union(parts) if parts else []
+
+
+def account_summary(account_id, start, end, today=None, account=None):
+    """
+    The summary for [start, end] in the account's time zone. Pass `account` (an AccountRef)
+    to skip the lookup. Falls back to raw_account_summary when settings.SUMMARY_USE_ROLLUPS is off.
+    """
+    if not getattr(settings, 'SUMMARY_USE_ROLLUPS', True):
+        return raw_account_summary(account_id, start, end)
+
+    account = account or get_account_ref(account_id)
+    if account is None:
+        return _summarize([])
+    return _summarize(summary_groups(account.pk, account_tz(account.timezone), start, end, today=today))
+
+
+def portfolio_summary(accounts, start, end, today=None):
+    """
+    Summaries for many accounts plus portfolio-wide totals in one grouped round trip.
+
+    `accounts` maps account_id to AccountRef (see get_account_refs). Returns
+    ({account_id: summary}, totals), each in the single-account summary shape.
+    """
+    if not getattr(settings, 'SUMMARY_USE_ROLLUPS', True):
+        today = datetime.date.min  # every day counts as open: raw rows only
+    rows = portfolio_groups(accounts.values(), start, end, today=today)
+
+    by_pk = defaultdict(list)
+    for account_pk, *group in rows:
+        by_pk[account_pk].append(group)
+    per_account = {
+        account_id: _summarize(by_pk.get(account.pk, []))
+        for account_id, account in accounts.items()
+    }
+    totals = _summarize(group for groups in by_pk.values() for group in groups)
+    return per_account, totals
+
+
+
+# --- series ----------------------------------------------------------------
+
+SERIES_INTERVALS = ('day', 'week', 'month')
+SERIES_CHUNK_SIZE = 2000
+
+
+def _series_parts(account, start, end, interval, by_category, today):
+    tz = account_tz(account.timezone)
+    keys = ('bucket', 'category') if by_category else ('bucket',)
+    raw_keys = ('bucket', 'category_key') if by_category else keys
+    parts = []
+    if start < today:
+        parts.append(
+            DailyAccountRollup.objects
+            .filter(account_id=account.pk, day__gte=start, day__lte=min(end, today - datetime.timedelta(days=1)))
+            .annotate(bucket=Trunc('day', interval, output_field=DateField()))
+            .values(*keys)
+            .annotate(count=Sum('transaction_count'), spend=Sum('spend_total'), income=Sum('income_total'))
+            .order_by()
+            .values_list(*keys, 'count', 'spend', 'income')
+        )
+    if end >= today:
+        lower, upper = day_bounds(max(start, today), end, tz)
+        parts.append(
+            Transaction.objects
+            .filter(account_id=account.pk, date__gte=lower, date__lt=upper)
+            .annotate(
+                bucket=Trunc('date', interval, output_field=DateField(), tzinfo=tz),
+                # Rollups store uncategorized rows under ''; match them.
+                category_key=Coalesce('category', Value('')),
+            )
+            .values(*raw_keys)
+            .annotate(
+                count=Count('*'),
+                spend=Sum('amount', filter=Q(amount__lt=0)),
+                income=Sum('amount', filter=Q(amount__gt=0)),
+            )
+            .order_by()
+            .values_list(*raw_keys, 'count', 'spend', 'income')
+        )
+    if not parts:
+        return None
+    # A union is ordered by the first part's column names.
+    return _union(parts).order_by(*(keys if start < today else raw_keys))
+
+
+def _series_point(key, by_category, count, spend, income):
+    spend = spend or Decimal(0)
+    income = income or Decimal(0)
+    point = {"period_start": key[0].isoformat()}
+    if by_category:
+        point["category"] = key[1] or None
+    point.update({
+        "count": count,
+        "spend": float(abs(spend)) if spend else 0.0,
+        "income": float(income) if income else 0.0,
+        "net": float(spend + income),
+    })
+    return point
+
+
+def account_series(account, start, end, interval='day', by_category=False, today=None):
+    """
+    Yield spend/income/net/count points per `interval` bucket (and category), in order.
+
+    Buckets are truncated in the database (`date_trunc` on PostgreSQL): closed days come
+    from rollups and today onwards from raw rows, in one ordered UNION ALL read through a
+    server-side cursor. A bucket spanning today appears in both parts; equal keys arrive
+    adjacent and are merged here, so memory does not depend on the range.
+    """
+    if not getattr(settings, 'SUMMARY_USE_ROLLUPS', True):
+        today = datetime.date.min
+    today = today or timezone.localdate(timezone=account_tz(account.timezone))
+    rows = _series_parts(account, start, end, interval, by_category, today)
+    if rows is None:
+        return
+
+    width = 2 if by_category else 1
+    current_key, totals = None, None
+    for row in rows.iterator(chunk_size=SERIES_CHUNK_SIZE):
+        key, (count, spend, income) = row[:width], row[width:]
+        if key == current_key:
+            totals[0] += count
+            totals[1] += spend or 0
+            totals[2] += income or 0
+            continue
+        if current_key is not None:
+            yield _series_point(current_key, by_category, *totals)
+        current_key, totals = key, [count, spend or Decimal(0), income or Decimal(0)]
+    if current_key is not None:
+        yield _series_point(current_key, by_category, *totals)
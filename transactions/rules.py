@@ -0,0 +1,132 @@
+"""
+Data-driven categorization rules compiled into a single-pass keyword matcher.
+
+Rules are an ordered list of (category, keywords); earlier rules win. Keywords match
+case-insensitively on word boundaries, like the original `\\bkeyword\\b` regexes, but the
+text is tokenized once and each token is looked up in a dict, so the cost per row does
+not depend on how many rules or keywords exist.
+"""
+import hashlib
+import json
+import os
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+try:
+    import yaml
+except ImportError:  # YAML rule files are optional
+    yaml = None
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def split_keyword(keyword):
+    """Split a keyword into lowercase word tokens and the exact separators between them."""
+    lowered = keyword.strip().lower()
+    matches = list(TOKEN_RE.finditer(lowered))
+    if not matches or matches[0].start() != 0 or matches[-1].end() != len(lowered):
+        raise ValueError(f"Keyword {keyword!r} must start and end with a word character")
+    tokens = tuple(m.group() for m in matches)
+    seps = tuple(lowered[a.end():b.start()] for a, b in zip(matches, matches[1:]))
+    return tokens, seps
+
+
+class KeywordMatcher:
+    """Word-level trie over all keywords; match() returns the highest-priority category."""
+
+    def __init__(self, rules):
+        index = {}
+        for priority, (category, keywords) in enumerate(rules):
+            for keyword in keywords:
+                tokens, seps = split_keyword(keyword)
+                index.setdefault(tokens[0], []).append((priority, tokens[1:], seps, category))
+        for candidates in index.values():
+            candidates.sort(key=lambda candidate: candidate[0])
+        self.index = index
+
+    def match(self, text):
+        lowered = text.lower()
+        tokens = [(m.start(), m.end(), m.group()) for m in TOKEN_RE.finditer(lowered)]
+        best_priority, best_category = None, None
+        index = self.index
+
+        for position, (_, end, word) in enumerate(tokens):
+            candidates = index.get(word)
+            if candidates is None:
+                continue
+            for priority, tail, seps, category in candidates:
+                if best_priority is not None and priority >= best_priority:
+                    break
+                if tail and not self._tail_matches(lowered, tokens, position, tail, seps):
+                    continue
+                best_priority, best_category = priority, category
+                if priority == 0:
+                    return category
+                break
+        return best_category
+
+    @staticmethod
+    def _tail_matches(lowered, tokens, position, tail, seps):
+        if position + len(tail) >= len(tokens):
+            return False
+        previous_end = tokens[position][1]
+        for offset, (expected, sep) in enumerate(zip(tail, seps), start=1):
+            start, end, word = tokens[position + offset]
+            if word != expected or lowered[previous_end:start] != sep:
+                return False
+            previous_end = end
+        return True
+
+
+@dataclass
+class RuleSet:
+    rules: List[Tuple[str, List[str]]]
+    matcher: KeywordMatcher
+    version: str
+    source: Optional[str] = None
+
+    @classmethod
+    def compile(cls, rules, source=None):
+        rules = [(category, list(keywords)) for category, keywords in rules]
+        fingerprint = hashlib.sha1(json.dumps(rules, sort_keys=True).encode()).hexdigest()[:12]
+        return cls(rules=rules, matcher=KeywordMatcher(rules), version=fingerprint, source=source)
+
+
+def parse_rules(document):
+    """
+    Accepts {"rules": [{"category": ..., "keywords": [...], "priority": n?}, ...]}.
+
+    Rules without an explicit priority keep their file order after prioritized ones
+    with lower numbers; ties keep file order.
+    """
+    entries = document.get('rules') if isinstance(document, dict) else None
+    if not isinstance(entries, list):
+        raise ValueError("Rules document must contain a 'rules' list")
+    ordered = sorted(
+        enumerate(entries),
+        key=lambda pair: (pair[1].get('priority', float('inf')), pair[0]),
+    )
+    rules = []
+    for _, entry in ordered:
+        category, keywords = entry.get('category'), entry.get('keywords')
+        if not category or not isinstance(keywords, list) or not keywords:
+            raise ValueError(f"Rule {entry!r} needs a category and a non-empty keywords list")
+        rules.append((category, keywords))
+    return rules
+
+
+def load_rules_file(path):
+    with open(path, encoding='utf-8') as f:
+        if path.endswith(('.yaml', '.yml')):
+            if yaml is None:
+                raise ImportError("PyYAML is required to load YAML rule files")
+            document = yaml.safe_load(f)
+        else:
+            document = json.load(f)
+    return RuleSet.compile(parse_rules(document), source=path)
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
@@ -1,4 +1,13 @@
 from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+
+def list_errors(errors, length):
+    """Shape {index: detail} like ListSerializer does for the installed DRF version."""
+    if getattr(api_settings, 'LIST_SERIALIZER_ERRORS_AS_DICT', False):
+        return errors
+    return [errors.get(index, {}) for index in range(length)]
+
 
 class AccountSerializer(serializers.Serializer):
     account_id = serializers.CharField()
@@ -24,3 +33,14 @@ class IngestBatchSerializer(serializers.Serializer):
     transactions = TransactionItemSerializer(many=True)
     total_transactions = serializers.IntegerField()
     request_id = serializers.CharField(required=False, allow_null=True)
+
+    def validate(self, attrs):
+        known = {acc['account_id'] for acc in attrs['accounts']}
+        errors = {
+            index: {'account_id': [f"Account {tx['account_id']} missing in payload"]}
+            for index, tx in enumerate(attrs['transactions'])
+            if tx['account_id'] not in known
+        }
+        if errors:
+            raise serializers.ValidationError({'transactions': list_errors(errors, len(attrs['transactions']))})
+        return attrs
@@ -0,0 +1,118 @@
+"""
+Versioned cache for account summaries.
+
+Every write that changes an account's rollups (ingest, enrichment result flushes,
+finalize repairs and rebuilds) calls `bump_data_version` after its commit, in its own
+short transaction. Enrichment claims move rollup counts without bumping: the claim is
+transient and its flush bumps. The summary cache key and ETag embed the account's
+`data_version`, so a cached entry is exact until the next write and needs no TTL tuning: a reader that sees version v also sees every write committed before
+the bump to v. Bumping after the commit keeps the Account row lock out of the enrichment
+transactions, so concurrent chunks of one account do not queue on it.
+"""
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+from django.utils.http import parse_etags
+
+from .metrics import SUMMARY_CACHE_ERRORS, SUMMARY_CACHE_LOOKUPS
+from .models import Account
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 24 * 3600
+DEFAULT_CACHE_ALIAS = 'default'
+KEY_PREFIX = 'summary'
+
+
+def bump_data_version(account_pks):
+    """Invalidate cached summaries of the given accounts. Call once the write has committed."""
+    account_pks = sorted(set(account_pks))
+    if account_pks:
+        Account.objects.filter(pk__in=account_pks).update(data_version=F('data_version') + 1)
+
+
+def summary_etag(account, start, end):
+    digest = hashlib.sha1(f"{account.pk}:{account.data_version}:{start}:{end}".encode()).hexdigest()[:20]
+    # Weak: the body also carries per-request fields (correlation_id, duration_sec).
+    return f'W/"{digest}"'
+
+
+def portfolio_etag(account_ids, accounts, start, end):
+    """`account_ids` as requested (order and unknown ids shape the body), `accounts` as resolved."""
+    versions = ','.join(
+        f"{account_id}:{accounts[account_id].data_version if account_id in accounts else '-'}"
+        for account_id in account_ids
+    )
+    digest = hashlib.sha1(f"{versions}:{start}:{end}".encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    candidates = parse_etags(if_none_match)
+    opaque = etag.removeprefix('W/')
+    return '*' in candidates or any(candidate.removeprefix('W/') == opaque for candidate in candidates)
+
+
+class SummaryCache:
+    def __init__(self, ttl=None, cache_alias=None):
+        self.ttl = ttl
+        self.cache_alias = cache_alias
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.errors = 0
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'SUMMARY_CACHE_ENABLED', True)
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias or getattr(settings, 'SUMMARY_CACHE_ALIAS', DEFAULT_CACHE_ALIAS)]
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "not_modified": self.not_modified, "errors": self.errors}
+
+    def key(self, account, start, end):
+        return f"{KEY_PREFIX}:{account.pk}:{account.data_version}:{start}:{end}"
+
+    def get_or_compute(self, account, start, end, compute):
+        """Return (summary, hit). Cache failures fall back to computing the summary."""
+        if not self.enabled:
+            return compute(), False
+        key = self.key(account, start, end)
+        try:
+            summary = self.cache.get(key)
+        except Exception as e:
+            self._failed(e)
+            summary = None
+        if summary is not None:
+            self.hits += 1
+            SUMMARY_CACHE_LOOKUPS.labels('hit').inc()
+            return summary, True
+
+        self.misses += 1
+        SUMMARY_CACHE_LOOKUPS.labels('miss').inc()
+        summary = compute()
+        try:
+            self.cache.set(key, summary, timeout=self.ttl or getattr(settings, 'SUMMARY_CACHE_TTL', DEFAULT_TTL))
+        except Exception as e:
+            self._failed(e)
+        return summary, False
+
+    def record_not_modified(self):
+        self.not_modified += 1
+        SUMMARY_CACHE_LOOKUPS.labels('not_modified').inc()
+
+    def _failed(self, error):
+        self.errors += 1
+        SUMMARY_CACHE_ERRORS.inc()
+        logger.warning("summary_cache_error", extra={"error": str(error)})
+
+
+summary_cache = SummaryCache()
@@ -0,0 +1,71 @@
+import datetime
+import random
+import uuid
+
+MERCHANTS = ["Amazon Marketplace", "Stripe", "Uber", "AWS", "Starbucks", "PayPal", "Lyft", "Adobe"]
+
+
+def make_account(account_id=None):
+    return {
+        "account_id": account_id or f"acc_{uuid.uuid4().hex[:8]}",
+        "name": "Business Checking",
+        "type": "depository",
+        "subtype": "checking",
+        "mask": "1111",
+    }
+
+
+def make_transaction(account_id, now=None, rng=random):
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    return {
+        "transaction_id": f"tx_{uuid.uuid4().hex[:12]}",
+        "account_id": account_id,
+        "amount": round(rng.choice([-1, 1]) * round(rng.uniform(5, 1500), 2), 2),
+        "iso_currency_code": "USD",
+        "date": (now - datetime.timedelta(days=rng.randint(0, 30))).isoformat(),
+        "authorized_date": (now - datetime.timedelta(days=rng.randint(0, 30))).date().isoformat(),
+        "name": rng.choice(MERCHANTS),
+        "merchant_name": rng.choice(MERCHANTS),
+        "payment_channel": rng.choice(["online", "in store"]),
+        "pending": False,
+    }
+
+
+def make_payload(n_transactions, n_accounts=1, rng=random):
+    """Build a payload in the shape accepted by IngestBatchSerializer."""
+    accounts = [make_account() for _ in range(n_accounts)]
+    now = datetime.datetime.now(datetime.timezone.utc)
+    transactions = [
+        make_transaction(rng.choice(accounts)["account_id"], now=now, rng=rng)
+        for _ in range(n_transactions)
+    ]
+    return {
+        "accounts": accounts,
+        "transactions": transactions,
+        "total_transactions": len(transactions),
+        "request_id": f"req_{uuid.uuid4().hex[:8]}",
+    }
+
+
+def make_categorizer_records(n, rng=random):
+    """(merchant_name, description) pairs as seen by the categorizer, including misses."""
+    merchants = MERCHANTS + ["Local Hardware", "City Parking", None]
+    return [
+        (rng.choice(merchants), rng.choice(MERCHANTS + ["Card payment", "Invoice 1042", None]))
+        for _ in range(n)
+    ]
+
+
+def make_rules(n_rules, rng=random, keywords_per_rule=3):
+    """
+    n_rules synthetic keyword rules, with the built-in merchants spread across them so
+    benchmark records match rules at every priority, not just the first few.
+    """
+    rules = [
+        (f"Category {i}", [f"merchant{i}x{k}" for k in range(keywords_per_rule)])
+        for i in range(n_rules)
+    ]
+    for merchant in MERCHANTS:
+        category, keywords = rules[rng.randrange(n_rules)]
+        keywords.append(merchant.lower())
+    return rules
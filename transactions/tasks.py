@@ -1,26 +1,65 @@
-import time, random, logging
-from celery import shared_task, Task
+import time, logging
+from celery import shared_task, Task, chord
+from django.conf import settings
+from django.utils import timezone
 from .models import Batch, Transaction
-from .categorizer import RuleBasedCategorizer
-from django.db import transaction as db_transaction
+from .enrichment import DEFAULT_CLAIM_TIMEOUT, enrich_transactions
+from .metrics import TASK_RETRIES, TASK_SECONDS
+from .progress import FINISHED_STATUSES, reconcile_batch_counters
+from .rollups import refresh_batch_rollups
 from project.settings import set_correlation_id, get_correlation_id
+from middleware.profiling import Profile, should_profile_task
 logger = logging.getLogger("")
 task_logger = logging.getLogger("observability.tasks")
 
+DEFAULT_ENRICHMENT_CHUNK_SIZE = 100
+DEFAULT_REDISPATCH_DELAY = 30
+DEFAULT_MAX_REDISPATCHES = 3
+
+def task_correlation_id(request, kwargs):
+    """The correlation id a task was sent with: its `correlation_id` kwarg, else the message header."""
+    # Worker requests carry custom message headers as attributes; eager apply() nests them.
+    return (
+        kwargs.get("correlation_id")
+        or getattr(request, "correlation_id", None)
+        or (getattr(request, "headers", None) or {}).get("correlation_id")
+    )
+
+
+def enqueue_batch_enrichment(batch_id_str, correlation_id, attempt=0, **options):
+    """
+    Queue process_batch_enrichment with the caller's correlation id, as a kwarg and as a
+    message header, so the task's log lines and profiles join the request that sent it.
+    """
+    kwargs = {"correlation_id": correlation_id}
+    if attempt:
+        kwargs["attempt"] = attempt
+    return process_batch_enrichment.apply_async(
+        args=[batch_id_str], kwargs=kwargs, headers={"correlation_id": correlation_id}, **options
+    )
+
+
 class ObservabilityTask(Task):
+    """
+    Correlation id, completion/failure log lines and duration/retry metrics for every task.
+    A PROFILING_TASK_SAMPLE_RATE share of runs is profiled (see middleware.profiling).
+    """
     abstract = True
 
     def __call__(self, *args, **kwargs):
         self._start = time.time()
 
-        # Use incoming correlation ID, else generate one
-        cid = getattr(self.request, "correlation_id", None)
-        set_correlation_id(cid)
+        # Use the caller's correlation ID (kwarg or message header), else generate one
+        set_correlation_id(task_correlation_id(self.request, kwargs))
 
+        if should_profile_task():
+            with Profile('task', self.name):
+                return super().__call__(*args, **kwargs)
         return super().__call__(*args, **kwargs)
 
     def on_success(self, retval, task_id, args, kwargs):
         duration = time.time() - self._start
+        TASK_SECONDS.labels(self.name, 'success').observe(duration)
 
         task_logger.info(
             f"{self.name} completed",
@@ -34,8 +73,13 @@ class ObservabilityTask(Task):
             },
         )
 
+    def on_retry(self, exc, task_id, args, kwargs, einfo):
+        TASK_SECONDS.labels(self.name, 'retry').observe(time.time() - self._start)
+        TASK_RETRIES.labels(self.name).inc()
+
     def on_failure(self, exc, task_id, args, kwargs, einfo):
         duration = time.time() - self._start
+        TASK_SECONDS.labels(self.name, 'failure').observe(duration)
 
         task_logger.error(
             f"{self.name} failed: {exc}",
@@ -50,9 +94,21 @@ class ObservabilityTask(Task):
         )
 
 
+def enrichment_chunk_size():
+    return getattr(settings, 'ENRICHMENT_CHUNK_SIZE', DEFAULT_ENRICHMENT_CHUNK_SIZE)
+
+
 @shared_task(bind=True, base=ObservabilityTask, max_retries=3, default_retry_delay=10)
-def process_batch_enrichment(self, batch_id_str, correlation_id=None):
-    correlation_id = correlation_id or self.request.id or generate_correlation_id()
+def process_batch_enrichment(self, batch_id_str, correlation_id=None, attempt=0):
+    """
+    Split a batch into chunks of ENRICHMENT_CHUNK_SIZE transaction ids and fan them out.
+
+    Chunks run as a Celery chord so every worker slot can take part; the chord callback
+    finalizes the batch, and fail_batch_enrichment closes it if a chunk fails for good.
+    Single-chunk batches (and direct calls) are processed inline. `attempt` counts
+    re-dispatches by finalize_batch_enrichment for rows that were not claimable yet.
+    """
+    correlation_id = correlation_id or get_correlation_id()
     task_start = time.time()
     logger.info(
         "task_started",
@@ -72,66 +128,129 @@ def process_batch_enrichment(self, batch_id_str, correlation_id=None):
             extra={"correlation_id": correlation_id, "batch_id": batch_id_str}
         )
         return
+    if attempt and batch.status in FINISHED_STATUSES:
+        # Another run finished the rows this re-dispatch was waiting for.
+        return
 
-    categorizer = RuleBasedCategorizer()
+    transaction_ids = list(
+        batch.transactions
+        .exclude(ingestion_status=Transaction.INGESTION_STATUS_COMPLETED)
+        .order_by('id')
+        .values_list('id', flat=True)
+    )
+    size = enrichment_chunk_size()
+    chunks = [transaction_ids[i:i + size] for i in range(0, len(transaction_ids), size)]
 
-    # Ensure the select_for_update happens inside a transaction
-    with db_transaction.atomic():
-        tx_qs = (
-            batch.transactions
-            .select_for_update(skip_locked=True)
-            .all()
-        )
-        transactions_list = list(tx_qs)
+    Batch.objects.filter(pk=batch.pk, started_at__isnull=True).update(started_at=timezone.now())
+    Batch.objects.filter(pk=batch.pk).update(status=Batch.STATUS_PROCESSING, finished_at=None)
 
-    # Process each transaction independently
-    for tx in transactions_list:
-        if tx.ingestion_status == Transaction.INGESTION_STATUS_COMPLETED:
-            continue
+    if len(chunks) <= 1 or self.request.called_directly:
+        results = [enrich_transactions(batch, chunk, correlation_id) for chunk in chunks]
+        return finalize_batch_enrichment(results, batch_id_str, correlation_id=correlation_id, attempt=attempt)
 
-        tx_start = time.time()
-        tx_info = {
+    logger.info(
+        "enrichment_fanned_out",
+        extra={
             "correlation_id": correlation_id,
             "batch_id": batch_id_str,
-            "transaction_id": tx.transaction_id
+            "chunks": len(chunks),
+            "transaction_count": len(transaction_ids),
         }
+    )
+    # The correlation id goes by keyword so ObservabilityTask picks it up in every subtask.
+    callback = finalize_batch_enrichment.s(batch_id_str, correlation_id=correlation_id, attempt=attempt)
+    # A chunk that fails after its retries fails the chord, and the callback never runs.
+    callback.on_error(fail_batch_enrichment.si(batch_id_str, correlation_id=correlation_id))
+    chord(
+        enrich_transaction_chunk.s(batch_id_str, chunk, correlation_id=correlation_id) for chunk in chunks
+    )(callback)
 
-        try:
-            with db_transaction.atomic():
-                tx.ingestion_status = Transaction.INGESTION_STATUS_PROCESSING
-                tx.save(update_fields=['ingestion_status', 'updated_at'])
 
-            # Simulate processing delay
-            time.sleep(random.uniform(0.5, 1.0))
+@shared_task(
+    bind=True, base=ObservabilityTask, max_retries=3,
+    autoretry_for=(Exception,), retry_backoff=5, retry_backoff_max=60, retry_jitter=True,
+)
+def enrich_transaction_chunk(self, batch_id_str, transaction_ids, correlation_id=None):
+    # Safe to retry: rows already written are no longer claimable, and rows this attempt
+    # claimed but did not write become claimable again after ENRICHMENT_CLAIM_TIMEOUT.
+    batch = Batch.objects.get(batch_id=batch_id_str)
+    return enrich_transactions(batch, transaction_ids, correlation_id or get_correlation_id())
 
-            category = categorizer.categorize(tx.merchant_name, tx.description)
 
-            with db_transaction.atomic():
-                tx.category = category
-                tx.ingestion_status = Transaction.INGESTION_STATUS_COMPLETED
-                tx.save(update_fields=['category', 'ingestion_status', 'updated_at'])
+def redispatch_delay(status_counts):
+    """Rows held in `processing` by another worker become claimable after ENRICHMENT_CLAIM_TIMEOUT."""
+    if status_counts[Transaction.INGESTION_STATUS_PROCESSING]:
+        return getattr(settings, 'ENRICHMENT_CLAIM_TIMEOUT', DEFAULT_CLAIM_TIMEOUT)
+    return getattr(settings, 'ENRICHMENT_REDISPATCH_DELAY', DEFAULT_REDISPATCH_DELAY)
 
-            logger.info(
-                "transaction_completed",
-                extra={**tx_info, "duration_sec": round(time.time() - tx_start, 4)}
-            )
 
-        except Exception as e:
-            logger.exception(
-                "transaction_failed",
-                extra={**tx_info, "error": str(e), "duration_sec": round(time.time() - tx_start, 4)}
-            )
-            with db_transaction.atomic():
-                tx.ingestion_status = Transaction.INGESTION_STATUS_FAILED
-                tx.save(update_fields=['ingestion_status', 'updated_at'])
-            continue
+@shared_task(bind=True, base=ObservabilityTask)
+def finalize_batch_enrichment(self, results, batch_id_str, correlation_id=None, attempt=0):
+    """
+    Chord callback: record final counts, status and timings on the batch.
 
+    The batch only becomes completed (or completed_with_errors) once no row is pending or
+    processing. Rows skipped as locked by an overlapping run, or still held by a stalled
+    worker, keep it `processing`, and enrichment is dispatched again for them up to
+    ENRICHMENT_MAX_REDISPATCHES times.
+    """
+    batch = Batch.objects.get(batch_id=batch_id_str)
+    # The live counters are exact except for reclaimed rows; recount once at the end.
+    status_counts = reconcile_batch_counters(batch)
+    completed = status_counts[Transaction.INGESTION_STATUS_COMPLETED]
+    failed = status_counts[Transaction.INGESTION_STATUS_FAILED]
+    unfinished = (
+        status_counts[Transaction.INGESTION_STATUS_PENDING] + status_counts[Transaction.INGESTION_STATUS_PROCESSING]
+    )
+    refresh_batch_rollups(batch)
+
+    if unfinished:
+        extra = {
+            "correlation_id": correlation_id,
+            "batch_id": batch_id_str,
+            "unfinished": unfinished,
+            "attempt": attempt,
+        }
+        if attempt < getattr(settings, 'ENRICHMENT_MAX_REDISPATCHES', DEFAULT_MAX_REDISPATCHES):
+            countdown = redispatch_delay(status_counts)
+            logger.warning("batch_enrichment_incomplete", extra={**extra, "redispatch_in_sec": countdown})
+            enqueue_batch_enrichment(batch_id_str, correlation_id, attempt=attempt + 1, countdown=countdown)
+        else:
+            logger.error("batch_enrichment_abandoned", extra=extra)
+        return {"status": batch.status, "completed": completed, "failed": failed, "unfinished": unfinished}
+
+    batch.status = Batch.STATUS_COMPLETED_WITH_ERRORS if failed else Batch.STATUS_COMPLETED
+    batch.finished_at = timezone.now()
+    batch.save(update_fields=['status', 'finished_at'])
+
+    duration = (batch.finished_at - batch.started_at).total_seconds() if batch.started_at else None
     logger.info(
         "task_completed",
         extra={
             "correlation_id": correlation_id,
             "task_name": self.name,
             "batch_id": batch_id_str,
-            "duration_sec": round(time.time() - task_start, 4)
+            "status": batch.status,
+            "completed": completed,
+            "failed": failed,
+            "chunks": len(results),
+            "processed_this_run": sum(r["completed"] + r["failed"] for r in results),
+            "duration_sec": round(duration, 4) if duration is not None else None,
         }
     )
+    return {"status": batch.status, "completed": completed, "failed": failed}
+
+
+@shared_task(bind=True, base=ObservabilityTask)
+def fail_batch_enrichment(self, batch_id_str, correlation_id=None):
+    """Chord error callback: close the batch as completed_with_errors so it does not stay `processing`."""
+    batch = Batch.objects.get(batch_id=batch_id_str)
+    status_counts = reconcile_batch_counters(batch)
+    batch.status = Batch.STATUS_COMPLETED_WITH_ERRORS
+    batch.finished_at = timezone.now()
+    batch.save(update_fields=['status', 'finished_at'])
+    refresh_batch_rollups(batch)
+    logger.error(
+        "batch_enrichment_failed",
+        extra={"correlation_id": correlation_id, "batch_id": batch_id_str, **status_counts},
+    )
@@ -0,0 +1,92 @@
+import datetime
+import uuid
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from transactions.categorizer import RuleBasedCategorizer
+from transactions.enrichment import ResultWriter, claim_transactions
+from transactions.models import Batch, Transaction
+from transactions.tasks import process_batch_enrichment
+
+
+class BatchProgressTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        payload = {
+            "accounts": [{"account_id": "acc_bp", "name": "A", "type": "depository"}],
+            "transactions": [
+                {"transaction_id": f"tx_bp{i}", "account_id": "acc_bp", "amount": -5.0,
+                 "iso_currency_code": "USD", "date": now, "merchant_name": merchant, "pending": False}
+                for i, merchant in enumerate(['Uber', 'BOOM', 'Starbucks', 'Uber'])
+            ],
+            "total_transactions": 4,
+            "request_id": "req_bp",
+        }
+        # One duplicate transaction_id: the batch owns three rows.
+        payload["transactions"][3]["transaction_id"] = "tx_bp0"
+        with mock.patch('transactions.tasks.process_batch_enrichment.apply_async'):
+            response = self.client.post(reverse('ingest-transactions'), payload, format='json')
+        self.batch_id = response.data['batch_id']
+        self.batch = Batch.objects.get(batch_id=self.batch_id)
+        self.url = reverse('batch-progress', args=[self.batch_id])
+
+    def progress(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_counters_follow_ingest_claim_and_results(self):
+        body = self.progress()
+        self.assertEqual(body['status'], Batch.STATUS_PENDING)
+        self.assertEqual(body['total_transactions'], 4)
+        self.assertEqual(body['counts'], {"pending": 3, "processing": 0, "completed": 0, "failed": 0})
+        self.assertEqual(body['percent_complete'], 0.0)
+        self.assertFalse(body['finished'])
+
+        ids = list(self.batch.transactions.order_by('id').values_list('id', flat=True))
+        claimed = claim_transactions(self.batch, ids[:2])
+        self.assertEqual(self.progress()['counts'], {"pending": 1, "processing": 2, "completed": 0, "failed": 0})
+
+        writer = ResultWriter(flush_rows=10)
+        for tx, status in zip(claimed, [Transaction.INGESTION_STATUS_COMPLETED, Transaction.INGESTION_STATUS_FAILED]):
+            tx.ingestion_status = status
+            writer.add(tx)
+        writer.flush()
+        self.assertEqual(self.progress()['counts'], {"pending": 1, "processing": 0, "completed": 1, "failed": 1})
+
+        original = RuleBasedCategorizer.categorize
+
+        def categorize(self, merchant_name, description):
+            if merchant_name == 'BOOM':
+                raise ValueError("bad row")
+            return original(self, merchant_name, description)
+
+        # The task retries the failed row and enriches the pending one.
+        with mock.patch.object(RuleBasedCategorizer, 'categorize', categorize), \
+                mock.patch('transactions.enrichment.time.sleep'):
+            process_batch_enrichment(self.batch_id)
+
+        body = self.progress()
+        self.assertEqual(body['status'], Batch.STATUS_COMPLETED_WITH_ERRORS)
+        self.assertEqual(body['counts'], {"pending": 0, "processing": 0, "completed": 2, "failed": 1})
+        self.assertEqual(body['percent_complete'], 100.0)
+        self.assertTrue(body['finished'])
+        self.assertIsNotNone(body['started_at'])
+        self.assertGreaterEqual(body['duration_sec'], 0)
+
+    def test_reclaiming_stale_rows_keeps_counters(self):
+        ids = list(self.batch.transactions.values_list('id', flat=True))
+        claim_transactions(self.batch, ids)
+        with self.settings(ENRICHMENT_CLAIM_TIMEOUT=-1):
+            self.assertEqual(len(claim_transactions(self.batch, ids)), 3)
+        self.batch.refresh_from_db()
+        self.assertEqual((self.batch.pending_transactions, self.batch.processing_transactions), (0, 3))
+
+    def test_unknown_batch(self):
+        response = self.client.get(reverse('batch-progress', args=[uuid.uuid4()]))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,79 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from transactions.benchmarks import BENCHMARKS, BenchmarkConfig, compare, load_synthetic_dataset, run_suite
+from transactions.models import DailyAccountRollup, Transaction
+
+
+def document(vendor='sqlite', **cases):
+    return {
+        "environment": {"vendor": vendor},
+        "results": {name: {"rows": rows, "seconds": seconds} for name, (rows, seconds) in cases.items()},
+    }
+
+
+class CompareTests(SimpleTestCase):
+    def test_threshold_noise_floor_and_row_mismatch(self):
+        baseline = document(a=(100, 1.0), b=(100, 1.0), tiny=(10, 0.001), resized=(10, 1.0))
+        current = document(a=(100, 1.2), b=(100, 1.3), tiny=(10, 0.003), resized=(20, 5.0), new=(1, 1.0))
+        comparisons = {c.name: c for c in compare(baseline, current, threshold=0.25)}
+        self.assertEqual(sorted(comparisons), ['a', 'b', 'tiny'])
+        self.assertFalse(comparisons['a'].regressed)
+        self.assertTrue(comparisons['b'].regressed)
+        self.assertAlmostEqual(comparisons['b'].change, 0.3)
+        # 3x slower, but only by 2ms.
+        self.assertFalse(comparisons['tiny'].regressed)
+
+
+class BenchmarkSuiteTests(TestCase):
+    config = BenchmarkConfig(sizes=(5,), dataset_size=200, categorizer_rows=50, repeat=1)
+
+    def test_every_benchmark_runs(self):
+        result = run_suite(list(BENCHMARKS), self.config)
+        self.assertEqual(result['environment']['vendor'], connection.vendor)
+        self.assertEqual(sorted(result['results']), [
+            'categorizer.categorize_many', 'enrichment[5]', 'ingest_api[5]', 'serializer.drf[5]',
+            'serializer.fast[5]', 'summary_api.raw[200]', 'summary_api.rollups[200]',
+        ])
+        # The busiest account gets every other generated row.
+        self.assertEqual(result['results']['summary_api.raw[200]']['rows'], 100)
+        self.assertTrue(all(case['seconds'] > 0 for case in result['results'].values()))
+
+    def test_dataset_generator_builds_rollups(self):
+        account_id, rows, start, end = load_synthetic_dataset(1_000, accounts=4)
+        self.assertEqual(Transaction.objects.filter(transaction_id__startswith='bench_').count(), 1_000)
+        self.assertEqual(Transaction.objects.filter(account__account_id=account_id).count(), rows)
+        self.assertTrue(DailyAccountRollup.objects.filter(account__account_id=account_id).exists())
+        self.assertLess(start, end)
+
+    def test_command_fails_on_regression_and_saves_baselines(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        baseline = os.path.join(directory, 'baseline.json')
+        args = ['--in-place', '--only', 'serializer', '--sizes', '200', '--repeat', '1', '--baseline', baseline]
+
+        call_command('run_benchmarks', *args, '--save-baseline', stdout=io.StringIO())
+        with open(baseline) as f:
+            saved = json.load(f)
+        self.assertEqual(sorted(saved['results']), ['serializer.drf[200]', 'serializer.fast[200]'])
+
+        for case in saved['results'].values():
+            case['seconds'] /= 100
+        with open(baseline, 'w') as f:
+            json.dump(saved, f)
+        with self.assertRaisesMessage(CommandError, "serializer.drf[200]"):
+            call_command('run_benchmarks', *args, stdout=io.StringIO())
+
+        other = 'sqlite' if connection.vendor == 'postgresql' else 'postgresql'
+        saved['environment']['vendor'] = other
+        with open(baseline, 'w') as f:
+            json.dump(saved, f)
+        with self.assertRaisesMessage(CommandError, f"recorded on {other}"):
+            call_command('run_benchmarks', *args, stdout=io.StringIO())
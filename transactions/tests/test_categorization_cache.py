@@ -0,0 +1,74 @@
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from transactions.categorization_cache import CachedCategorizer
+from transactions.categorizer import BaseCategorizer, RuleBasedCategorizer
+
+
+class CountingCategorizer(BaseCategorizer):
+    def __init__(self):
+        self.calls = []
+
+    def categorize_many(self, records):
+        self.calls.append(list(records))
+        return [f"cat:{merchant_name.lower()}" for merchant_name, _ in records]
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                       'LOCATION': 'categorization-cache-tests'}})
+class CachedCategorizerTests(SimpleTestCase):
+    def setUp(self):
+        caches['default'].clear()
+
+    def test_local_hits_normalize_merchant_and_description(self):
+        inner = CountingCategorizer()
+        cached = CachedCategorizer(inner, 'counting')
+        records = [('Amazon  Marketplace', 'Order'), (' amazon marketplace ', 'ORDER'), ('AWS', None)]
+
+        self.assertEqual(cached.categorize_many(records), ['cat:amazon marketplace'] * 2 + ['cat:aws'])
+        self.assertEqual(inner.calls, [[('Amazon Marketplace', 'Order'), ('AWS', '')]])
+        self.assertEqual(cached.categorize('AMAZON MARKETPLACE', 'order'), 'cat:amazon marketplace')
+        self.assertEqual(len(inner.calls), 1)
+        self.assertEqual(
+            {k: cached.stats()[k] for k in ('hits', 'shared_hits', 'misses')},
+            {'hits': 1, 'shared_hits': 0, 'misses': 3},
+        )
+
+    def test_shared_tier_serves_other_workers(self):
+        CachedCategorizer(CountingCategorizer(), 'counting').categorize('Uber', None)
+        other_inner = CountingCategorizer()
+        other = CachedCategorizer(other_inner, 'counting')
+
+        self.assertEqual(other.categorize('uber', None), 'cat:uber')
+        self.assertEqual(other_inner.calls, [])
+        self.assertEqual(other.stats()['shared_hits'], 1)
+
+    def test_lru_evicts_least_recently_used(self):
+        cached = CachedCategorizer(CountingCategorizer(), 'counting', max_entries=2)
+        cached.categorize_many([('a', None), ('b', None)])
+        cached.categorize('a', None)
+        cached.categorize('c', None)
+        self.assertEqual(cached.stats()['evictions'], 1)
+        self.assertEqual(list(cached._local), [('a', ''), ('c', '')])
+
+    def test_rule_set_change_invalidates(self):
+        categorizer = RuleBasedCategorizer(rules=[('Fuel', ['shell'])])
+        cached = CachedCategorizer(categorizer, 'rule_based')
+        self.assertEqual(cached.categorize('Shell', None), 'Fuel')
+
+        categorizer.ruleset = type(categorizer.ruleset).compile([('Groceries', ['shell'])])
+        self.assertEqual(cached.categorize('Shell', None), 'Groceries')
+        self.assertEqual(cached.stats()['invalidations'], 1)
+
+    def test_shared_tier_errors_fall_back_to_categorizer(self):
+        inner = CountingCategorizer()
+        cached = CachedCategorizer(inner, 'counting')
+        with mock.patch.object(caches['default'], 'get_many', side_effect=ConnectionError("down")), \
+                self.assertLogs('transactions.categorization_cache', level='WARNING'):
+            self.assertEqual(cached.categorize('Lyft', None), 'cat:lyft')
+        self.assertEqual(cached.stats()['shared_errors'], 1)
+        # The shared tier is skipped until the retry window passes; the local tier still works.
+        self.assertEqual(cached.categorize('Lyft', None), 'cat:lyft')
+        self.assertEqual(len(inner.calls), 1)
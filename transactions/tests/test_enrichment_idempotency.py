@@ -1,6 +1,20 @@
-from django.test import TestCase
+import asyncio
+import threading
+import time
+from unittest import mock
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from transactions.models import Account, Transaction, Batch
-from transactions.tasks import process_batch_enrichment
+from transactions.tasks import (
+    enrich_transaction_chunk,
+    fail_batch_enrichment,
+    finalize_batch_enrichment,
+    process_batch_enrichment,
+)
+from transactions.categorizer import RuleBasedCategorizer
+from transactions.enrichment import AsyncioEnrichmentExecutor, ThreadPoolEnrichmentExecutor
 from decimal import Decimal
 import datetime
 
@@ -30,3 +44,187 @@ class EnrichmentTaskTests(TestCase):
         tx.refresh_from_db()
         self.assertEqual(tx.ingestion_status, Transaction.INGESTION_STATUS_COMPLETED)
         self.assertEqual(tx.category, category_before)
+
+    @override_settings(ENRICHMENT_CHUNK_SIZE=1)
+    def test_enrichment_finalizes_batch_across_chunks(self):
+        acct = Account.objects.create(account_id='acc_c', name='A', type='depository')
+        batch = Batch.objects.create(total_transactions=2, request_id='r2')
+        for i, merchant in enumerate(['Uber', 'Starbucks']):
+            Transaction.objects.create(
+                transaction_id=f'tx_c{i}',
+                account=acct,
+                amount=Decimal('-5.00'),
+                currency='USD',
+                date=datetime.datetime.now(datetime.timezone.utc),
+                merchant_name=merchant,
+                batch=batch
+            )
+
+        result = process_batch_enrichment(str(batch.batch_id))
+        batch.refresh_from_db()
+        self.assertEqual(result['completed'], 2)
+        self.assertEqual(batch.status, Batch.STATUS_COMPLETED)
+        self.assertEqual((batch.completed_transactions, batch.failed_transactions), (2, 0))
+        self.assertIsNotNone(batch.started_at)
+        self.assertGreaterEqual(batch.finished_at, batch.started_at)
+
+    @mock.patch('transactions.enrichment.time.sleep')
+    def test_enrichment_writes_in_bulk_and_isolates_row_failures(self, _sleep):
+        acct = Account.objects.create(account_id='acc_b', name='A', type='depository')
+        batch = Batch.objects.create(total_transactions=3, request_id='r3')
+        for i, merchant in enumerate(['Uber', 'BOOM', 'AWS']):
+            Transaction.objects.create(
+                transaction_id=f'tx_b{i}',
+                account=acct,
+                amount=Decimal('-5.00'),
+                currency='USD',
+                date=datetime.datetime.now(datetime.timezone.utc),
+                merchant_name=merchant,
+                batch=batch
+            )
+
+        original = RuleBasedCategorizer.categorize
+
+        def categorize(self, merchant_name, description):
+            if merchant_name == 'BOOM':
+                raise ValueError("categorizer exploded")
+            return original(self, merchant_name, description)
+
+        with mock.patch.object(RuleBasedCategorizer, 'categorize', categorize), \
+                CaptureQueriesContext(connection) as queries:
+            process_batch_enrichment(str(batch.batch_id))
+
+        statuses = dict(batch.transactions.values_list('transaction_id', 'ingestion_status'))
+        self.assertEqual(statuses, {
+            'tx_b0': Transaction.INGESTION_STATUS_COMPLETED,
+            'tx_b1': Transaction.INGESTION_STATUS_FAILED,
+            'tx_b2': Transaction.INGESTION_STATUS_COMPLETED,
+        })
+        tx_table = Transaction._meta.db_table
+        updates = [q for q in queries if q['sql'].startswith(f'UPDATE "{tx_table}"')]
+        # One claim UPDATE and one bulk result flush, independent of the row count.
+        self.assertEqual(len(updates), 2)
+
+    def make_batch(self, statuses):
+        acct = Account.objects.create(account_id='acc_u', name='A', type='depository')
+        batch = Batch.objects.create(total_transactions=len(statuses), request_id='r4')
+        for i, status in enumerate(statuses):
+            Transaction.objects.create(
+                transaction_id=f'tx_u{i}',
+                account=acct,
+                amount=Decimal('-5.00'),
+                currency='USD',
+                date=datetime.datetime.now(datetime.timezone.utc),
+                merchant_name='Uber',
+                ingestion_status=status,
+                batch=batch
+            )
+        return batch
+
+    @override_settings(ENRICHMENT_CLAIM_TIMEOUT=600, ENRICHMENT_MAX_REDISPATCHES=1)
+    def test_rows_held_by_another_worker_keep_the_batch_processing(self):
+        # The second row was just claimed by a worker that has not written it yet.
+        batch = self.make_batch([Transaction.INGESTION_STATUS_PENDING, Transaction.INGESTION_STATUS_PROCESSING])
+
+        with mock.patch.object(process_batch_enrichment, 'apply_async') as redispatch:
+            result = process_batch_enrichment(str(batch.batch_id))
+        batch.refresh_from_db()
+        self.assertEqual((result['completed'], result['unfinished']), (1, 1))
+        self.assertEqual(batch.status, Batch.STATUS_PROCESSING)
+        self.assertIsNone(batch.finished_at)
+        self.assertEqual(redispatch.call_args.kwargs['countdown'], 600)
+        self.assertEqual(redispatch.call_args.kwargs['kwargs']['attempt'], 1)
+
+        # Out of re-dispatches: the batch is left for an operator instead of looping.
+        with mock.patch.object(process_batch_enrichment, 'apply_async') as redispatch, \
+                self.assertLogs('', 'ERROR'):
+            process_batch_enrichment(str(batch.batch_id), attempt=1)
+        redispatch.assert_not_called()
+
+        batch.transactions.update(ingestion_status=Transaction.INGESTION_STATUS_COMPLETED)
+        process_batch_enrichment(str(batch.batch_id), attempt=1)
+        batch.refresh_from_db()
+        self.assertEqual(batch.status, Batch.STATUS_COMPLETED)
+        self.assertIsNotNone(batch.finished_at)
+
+    @override_settings(ENRICHMENT_CHUNK_SIZE=1)
+    def test_failed_chunks_close_the_batch_with_errors(self):
+        batch = self.make_batch([Transaction.INGESTION_STATUS_PENDING] * 2)
+        self.assertEqual(enrich_transaction_chunk.autoretry_for, (Exception,))
+
+        with mock.patch('transactions.tasks.chord') as chord:
+            process_batch_enrichment.apply(args=[str(batch.batch_id)])
+        callback = chord.return_value.call_args.args[0]
+        self.assertEqual(callback.task, finalize_batch_enrichment.name)
+        [errback] = callback.options['link_error']
+        self.assertEqual((errback['task'], errback['immutable']), (fail_batch_enrichment.name, True))
+
+        with self.assertLogs('', 'ERROR'):
+            fail_batch_enrichment(*errback['args'])
+        batch.refresh_from_db()
+        self.assertEqual(batch.status, Batch.STATUS_COMPLETED_WITH_ERRORS)
+        self.assertIsNotNone(batch.finished_at)
+        self.assertEqual(batch.pending_transactions, 2)
+
+
+class SlowClient:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def call(self, tx):
+        time.sleep(self.latency.get(tx, 0.2))
+
+    async def acall(self, tx):
+        await asyncio.sleep(self.latency.get(tx, 0.2))
+
+
+class EnrichmentExecutorTests(SimpleTestCase):
+    def test_concurrent_executors_overlap_calls_and_enforce_timeout(self):
+        for executor_class in (ThreadPoolEnrichmentExecutor, AsyncioEnrichmentExecutor):
+            with self.subTest(executor=executor_class.__name__):
+                executor = executor_class(max_in_flight=8, timeout=0.5)
+                start = time.monotonic()
+                results = list(executor.run(SlowClient({'slow': 1.5}), ['slow'] + list(range(8))))
+                elapsed = time.monotonic() - start
+
+                errors = {item: error for item, error, _ in results}
+                self.assertEqual(len(results), 9)
+                self.assertIsInstance(errors.pop('slow'), TimeoutError)
+                self.assertTrue(all(error is None for error in errors.values()))
+                # 8 calls of 0.2s with 8 slots (one held by the slow call until its timeout).
+                self.assertLess(elapsed, 1.2)
+
+    def test_timed_out_calls_keep_their_slot(self):
+        # The stuck call holds one of two slots for 1s; the other slot works through the rest.
+        executor = ThreadPoolEnrichmentExecutor(max_in_flight=2, timeout=0.3)
+        results = list(executor.run(SlowClient({'stuck': 1.0}), ['stuck', 1, 2, 3, 4]))
+        errors = {item: error for item, error, _ in results}
+        self.assertIsInstance(errors.pop('stuck'), TimeoutError)
+        # Queued calls are not timed before a worker starts them.
+        self.assertEqual(errors, {1: None, 2: None, 3: None, 4: None})
+
+        # Every slot hung: the remaining items fail instead of waiting on the stuck thread.
+        executor = ThreadPoolEnrichmentExecutor(max_in_flight=1, timeout=0.1)
+        start = time.monotonic()
+        results = list(executor.run(SlowClient({'stuck': 1.0}), ['stuck', 1, 2]))
+        self.assertLess(time.monotonic() - start, 0.6)
+        self.assertEqual([item for item, _, _ in results], ['stuck', 1, 2])
+        self.assertTrue(all(isinstance(error, TimeoutError) for _, error, _ in results))
+
+    def test_asyncio_executor_reports_every_call_and_stops_when_closed(self):
+        class CancellingClient(SlowClient):
+            async def acall(self, tx):
+                if tx == 'cancelled':
+                    raise asyncio.CancelledError()
+                await super().acall(tx)
+
+        executor = AsyncioEnrichmentExecutor(max_in_flight=4, timeout=0.5)
+        results = list(executor.run(CancellingClient({}), ['cancelled', 1, 2]))
+        errors = {item: error for item, error, _ in results}
+        self.assertIsInstance(errors.pop('cancelled'), asyncio.CancelledError)
+        self.assertEqual(errors, {1: None, 2: None})
+
+        results = executor.run(SlowClient({'fast': 0.01}), ['fast'] + list(range(3)))
+        self.assertEqual(next(results)[0], 'fast')
+        results.close()
+        self.assertFalse(any(thread.name == 'enrichment-loop' for thread in threading.enumerate()))
@@ -0,0 +1,122 @@
+import csv
+import datetime
+import io
+import json
+import os
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from transactions import export
+from transactions.export import HEADER
+from transactions.models import Account, Batch, Transaction
+
+
+class TransactionExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('export-transactions')
+        self.account = Account.objects.create(account_id='acc_ex', name='A', type='depository',
+                                              timezone='America/New_York')
+        other = Account.objects.create(account_id='acc_other', name='B', type='depository')
+        self.batch = Batch.objects.create(total_transactions=6)
+        # 03:00 UTC on the 2nd is still the 1st in New York.
+        base = datetime.datetime(2026, 3, 2, 3, 0, tzinfo=datetime.timezone.utc)
+        for i in range(5):
+            Transaction.objects.create(
+                transaction_id=f'tx_ex{i}', account=self.account, amount=Decimal(f'-{i + 1}.10'),
+                currency='USD', date=base + datetime.timedelta(days=i), merchant_name=f'Shop, "{i}"',
+                category='Shopping' if i % 2 else None,
+                ingestion_status='completed' if i < 3 else 'pending', batch=self.batch,
+            )
+        Transaction.objects.create(
+            transaction_id='tx_other', account=other, amount=Decimal('9.00'), currency='USD',
+            date=base, batch=self.batch,
+        )
+
+    def get(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv_stream(self):
+        response, body = self.get(account_id='acc_ex')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual(list(rows[0]), HEADER)
+        self.assertEqual([row['transaction_id'] for row in rows], [f'tx_ex{i}' for i in range(5)])
+        self.assertEqual(rows[0]['merchant_name'], 'Shop, "0"')
+        self.assertEqual(rows[0]['amount'], '-1.10')
+        self.assertEqual(rows[0]['category'], '')
+        self.assertEqual(rows[1]['category'], 'Shopping')
+        self.assertEqual(rows[0]['account_id'], 'acc_ex')
+        self.assertEqual(rows[0]['batch_id'], str(self.batch.batch_id))
+
+    def test_ndjson_filters_use_account_days(self):
+        response, body = self.get(account_id='acc_ex', output='ndjson', start_date='2026-03-01',
+                                  end_date='2026-03-03', status=['completed', 'pending'])
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in body.splitlines()]
+        # New York days 03-01..03-03 hold the first three rows.
+        self.assertEqual([r['transaction_id'] for r in records], ['tx_ex0', 'tx_ex1', 'tx_ex2'])
+        self.assertEqual(records[0]['amount'], '-1.10')
+        self.assertIsNone(records[0]['category'])
+
+        _, body = self.get(account_id='acc_ex', output='ndjson', status='pending')
+        self.assertEqual([json.loads(line)['transaction_id'] for line in body.splitlines()], ['tx_ex3', 'tx_ex4'])
+
+    def test_resume_after_cursor(self):
+        _, body = self.get(output='ndjson')
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(records), 6)
+        cursor = records[2]['cursor']
+
+        _, rest = self.get(output='ndjson', after=cursor)
+        self.assertEqual([json.loads(line) for line in rest.splitlines()], records[3:])
+
+        # Resumed CSV omits the header so parts concatenate into one file.
+        _, first = self.get()
+        _, resumed = self.get(after=cursor)
+        self.assertEqual(first.splitlines()[4:], resumed.splitlines())
+
+    def test_unknown_account_and_bad_params(self):
+        _, body = self.get(account_id='missing')
+        self.assertEqual(body.strip(), ','.join(HEADER))
+        self.assertEqual(self.client.get(self.url, {'output': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'status': 'bogus'}).status_code, 400)
+        response = self.client.get(self.url, {'start_date': '2026-03-05', 'end_date': '2026-03-01'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_command_streams_and_resumes(self):
+        stdout = io.StringIO()
+        call_command('export_transactions', '--format', 'ndjson', '--account', 'acc_ex',
+                     '--chunk-size', '2', stdout=stdout, stderr=io.StringIO())
+        self.assertEqual(len(stdout.getvalue().splitlines()), 5)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'export.csv')
+            cursors = list(Transaction.objects.order_by('id').values_list('id', flat=True))
+            real_csv_value = export._csv_value
+
+            def fail_on_fourth_row(value):
+                if value == cursors[3]:
+                    raise RuntimeError("connection lost")
+                return real_csv_value(value)
+
+            stderr = io.StringIO()
+            with mock.patch('transactions.export._csv_value', side_effect=fail_on_fourth_row):
+                with self.assertRaises(RuntimeError):
+                    call_command('export_transactions', '--output', path, stderr=stderr)
+            self.assertIn(f'resume with --after {cursors[2]}', stderr.getvalue())
+
+            call_command('export_transactions', '--output', path, '--after', str(cursors[2]), stderr=io.StringIO())
+            with open(path, newline='') as f:
+                rows = list(csv.DictReader(f))
+        self.assertEqual([int(row['cursor']) for row in rows], cursors)
+
@@ -0,0 +1,117 @@
+import copy
+import random
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from transactions.fast_validation import DEFAULT_VALIDATOR, fast_validator_class, get_validator_class
+from transactions.serializers import IngestBatchSerializer, TransactionItemSerializer
+from transactions.synthetic import make_payload
+
+
+def base_payload():
+    payload = make_payload(3, rng=random.Random(7))
+    payload['accounts'][0]['mask'] = None
+    return payload
+
+
+def mutate(**changes):
+    """Return a payload whose first transaction has `changes` applied (`...` deletes a key)."""
+    payload = base_payload()
+    tx = payload['transactions'][0]
+    for key, value in changes.items():
+        if value is Ellipsis:
+            tx.pop(key, None)
+        else:
+            tx[key] = value
+    return payload
+
+
+CASES = {
+    'valid': base_payload(),
+    'amount_string': mutate(amount=' -12.5 '),
+    'amount_int': mutate(amount=40),
+    'amount_too_many_places': mutate(amount='1.234'),
+    'amount_too_many_digits': mutate(amount='12345678901.00'),
+    'amount_not_a_number': mutate(amount='abc'),
+    'amount_nan': mutate(amount='NaN'),
+    'amount_bool': mutate(amount=True),
+    'amount_null': mutate(amount=None),
+    'amount_missing': mutate(amount=...),
+    'currency_too_long': mutate(iso_currency_code='USDX'),
+    'currency_blank': mutate(iso_currency_code='   '),
+    'currency_padded': mutate(iso_currency_code=' usd '),
+    'currency_number': mutate(iso_currency_code=123),
+    'currency_list': mutate(iso_currency_code=['USD']),
+    'currency_null_char': mutate(iso_currency_code='U\x00D'),
+    'name_unicode': mutate(name='Café Ünïcode'),
+    'name_blank_allowed': mutate(name=''),
+    'name_missing': mutate(name=..., merchant_name=...),
+    'payment_channel_null': mutate(payment_channel=None),
+    'payment_channel_blank': mutate(payment_channel=''),
+    'date_offset': mutate(date='2025-10-30T08:00:00+02:00'),
+    'date_naive': mutate(date='2025-10-30T08:00:00'),
+    'date_only': mutate(date='2025-10-30'),
+    'date_garbage': mutate(date='yesterday'),
+    'date_invalid_day': mutate(date='2025-02-30T08:00:00Z'),
+    'date_null': mutate(date=None),
+    'authorized_date_null': mutate(authorized_date=None),
+    'authorized_date_missing': mutate(authorized_date=...),
+    'authorized_date_garbage': mutate(authorized_date='30/10/2025'),
+    'authorized_date_datetime': mutate(authorized_date='2025-10-30T08:00:00Z'),
+    'pending_string': mutate(pending='true'),
+    'pending_int': mutate(pending=0),
+    'pending_missing': mutate(pending=...),
+    'pending_null': mutate(pending=None),
+    'unknown_account': mutate(account_id='acc_unknown'),
+    'transaction_not_dict': dict(base_payload(), transactions=['nope']),
+    'transactions_not_list': dict(base_payload(), transactions={'a': 1}),
+    'transactions_missing': {k: v for k, v in base_payload().items() if k != 'transactions'},
+    'accounts_null': dict(base_payload(), accounts=None),
+    'account_missing_name': dict(base_payload(), accounts=[{'account_id': 'acc_x', 'type': 'depository'}]),
+    'total_not_int': dict(base_payload(), total_transactions='12'),
+    'total_float_string': dict(base_payload(), total_transactions='3.0'),
+    'total_bool': dict(base_payload(), total_transactions=True),
+    'request_id_null': dict(base_payload(), request_id=None),
+    'root_list': [],
+    'root_null': None,
+}
+
+
+class FastValidatorParityTests(SimpleTestCase):
+    """The compiled validator must accept, reject and coerce exactly like the DRF serializer."""
+
+    def assert_parity(self, serializer_class, data, many=False):
+        expected = serializer_class(data=copy.deepcopy(data), many=many)
+        actual = fast_validator_class(serializer_class)(data=copy.deepcopy(data), many=many)
+        self.assertEqual(actual.is_valid(), expected.is_valid())
+        self.assertEqual(actual.errors, expected.errors)
+        self.assertEqual(actual.validated_data, expected.validated_data)
+
+    def test_ingest_batch_parity(self):
+        for name, data in CASES.items():
+            with self.subTest(case=name):
+                self.assert_parity(IngestBatchSerializer, data)
+
+    def test_transaction_list_parity(self):
+        records = base_payload()['transactions'] + [mutate(amount='x')['transactions'][0], 'not-a-dict']
+        self.assert_parity(TransactionItemSerializer, records, many=True)
+        self.assert_parity(TransactionItemSerializer, {'not': 'a list'}, many=True)
+
+    def test_validated_values_are_typed_like_drf(self):
+        data = CASES['amount_string']
+        validator = fast_validator_class(IngestBatchSerializer)(data=copy.deepcopy(data))
+        self.assertTrue(validator.is_valid())
+        tx = validator.validated_data['transactions'][0]
+        self.assertEqual(str(tx['amount']), '-12.50')
+        self.assertEqual(tx['date'].utcoffset().total_seconds(), 0)
+
+
+class ValidatorSelectionTests(SimpleTestCase):
+    def test_settings_and_module_share_one_default(self):
+        self.assertEqual(settings.INGEST_VALIDATOR, DEFAULT_VALIDATOR)
+        with override_settings():
+            del settings.INGEST_VALIDATOR
+            self.assertIs(get_validator_class(IngestBatchSerializer), fast_validator_class(IngestBatchSerializer))
+        with override_settings(INGEST_VALIDATOR='drf'):
+            self.assertIs(get_validator_class(IngestBatchSerializer), IngestBatchSerializer)
@@ -0,0 +1,129 @@
+import threading
+import time
+from unittest import mock
+
+from django.core.cache.backends.redis import RedisCache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from project.connections import (
+    SharedConnectionPool, database_config, redis_client, redis_pool, redis_pool_options,
+)
+from transactions import health
+
+
+class HealthEndpointTests(TestCase):
+    def setUp(self):
+        health.reset()
+        self.addCleanup(health.reset)
+        self.calls = {"database": 0, "redis": 0}
+
+    def counting(self, name, effect=None):
+        def check():
+            self.calls[name] += 1
+            if effect:
+                effect()
+        return check
+
+    def test_liveness_does_not_touch_dependencies(self):
+        with mock.patch.dict(health.CHECKS, {"database": self.counting("database", lambda: 1 / 0)}):
+            response = APIClient().get(reverse('health-live'))
+        self.assertEqual((response.status_code, response.json()), (200, {"status": "ok"}))
+        self.assertEqual(self.calls["database"], 0)
+
+    def test_readiness_uses_the_database_and_caches_results(self):
+        # The real database check, on a health worker thread.
+        with mock.patch.dict(health.CHECKS, {"redis": self.counting("redis")}):
+            first = APIClient().get(reverse('health-ready')).json()
+            second = APIClient().get(reverse('health-check')).json()
+        self.assertEqual((first["status"], first["database"], first["redis"], first["cached"]), ("ok", "ok", "ok", False))
+        self.assertTrue(second["cached"])
+        self.assertEqual(self.calls["redis"], 1)
+
+    def test_concurrent_probes_share_one_refresh(self):
+        def slow():
+            time.sleep(0.05)
+
+        checks = {"database": self.counting("database", slow), "redis": self.counting("redis")}
+        results = []
+        with mock.patch.dict(health.CHECKS, checks, clear=True):
+            threads = [threading.Thread(target=lambda: results.append(health.readiness())) for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(self.calls, {"database": 1, "redis": 1})
+        self.assertEqual(sorted(cached for _, cached in results), [False, True, True, True, True])
+
+    @override_settings(HEALTH_CHECK_TIMEOUT=0.05, HEALTH_CACHE_SECONDS=0)
+    def test_hung_check_is_not_submitted_again(self):
+        release = threading.Event()
+        checks = {"database": self.counting("database", lambda: release.wait(5)), "redis": self.counting("redis")}
+        with mock.patch.dict(health.CHECKS, checks), self.assertLogs('transactions.health', 'ERROR'):
+            for _ in range(3):
+                self.assertEqual(health.readiness()[0]["database"], "error: timed out after 0.05s")
+            # Later probes wait on the hung call instead of queueing more behind it.
+            self.assertEqual(self.calls, {"database": 1, "redis": 3})
+
+            release.set()
+            health._running["database"].result(timeout=1)
+            self.assertEqual(health.readiness()[0], {"database": "ok", "redis": "ok"})
+        self.assertEqual(self.calls["database"], 2)
+
+    @override_settings(HEALTH_CHECK_TIMEOUT=0.05, HEALTH_CACHE_SECONDS=0)
+    def test_failures_and_timeouts_are_unhealthy(self):
+        def refused():
+            raise ConnectionError("connection refused")
+
+        checks = {"database": lambda: time.sleep(0.5), "redis": refused}
+        with mock.patch.dict(health.CHECKS, checks), self.assertLogs('transactions.health', 'ERROR'):
+            start = time.monotonic()
+            response = APIClient().get(reverse('health-ready'))
+        self.assertLess(time.monotonic() - start, 0.4)
+        self.assertEqual(response.status_code, 503)
+        body = response.json()
+        self.assertEqual(body["status"], "unhealthy")
+        self.assertEqual(body["database"], "error: timed out after 0.05s")
+        self.assertEqual(body["redis"], "error: connection refused")
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    @override_settings(REDIS_URL='redis://localhost:6379/3')
+    def test_clients_share_one_pool_per_url(self):
+        self.assertIs(redis_client().connection_pool, redis_pool())
+        self.assertIs(redis_pool(), redis_pool('redis://localhost:6379/3'))
+        self.assertIsNot(redis_pool(), redis_pool('redis://localhost:6379/4'))
+
+    def test_cache_backends_share_a_pool_across_threads(self):
+        params = {'OPTIONS': {'pool_class': 'project.connections.SharedConnectionPool', 'socket_timeout': 0.5}}
+        pools = []
+
+        def get_pool():
+            # Django builds one cache backend (and pool) per thread.
+            pools.append(RedisCache('redis://localhost:6379/5', params)._cache._get_connection_pool(True))
+
+        threads = [threading.Thread(target=get_pool) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len({id(pool) for pool in pools}), 1)
+        self.assertIs(pools[0], SharedConnectionPool.from_url(
+            'redis://localhost:6379/5', **RedisCache('redis://localhost:6379/5', params)._cache._pool_options
+        ))
+
+    def test_cache_and_health_checks_share_a_pool(self):
+        # The OPTIONS settings.py builds for a redis:// CACHE_URL.
+        params = {'OPTIONS': {'pool_class': 'project.connections.SharedConnectionPool', **redis_pool_options()}}
+        url = 'redis://localhost:6379/6'
+        pool = RedisCache(url, params)._cache._get_connection_pool(True)
+        self.assertIs(pool, redis_pool(url))
+        self.assertEqual(pool.max_connections, redis_pool_options()['max_connections'])
+
+    def test_database_config(self):
+        base = {'ENGINE': 'django.db.backends.postgresql', 'NAME': 'lucro', 'OPTIONS': {'sslmode': 'prefer'}}
+        persistent = database_config(base, conn_max_age=30)
+        self.assertEqual((persistent['CONN_MAX_AGE'], persistent['CONN_HEALTH_CHECKS']), (30, True))
+        self.assertEqual(persistent['OPTIONS'], {'sslmode': 'prefer', 'connect_timeout': 5})
+        self.assertEqual(base['OPTIONS'], {'sslmode': 'prefer'})
@@ -1,7 +1,11 @@
-from django.test import TestCase
+import json
+from unittest import mock
+
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from rest_framework.test import APIClient
-from transactions.models import Account, Transaction
+from transactions.models import Account, Batch, Transaction
+from transactions.tasks import process_batch_enrichment
 
 class IngestionTests(TestCase):
     def setUp(self):
@@ -31,11 +35,82 @@ class IngestionTests(TestCase):
         }
 
         url = reverse('ingest-transactions')
-        r1 = self.client.post(url, payload, format='json')
-        self.assertEqual(r1.status_code, 202)
-        self.assertTrue(Account.objects.filter(account_id='acc_123').exists())
-        self.assertTrue(Transaction.objects.filter(transaction_id='tx_1').exists())
+        # Enrichment is dispatched to the broker; these tests cover the request path only.
+        with mock.patch.object(process_batch_enrichment, 'apply_async') as dispatch:
+            r1 = self.client.post(url, payload, format='json')
+            self.assertEqual(r1.status_code, 202)
+            self.assertTrue(Account.objects.filter(account_id='acc_123').exists())
+            self.assertTrue(Transaction.objects.filter(transaction_id='tx_1').exists())
+
+            r2 = self.client.post(url, payload, format='json')
+            self.assertEqual(r2.status_code, 202)
+            self.assertEqual(Transaction.objects.filter(transaction_id='tx_1').count(), 1)
+        self.assertEqual(dispatch.call_count, 2)
+
+    def test_batch_ingest_reports_inserted_and_duplicates_and_upserts_accounts(self):
+        url = reverse('ingest-transactions')
+        account = {"account_id": "acc_dup", "name": "Checking", "type": "depository", "mask": "1111"}
+        tx = {
+            "account_id": "acc_dup",
+            "amount": "-10.00",
+            "iso_currency_code": "USD",
+            "date": "2025-10-30T08:00:00Z",
+            "name": "Uber",
+            "pending": False,
+        }
+        payload = {
+            "accounts": [account],
+            "transactions": [dict(tx, transaction_id="tx_a"), dict(tx, transaction_id="tx_b")],
+            "total_transactions": 2,
+        }
+        with mock.patch.object(process_batch_enrichment, 'apply_async'):
+            r1 = self.client.post(url, payload, format='json')
+            self.assertEqual(r1.status_code, 202)
+            self.assertEqual((r1.data['inserted'], r1.data['duplicates']), (2, 0))
 
-        r2 = self.client.post(url, payload, format='json')
+            payload["accounts"] = [dict(account, name="Renamed", mask="2222")]
+            payload["transactions"].append(dict(tx, transaction_id="tx_c"))
+            r2 = self.client.post(url, payload, format='json')
         self.assertEqual(r2.status_code, 202)
-        self.assertEqual(Transaction.objects.filter(transaction_id='tx_1').count(), 1)
+        self.assertEqual((r2.data['inserted'], r2.data['duplicates']), (1, 2))
+        self.assertEqual(Transaction.objects.filter(account__account_id='acc_dup').count(), 3)
+
+        acct = Account.objects.get(account_id='acc_dup')
+        self.assertEqual((acct.name, acct.mask), ("Renamed", "2222"))
+
+    @override_settings(INGEST_STREAM_CHUNK_SIZE=2)
+    def test_stream_ingest_commits_per_chunk_and_reports_bad_line(self):
+        tx = {
+            "account_id": "acc_s",
+            "amount": "12.50",
+            "iso_currency_code": "USD",
+            "date": "2025-10-30T08:00:00Z",
+            "name": "Stripe",
+            "pending": False,
+        }
+        lines = [{"account_id": "acc_s", "name": "Stream", "type": "depository"}]
+        lines += [dict(tx, transaction_id=f"tx_s{i}") for i in range(3)]
+        lines.append(dict(tx, transaction_id="tx_bad", iso_currency_code="DOLLARS"))
+        body = "\n".join(json.dumps(line) for line in lines) + "\n"
+
+        url = reverse('ingest-transactions-stream')
+        with mock.patch.object(process_batch_enrichment, 'apply_async'):
+            r = self.client.post(url, body, content_type='application/x-ndjson')
+            self.assertEqual(r.status_code, 400)
+            self.assertEqual(r.data['detail']['line'], 5)
+            self.assertIn('iso_currency_code', r.data['detail']['errors'])
+            # Lines 1-4 were committed in two chunks before the bad line was reached.
+            self.assertEqual(r.data['inserted'], 3)
+            self.assertEqual(Transaction.objects.filter(account__account_id='acc_s').count(), 3)
+            self.assertEqual(Batch.objects.get(batch_id=r.data['batch_id']).pending_transactions, 3)
+
+            r2 = self.client.post(url, "\n".join(json.dumps(line) for line in lines[:4]), content_type='application/x-ndjson')
+            self.assertEqual(r2.status_code, 202)
+            self.assertEqual((r2.data['inserted'], r2.data['duplicates']), (0, 3))
+
+    def test_stream_ingest_rejects_an_empty_body(self):
+        url = reverse('ingest-transactions-stream')
+        for body in ("", "\n\n"):
+            r = self.client.post(url, body, content_type='application/x-ndjson')
+            self.assertEqual(r.status_code, 400)
+        self.assertFalse(Batch.objects.exists())
@@ -0,0 +1,79 @@
+import csv
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from transactions.loader import STAGING_TABLE, BulkLoader
+from transactions.models import Account, Batch, Transaction
+
+
+class LoadTransactionsCommandTests(TestCase):
+    def write(self, suffix, write_fn):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, 'w', newline='') as f:
+            write_fn(f)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_loads_jsonl_and_csv_in_chunks_with_dedupe(self):
+        tx = {"account_id": "acc_load", "amount": "-5.00", "iso_currency_code": "USD",
+              "date": "2024-01-02T10:00:00Z", "name": "Uber", "pending": False}
+
+        def write_jsonl(f):
+            f.write(json.dumps({"account_id": "acc_load", "name": "History", "type": "depository"}) + "\n")
+            for i in range(5):
+                f.write(json.dumps(dict(tx, transaction_id=f"tx_load_{i}")) + "\n")
+
+        def write_csv(f):
+            fields = list(tx) + ["transaction_id", "authorized_date", "account_name", "account_type"]
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            for i in range(3, 8):  # 3 and 4 are already loaded from the JSONL file
+                writer.writerow(dict(tx, transaction_id=f"tx_load_{i}", authorized_date="",
+                                     pending="false", account_name="History", account_type="depository"))
+
+        out = StringIO()
+        call_command('load_transactions', self.write('.jsonl', write_jsonl), self.write('.csv', write_csv),
+                     '--chunk-size', '2', stdout=out)
+
+        self.assertEqual(Transaction.objects.filter(account__account_id='acc_load').count(), 8)
+        self.assertEqual(Account.objects.filter(account_id='acc_load').count(), 1)
+        self.assertEqual(Batch.objects.count(), 6)  # 3 chunks per file
+        self.assertIn("Done: 10 rows, inserted=8 duplicates=2", out.getvalue())
+
+
+@skipUnless(connection.vendor == 'postgresql', "COPY staging is PostgreSQL-specific")
+class CopyLoaderTests(TestCase):
+    def test_copy_merge_dedupes_and_drops_the_staging_table(self):
+        Account.objects.create(account_id='acc_copy', name='Copy', type='depository')
+        tx = {"account_id": "acc_copy", "amount": "-5.00", "iso_currency_code": "USD",
+              "date": "2024-01-02T10:00:00Z", "pending": False}
+        records = [
+            (1, dict(tx, transaction_id='tx_copy_1', name='First')),
+            (2, dict(tx, transaction_id='tx_copy_2', name='Tab\tand\nnewline')),
+            (3, dict(tx, transaction_id='tx_copy_1', name='Repeated')),
+        ]
+
+        loader = BulkLoader(chunk_size=10)
+        self.assertTrue(loader.use_copy)
+        loader.ingest_chunk(records)
+        loader.ingest_chunk([(4, dict(tx, transaction_id='tx_copy_2', name='Again')),
+                             (5, dict(tx, transaction_id='tx_copy_3', name='Third'))])
+
+        self.assertEqual([r.inserted for r in loader.results], [2, 1])
+        self.assertEqual(loader.owned, 3)
+        # The earliest line wins within a chunk; special characters survive COPY.
+        self.assertEqual(Transaction.objects.get(transaction_id='tx_copy_1').description, 'First')
+        self.assertEqual(Transaction.objects.get(transaction_id='tx_copy_2').description, 'Tab\tand\nnewline')
+        self.assertEqual(
+            [Batch.objects.get(pk=r.batch.pk).pending_transactions for r in loader.results], [2, 1]
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s)", [f"pg_temp.{STAGING_TABLE}"])
+            self.assertIsNone(cursor.fetchone()[0])
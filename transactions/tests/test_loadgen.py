@@ -0,0 +1,146 @@
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import LiveServerTestCase, SimpleTestCase
+
+from transactions.enrichment import SimulatedEnrichmentClient
+from transactions.loadgen import (
+    LATE_TOLERANCE,
+    PayloadFactory,
+    enrichment_lag,
+    latency_summary,
+    parse_batch_size,
+    run_load,
+    summarize,
+    wait_for_batches,
+)
+from transactions.models import Batch, Transaction
+from transactions.tasks import process_batch_enrichment
+
+
+class LoadGenTests(SimpleTestCase):
+    def test_batch_size_specs(self):
+        rng = mock.Mock(choice=lambda sizes: list(sizes))
+        self.assertEqual(parse_batch_size('12')(rng), [12])
+        self.assertEqual(parse_batch_size('3-5')(rng), [3, 4, 5])
+        self.assertEqual(parse_batch_size('10,100')(rng), [10, 100])
+        for spec in ('0', '5-3', 'x', '10,-1'):
+            with self.assertRaises(ValueError):
+                parse_batch_size(spec)
+
+    def test_payloads_reuse_ids_at_the_duplicate_ratio(self):
+        factory = PayloadFactory(parse_batch_size('100'), accounts=3, duplicate_ratio=0.25, seed=7)
+        payloads = [factory() for _ in range(20)]
+        ids = [tx['transaction_id'] for payload in payloads for tx in payload['transactions']]
+        self.assertEqual(len(ids) - len(set(ids)), factory.duplicates)
+        self.assertAlmostEqual(factory.duplicates / 1900, 0.25, delta=0.05)
+        for payload in payloads:
+            declared = {account['account_id'] for account in payload['accounts']}
+            self.assertEqual(declared, {tx['account_id'] for tx in payload['transactions']})
+            self.assertLessEqual(len(declared), 3)
+
+    def test_concurrency_rate_and_errors(self):
+        in_flight, peak, lock = [0], [0], threading.Lock()
+
+        def send(payload):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.02)
+            with lock:
+                in_flight[0] -= 1
+            if payload['n'] == 3:
+                raise ConnectionError("refused")
+            return (202, {"batch_id": f"b{payload['n']}"}) if payload['n'] % 2 else (500, None)
+
+        for mode in ('threads', 'asyncio'):
+            peak[0] = 0
+            payloads = ({"n": n, "transactions": [{}] * 10} for n in range(20))
+            results, elapsed = run_load(send, payloads, total=12, concurrency=3, rate=100, mode=mode)
+            self.assertEqual(len(results), 12)
+            self.assertLessEqual(peak[0], 3)
+            # 12 requests at 100/s: the last one is not due before 110ms.
+            self.assertGreaterEqual(elapsed, 0.11)
+
+            summary = summarize(results, elapsed)
+            self.assertEqual(summary['accepted'], 5)
+            self.assertEqual(summary['errors'], {500: 6, 'ConnectionError': 1})
+            self.assertEqual(sorted(r.batch_id for r in results if r.batch_id), ['b1', 'b11', 'b5', 'b7', 'b9'])
+
+    def test_sends_behind_schedule_are_reported_late(self):
+        def send(payload):
+            time.sleep(0.03)
+            return 202, {"batch_id": "b"}
+
+        # One worker cannot keep up with 100/s when every request takes 30ms.
+        results, elapsed = run_load(send, ({"transactions": []} for _ in range(4)), total=4, rate=100)
+        summary = summarize(results, elapsed)
+        self.assertLess(results[0].send_lag, LATE_TOLERANCE)
+        self.assertEqual(summary['late_requests'], 3)
+        self.assertGreaterEqual(summary['max_send_lag_sec'], 0.05)
+
+        # Without a target rate nothing is due, so nothing is late.
+        results, elapsed = run_load(send, ({"transactions": []} for _ in range(2)), total=2)
+        self.assertEqual(summarize(results, elapsed)['late_requests'], 0)
+
+    def test_latency_summary_uses_nearest_rank(self):
+        summary = latency_summary([i / 100 for i in range(100, 0, -1)])
+        self.assertEqual((summary['p50'], summary['p95'], summary['p99'], summary['max']), (0.5, 0.95, 0.99, 1.0))
+
+    def test_wait_for_batches_stops_when_all_finished(self):
+        polls = {"a": 0, "b": 0}
+
+        def get_progress(batch_id):
+            polls[batch_id] += 1
+            finished = batch_id == "a" or polls[batch_id] >= 3
+            return {
+                "finished": finished,
+                "created_at": "2024-01-01T00:00:00+00:00",
+                "finished_at": "2024-01-01T00:00:02.500000+00:00" if finished else None,
+            }
+
+        progress = wait_for_batches(get_progress, ["a", "b"], interval=0, timeout=5)
+        self.assertEqual(polls, {"a": 1, "b": 3})
+        self.assertEqual([enrichment_lag(progress[batch_id]) for batch_id in "ab"], [2.5, 2.5])
+
+
+class SimulateIntegrationCommandTests(LiveServerTestCase):
+    def run_command(self, *args):
+        out = io.StringIO()
+        with mock.patch.object(process_batch_enrichment, 'apply_async') as dispatch:
+            # Enrich synchronously inside the request so polling sees finished batches.
+            dispatch.side_effect = lambda args, kwargs, headers: process_batch_enrichment.apply(args, kwargs)
+            with mock.patch.object(SimulatedEnrichmentClient, 'latency', (0, 0)):
+                call_command('simulate_integration', '--base-url', self.live_server_url, '--poll-interval', '0.05',
+                             *args, stdout=out)
+        return out.getvalue()
+
+    def test_load_run_reports_throughput_latency_and_lag(self):
+        # One worker: enrichment runs inside the request, and SQLite serializes writers.
+        output = self.run_command('--requests', '4', '--batch-size', '5', '--accounts', '2',
+                                  '--duplicate-ratio', '0.5', '--seed', '1', '--poll-timeout', '10')
+        self.assertIn("requests=4 accepted=4", output)
+        self.assertIn("errors none", output)
+        self.assertRegex(output, r"latency p50=[\d.]+ms p95=[\d.]+ms p99=[\d.]+ms")
+        self.assertIn("batches finished=4", output)
+        self.assertIn("enrichment lag p50=", output)
+        self.assertEqual(Batch.objects.count(), 4)
+        # Duplicate transaction_ids were accepted once.
+        self.assertLess(Transaction.objects.count(), 20)
+
+    def test_replay_posts_every_recorded_payload(self):
+        factory = PayloadFactory(parse_batch_size('3'))
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as f:
+            for _ in range(3):
+                f.write(json.dumps(factory()) + "\n")
+        self.addCleanup(os.unlink, f.name)
+
+        output = self.run_command('--replay', f.name, '--mode', 'asyncio', '--no-poll')
+        self.assertIn("requests=3 accepted=3", output)
+        self.assertEqual(Transaction.objects.count(), 9)
@@ -0,0 +1,93 @@
+import datetime
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from prometheus_client import REGISTRY
+from rest_framework.test import APIClient
+
+from transactions import metrics
+from transactions.enrichment import SimulatedEnrichmentClient
+from transactions.tasks import process_batch_enrichment
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        self.payload = {
+            "accounts": [{"account_id": "acc_m", "name": "A", "type": "depository"}],
+            "transactions": [
+                {"transaction_id": f"tx_m{i}", "account_id": "acc_m", "amount": -5.0,
+                 "iso_currency_code": "USD", "date": now, "merchant_name": merchant, "pending": False}
+                for i, merchant in enumerate(['Uber', 'Starbucks', 'Uber'])
+            ],
+            "total_transactions": 3,
+        }
+
+    def test_ingest_enrichment_and_task_metrics(self):
+        task = process_batch_enrichment.name
+        before = {
+            'rows': sample('lucro_ingest_batch_rows_sum', endpoint='batch'),
+            'ingest': sample('lucro_ingest_duration_seconds_count', endpoint='batch'),
+            'writes': sample('lucro_ingest_db_write_seconds_count', endpoint='batch'),
+            'calls': sample('lucro_enrichment_stage_seconds_count', stage='external_call'),
+            'claims': sample('lucro_enrichment_stage_seconds_count', stage='claim'),
+            'lookups': sum(
+                sample('lucro_categorization_lookups_total', categorizer='rule_based', tier=tier)
+                for tier in ('local', 'shared', 'computed')
+            ),
+            'tasks': sample('lucro_task_duration_seconds_count', task=task, outcome='success'),
+        }
+
+        with mock.patch('transactions.tasks.process_batch_enrichment.apply_async'):
+            response = self.client.post(reverse('ingest-transactions'), self.payload, format='json')
+        with mock.patch.object(SimulatedEnrichmentClient, 'latency', (0, 0)):
+            process_batch_enrichment.apply(args=[response.data['batch_id']])
+
+        self.assertEqual(sample('lucro_ingest_batch_rows_sum', endpoint='batch') - before['rows'], 3)
+        self.assertEqual(sample('lucro_ingest_duration_seconds_count', endpoint='batch') - before['ingest'], 1)
+        self.assertEqual(sample('lucro_ingest_db_write_seconds_count', endpoint='batch') - before['writes'], 1)
+        self.assertEqual(sample('lucro_enrichment_stage_seconds_count', stage='external_call') - before['calls'], 3)
+        self.assertEqual(sample('lucro_enrichment_stage_seconds_count', stage='claim') - before['claims'], 1)
+        lookups = sum(
+            sample('lucro_categorization_lookups_total', categorizer='rule_based', tier=tier)
+            for tier in ('local', 'shared', 'computed')
+        )
+        self.assertEqual(lookups - before['lookups'], 3)
+        self.assertEqual(
+            sample('lucro_task_duration_seconds_count', task=task, outcome='success') - before['tasks'], 1
+        )
+
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn('lucro_ingest_duration_seconds_bucket{endpoint="batch",le="0.5"}', body)
+        self.assertIn('lucro_enrichment_stage_seconds_count{stage="flush"}', body)
+
+
+class MultiProcessMetricsTests(SimpleTestCase):
+    def test_samples_from_every_process_are_merged(self):
+        with tempfile.TemporaryDirectory() as directory:
+            env = {**os.environ, metrics.MULTIPROC_DIR_ENV: directory}
+            for rows in (10, 20):
+                subprocess.run(
+                    [sys.executable, '-c',
+                     f"from transactions import metrics; metrics.INGEST_ROWS.labels('stream').observe({rows})"],
+                    cwd=settings.BASE_DIR, env=env, check=True,
+                )
+            with mock.patch.dict(os.environ, {metrics.MULTIPROC_DIR_ENV: directory}):
+                body, _ = metrics.exposition()
+        body = body.decode()
+        self.assertIn('lucro_ingest_batch_rows_count{endpoint="stream"} 2.0', body)
+        self.assertIn('lucro_ingest_batch_rows_sum{endpoint="stream"} 30.0', body)
@@ -0,0 +1,247 @@
+import glob
+import io
+import json
+import logging
+import os
+import pstats
+import shutil
+import sys
+import tempfile
+import threading
+import uuid
+from unittest import mock
+
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from middleware import logging_formatters
+from middleware.logging_formatters import JsonFormatter
+from middleware.logging_handlers import QueueStreamHandler
+from middleware.observability import ObservabilityMiddleware
+from project.settings import correlation_id_var
+from transactions import health
+from transactions.enrichment import SimulatedEnrichmentClient
+from transactions.tasks import finalize_batch_enrichment, process_batch_enrichment
+
+
+class ObservabilityMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def run_request(self, request, status=200):
+        def view(request):
+            # The body must still be unread when the view gets the request.
+            self.assertFalse(hasattr(request, '_body'))
+            return HttpResponse(b'x' * 5, status=status)
+        return ObservabilityMiddleware(view)(request)
+
+    def test_logs_sizes_without_reading_body(self):
+        request = self.factory.post('/api/integrations/transactions/', data=b'{"a": 1}',
+                                    content_type='application/json', HTTP_X_CORRELATION_ID='cid-1')
+        with self.assertLogs('observability.http', 'INFO') as logs:
+            response = self.run_request(request)
+        self.assertEqual(response['X-Correlation-ID'], 'cid-1')
+        started, completed = logs.records
+        self.assertEqual(started.request_bytes, 8)
+        self.assertEqual((completed.status_code, completed.response_bytes), (200, 5))
+        self.assertEqual(completed.correlation_id, 'cid-1')
+
+    @override_settings(HTTP_LOG_SAMPLE_RATE=1.0, HTTP_LOG_SAMPLE_RATES={'/api/health': 0.0, '/api/health/deep': 1.0})
+    def test_sampling_by_longest_prefix_keeps_errors(self):
+        with self.assertNoLogs('observability.http', 'INFO'):
+            self.run_request(self.factory.get('/api/health/'))
+        with self.assertLogs('observability.http', 'INFO') as logs:
+            self.run_request(self.factory.get('/api/health/'), status=503)
+        self.assertEqual([record.getMessage() for record in logs.records], ['request_completed'])
+        with self.assertLogs('observability.http', 'INFO') as logs:
+            self.run_request(self.factory.get('/api/health/deep'))
+        self.assertEqual(len(logs.records), 2)
+
+
+class QueueStreamHandlerTests(SimpleTestCase):
+    def make_logger(self, handler):
+        logger = logging.getLogger(f'tests.queue.{id(handler)}')
+        logger.propagate = False
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+        self.addCleanup(handler.close)
+        return logger
+
+    def test_listener_thread_formats_and_writes(self):
+        stream = io.StringIO()
+        handler = QueueStreamHandler(stream=stream)
+        handler.setFormatter(logging.Formatter('%(message)s %(correlation_id)s %(threadName)s'))
+        logger = self.make_logger(handler)
+
+        logger.warning("hello %s", "world", extra={"correlation_id": "cid-2"})
+        handler.stop()
+        self.assertEqual(stream.getvalue(), f"hello world cid-2 {threading.current_thread().name}\n")
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        blocked = threading.Event()
+
+        class SlowStream(io.StringIO):
+            def write(self, text):
+                blocked.wait(5)
+                return super().write(text)
+
+        handler = QueueStreamHandler(stream=SlowStream(), maxsize=2)
+        logger = self.make_logger(handler)
+        for i in range(10):
+            logger.warning("record %d", i)
+        self.assertGreaterEqual(handler.dropped, 7)
+        blocked.set()
+
+
+class JsonFormatterTests(SimpleTestCase):
+    def record(self, message, **extra):
+        record = logging.LogRecord('observability.http', logging.INFO, __file__, 1, message, (), None)
+        record.__dict__.update(extra)
+        return record
+
+    def test_schema_fields_and_escaping(self):
+        formatter = JsonFormatter(fields=['method', 'status_code'], static={'type': 'http'})
+        line = formatter.format(self.record('said "hi"\nbye', method='GET', correlation_id='cid-3', other=1))
+        body = json.loads(line)
+        self.assertEqual(list(body)[:6], ['timestamp', 'level', 'logger', 'message', 'correlation_id', 'type'])
+        self.assertEqual(body['message'], 'said "hi"\nbye')
+        self.assertEqual((body['method'], body['status_code']), ('GET', None))
+        self.assertEqual(body['correlation_id'], 'cid-3')
+        self.assertNotIn('other', body)
+        self.assertRegex(body['timestamp'], r'^\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d\.\d{3}Z$')
+
+    def test_extra_fields_exceptions_and_stdlib_encoder(self):
+        formatter = JsonFormatter(include_extra=True)
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            record = logging.LogRecord('app', logging.ERROR, __file__, 1, 'failed %s', ('x',), sys.exc_info())
+        record.batch_id = 'b-1'
+        with mock.patch.object(logging_formatters, 'orjson', None):
+            body = json.loads(formatter.format(record))
+        self.assertEqual((body['message'], body['batch_id']), ('failed x', 'b-1'))
+        self.assertIn('ValueError: boom', body['exc_info'])
+
+    def test_correlation_id_from_context_survives_the_queue(self):
+        stream = io.StringIO()
+        handler = QueueStreamHandler(stream=stream)
+        handler.setFormatter(JsonFormatter())
+        logger = logging.getLogger('tests.queue.json')
+        logger.propagate = False
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+
+        token = correlation_id_var.set('cid-ctx')
+        try:
+            logger.warning("in request")
+        finally:
+            correlation_id_var.reset(token)
+        handler.close()
+        self.assertEqual(json.loads(stream.getvalue())['correlation_id'], 'cid-ctx')
+
+
+class TaskCorrelationTests(TestCase):
+    def test_task_log_lines_join_the_request(self):
+        payload = {
+            "accounts": [{"account_id": "acc_log", "name": "A", "type": "depository"}],
+            "transactions": [{
+                "transaction_id": "tx_log", "account_id": "acc_log", "amount": -5.00,
+                "iso_currency_code": "USD", "date": "2025-01-15T10:00:00Z",
+                "name": "Uber", "merchant_name": "Uber", "pending": False,
+            }],
+            "total_transactions": 1,
+        }
+        with mock.patch.object(process_batch_enrichment, 'apply_async') as dispatch, \
+                self.assertLogs('transactions.views', 'INFO') as request_logs:
+            APIClient().post(reverse('ingest-transactions'), payload, format='json', HTTP_X_CORRELATION_ID='cid-log')
+        sent = dispatch.call_args.kwargs
+        # A worker sees the message header even when the kwarg is not passed through.
+        kwargs = {name: value for name, value in sent['kwargs'].items() if name != 'correlation_id'}
+        with mock.patch.object(SimulatedEnrichmentClient, 'latency', (0, 0)), \
+                self.assertLogs('observability.tasks', 'INFO') as task_logs:
+            process_batch_enrichment.apply(sent['args'], kwargs, headers=sent['headers'])
+
+        dispatched, = [record for record in request_logs.records if record.msg == 'dispatching_enrichment_task']
+        self.assertEqual(dispatched.correlation_id, 'cid-log')
+        self.assertTrue(task_logs.records)
+        self.assertEqual({record.correlation_id for record in task_logs.records}, {'cid-log'})
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def reports(self, correlation_id):
+        directory = os.path.join(self.directory, correlation_id)
+        names = sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+        return [json.load(open(os.path.join(directory, name))) for name in names if name.endswith('.json')]
+
+    def test_token_header_profiles_request_with_query_log(self):
+        url = reverse('batch-progress', args=[uuid.uuid4()])
+        with override_settings(PROFILING_TOKEN='s3cret', PROFILING_DIR=self.directory):
+            client = APIClient()
+            client.get(url, HTTP_X_CORRELATION_ID='cid-p1', HTTP_X_PROFILE_TOKEN='wrong')
+            self.assertEqual(self.reports('cid-p1'), [])
+            response = client.get(url, HTTP_X_CORRELATION_ID='../cid-p2', HTTP_X_PROFILE_TOKEN='s3cret')
+        self.assertEqual(response.status_code, 404)
+
+        report, = self.reports('_cid-p2')
+        self.assertEqual((report['kind'], report['target']), ('request', f'GET {url}'))
+        self.assertEqual(report['query_count'], 1)
+        self.assertIn('transactions_batch', report['queries'][0]['sql'])
+        self.assertTrue(report['top_functions'])
+        prof, = glob.glob(os.path.join(self.directory, '_cid-p2', '*.prof'))
+        self.assertGreater(pstats.Stats(prof).total_calls, 0)
+
+    def test_disabled_profiling_skips_the_check(self):
+        self.addCleanup(health.reset)
+        with override_settings(PROFILING_TOKEN='', PROFILING_SAMPLE_RATE=0.0, PROFILING_DIR=self.directory), \
+                mock.patch('middleware.observability.should_profile_request') as check:
+            APIClient().get(reverse('health-check'), HTTP_X_PROFILE_TOKEN='anything')
+        check.assert_not_called()
+        self.assertEqual(os.listdir(self.directory), [])
+
+    @override_settings(PROFILING_TASK_SAMPLE_RATE=1.0)
+    def test_sampled_task_is_profiled_under_its_correlation_id(self):
+        with override_settings(PROFILING_DIR=self.directory):
+            # Unknown batch: the run fails after one query, and failed runs are profiled too.
+            finalize_batch_enrichment.apply(args=[[], str(uuid.uuid4())])
+        # Eager runs carry no correlation_id header, so the task generated one.
+        correlation_id, = os.listdir(self.directory)
+        report, = self.reports(correlation_id)
+        self.assertEqual(report['correlation_id'], correlation_id)
+        self.assertEqual((report['kind'], report['target']), ('task', finalize_batch_enrichment.name))
+        self.assertEqual(report['query_count'], 1)
+
+    @override_settings(PROFILING_TASK_SAMPLE_RATE=1.0)
+    def test_request_and_its_task_share_a_directory(self):
+        payload = {
+            "accounts": [{"account_id": "acc_prof", "name": "A", "type": "depository"}],
+            "transactions": [{
+                "transaction_id": "tx_prof", "account_id": "acc_prof", "amount": -5.00,
+                "iso_currency_code": "USD", "date": "2025-01-15T10:00:00Z",
+                "name": "Uber", "merchant_name": "Uber", "pending": False,
+            }],
+            "total_transactions": 1,
+        }
+        with override_settings(PROFILING_TOKEN='s3cret', PROFILING_DIR=self.directory), \
+                mock.patch.object(process_batch_enrichment, 'apply_async') as dispatch:
+            response = APIClient().post(reverse('ingest-transactions'), payload, format='json',
+                                        HTTP_X_CORRELATION_ID='cid-join', HTTP_X_PROFILE_TOKEN='s3cret')
+            self.assertEqual(response.status_code, 202)
+            sent = dispatch.call_args.kwargs
+            self.assertEqual(sent['headers'], {'correlation_id': 'cid-join'})
+            # Run the queued task the way a worker would, once the request is over.
+            with mock.patch.object(SimulatedEnrichmentClient, 'latency', (0, 0)):
+                process_batch_enrichment.apply(sent['args'], sent['kwargs'], headers=sent['headers'])
+
+        self.assertEqual(os.listdir(self.directory), ['cid-join'])
+        reports = self.reports('cid-join')
+        self.assertLessEqual(
+            {('request', f"POST {reverse('ingest-transactions')}"), ('task', process_batch_enrichment.name)},
+            {(report['kind'], report['target']) for report in reports},
+        )
+        self.assertEqual({report['correlation_id'] for report in reports}, {'cid-join'})
@@ -0,0 +1,428 @@
+import datetime
+import json
+import random
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from django.core.management import call_command
+from django.db import connection, transaction as db_transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from transactions.enrichment import ResultWriter, claim_transactions
+from transactions.ingestion import insert_transactions
+from transactions.models import Account, Batch, DailyAccountRollup, Transaction
+from transactions.rollups import (
+    _raw_groups,
+    _rollup_groups,
+    account_summary,
+    day_bounds,
+    raw_account_summary,
+    refresh_batch_rollups,
+)
+from transactions.tasks import process_batch_enrichment
+
+
+class DailyRollupTests(TestCase):
+    def setUp(self):
+        self.rng = random.Random(11)
+        self.account = Account.objects.create(account_id='acc_roll', name='A', type='depository')
+        self.other = Account.objects.create(account_id='acc_other', name='B', type='depository')
+        self.today = timezone.localdate()
+        self.batch = self.make_batch(self.account, days=range(0, 12), rows=60)
+        self.make_batch(self.other, days=range(0, 3), rows=10)
+
+    def make_batch(self, account, days, rows):
+        batch = Batch.objects.create(total_transactions=rows)
+        now = timezone.now()
+        for i in range(rows):
+            Transaction.objects.create(
+                transaction_id=f'tx_{account.account_id}_{i}',
+                account=account,
+                amount=Decimal(self.rng.choice([-1, 1]) * self.rng.randint(100, 90000)) / 100,
+                currency='USD',
+                date=now - datetime.timedelta(days=self.rng.choice(list(days)), hours=self.rng.randint(0, 3)),
+                merchant_name=self.rng.choice(['Uber', 'AWS', 'Starbucks', 'Corner shop']),
+                category=self.rng.choice([None, '', 'Transport', 'Software']),
+                ingestion_status=self.rng.choice(['pending', 'completed', 'failed']),
+                batch=batch,
+            )
+        refresh_batch_rollups(batch)
+        return batch
+
+    def assertParity(self):
+        for back in (0, 1, 3, 7, 11, 30):
+            start = self.today - datetime.timedelta(days=back)
+            for end in (start, self.today - datetime.timedelta(days=1), self.today):
+                if end < start:
+                    continue
+                with self.subTest(start=start, end=end):
+                    self.assertEqual(
+                        account_summary('acc_roll', start, end),
+                        raw_account_summary('acc_roll', start, end),
+                    )
+
+    def test_rollups_match_raw_aggregation(self):
+        self.assertTrue(DailyAccountRollup.objects.filter(account=self.account).exists())
+        self.assertParity()
+        summary = account_summary('acc_roll', self.today - datetime.timedelta(days=30), self.today)
+        self.assertEqual(summary['metrics']['total_transactions'], 60)
+
+    @mock.patch('transactions.enrichment.time.sleep')
+    def test_enrichment_keeps_rollups_in_sync(self, _sleep):
+        process_batch_enrichment(str(self.batch.batch_id))
+        self.assertFalse(
+            DailyAccountRollup.objects.filter(account=self.account, ingestion_status='pending').exists()
+        )
+        self.assertParity()
+
+    def test_closed_days_are_served_from_rollups(self):
+        yesterday = self.today - datetime.timedelta(days=1)
+        DailyAccountRollup.objects.filter(account=self.account, day=yesterday).delete()
+        self.assertNotEqual(
+            account_summary('acc_roll', yesterday, yesterday),
+            raw_account_summary('acc_roll', yesterday, yesterday),
+        )
+
+        call_command('rebuild_rollups', '--start', str(yesterday), '--end', str(yesterday),
+                     '--account', 'acc_roll', stdout=mock.MagicMock())
+        self.assertParity()
+
+    def test_rebuild_all_history_is_idempotent(self):
+        before = sorted(DailyAccountRollup.objects.values_list(
+            'account_id', 'day', 'category', 'ingestion_status', 'transaction_count', 'spend_total', 'income_total'
+        ))
+        call_command('rebuild_rollups', stdout=mock.MagicMock())
+        call_command('rebuild_rollups', stdout=mock.MagicMock())
+        after = sorted(DailyAccountRollup.objects.values_list(
+            'account_id', 'day', 'category', 'ingestion_status', 'transaction_count', 'spend_total', 'income_total'
+        ))
+        self.assertEqual(before, after)
+
+    @override_settings(SUMMARY_CACHE_ENABLED=False)
+    def test_summary_endpoint_uses_rollups(self):
+        start = self.today - datetime.timedelta(days=30)
+        url = reverse('account-summary', args=['acc_roll'])
+        response = APIClient().get(url, {'start_date': start.isoformat(), 'end_date': self.today.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        expected = raw_account_summary('acc_roll', start, self.today)
+        for key in ('metrics', 'top_categories', 'processing_status'):
+            self.assertEqual(response.data[key], expected[key])
+
+
+@override_settings(SUMMARY_CACHE_ENABLED=False)
+class RollupFreshnessTests(TestCase):
+    """Closed days in the summary follow ingest, claims and flushes before the batch finishes."""
+
+    def summary(self, use_rollups, start, end):
+        url = reverse('account-summary', args=['acc_fresh'])
+        with override_settings(SUMMARY_USE_ROLLUPS=use_rollups):
+            response = APIClient().get(url, {'start_date': start.isoformat(), 'end_date': end.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        return {key: response.data[key] for key in ('metrics', 'top_categories', 'processing_status')}
+
+    def assertMatchesRaw(self, start, end):
+        summary = self.summary(True, start, end)
+        self.assertEqual(summary, self.summary(False, start, end))
+        return summary['processing_status']
+
+    def test_summary_matches_raw_between_ingest_and_enrichment(self):
+        today = timezone.localdate()
+        start, yesterday = today - datetime.timedelta(days=5), today - datetime.timedelta(days=1)
+        now = timezone.now()
+        payload = {
+            "accounts": [{"account_id": "acc_fresh", "name": "Fresh", "type": "depository"}],
+            "transactions": [
+                {
+                    "transaction_id": f"tx_fresh_{i}", "account_id": "acc_fresh", "amount": f"-{i + 1}.00",
+                    "iso_currency_code": "USD", "name": "Uber", "pending": False,
+                    "date": (now - datetime.timedelta(days=1 + i % 3)).isoformat(),
+                }
+                for i in range(6)
+            ],
+            "total_transactions": 6,
+        }
+        with mock.patch.object(process_batch_enrichment, 'apply_async'), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = APIClient().post(reverse('ingest-transactions'), payload, format='json')
+        self.assertEqual(response.status_code, 202)
+        # Queued, not yet picked up by a worker.
+        self.assertEqual(self.assertMatchesRaw(start, yesterday)['pending'], 6)
+
+        batch = Batch.objects.get(batch_id=response.data['batch_id'])
+        ids = list(batch.transactions.order_by('id').values_list('id', flat=True))
+        # Rollups move inside the claim and flush transactions, not in on-commit work.
+        claimed = claim_transactions(batch, ids[:4])
+        status = self.assertMatchesRaw(start, yesterday)
+        self.assertEqual((status['pending'], status['processing']), (2, 4))
+
+        writer = ResultWriter(flush_rows=100)
+        for tx in claimed[:3]:
+            tx.category = 'Transportation'
+            tx.ingestion_status = Transaction.INGESTION_STATUS_COMPLETED
+            writer.add(tx)
+        writer.flush()
+        status = self.assertMatchesRaw(start, yesterday)
+        self.assertEqual((status['pending'], status['processing'], status['completed']), (2, 1, 3))
+
+    def ingest(self, count):
+        self.account = Account.objects.create(account_id='acc_fresh', name='Fresh', type='depository')
+        self.batch = Batch.objects.create(total_transactions=count)
+        now = timezone.now()
+        transactions = [
+            {
+                'transaction_id': f'tx_delta_{i}', 'account_id': 'acc_fresh', 'amount': Decimal(-(i + 1)),
+                'iso_currency_code': 'USD', 'name': 'Uber', 'pending': False,
+                'date': now - datetime.timedelta(days=1 + i % 2),
+            }
+            for i in range(count)
+        ]
+        with db_transaction.atomic():
+            insert_transactions(transactions, {'acc_fresh': self.account.pk}, self.batch)
+        return list(self.batch.transactions.order_by('id'))
+
+    def test_writes_apply_deltas_without_rescanning_days(self):
+        today = timezone.localdate()
+        start, yesterday = today - datetime.timedelta(days=5), today - datetime.timedelta(days=1)
+        rows = self.ingest(6)
+        claimed = claim_transactions(self.batch, [tx.id for tx in rows])
+        writer = ResultWriter(flush_rows=100)
+        for tx in claimed:
+            tx.category = 'Food' if tx.id % 2 else None
+            tx.ingestion_status = Transaction.INGESTION_STATUS_COMPLETED
+            writer.add(tx)
+        with CaptureQueriesContext(connection) as queries:
+            writer.flush()
+        # The flush touches rollups by key; nothing groups the transactions table again.
+        self.assertFalse([q['sql'] for q in queries if 'GROUP BY' in q['sql']])
+        self.assertEqual(self.assertMatchesRaw(start, yesterday)['completed'], 6)
+        before = sorted(DailyAccountRollup.objects.values_list(
+            'day', 'category', 'ingestion_status', 'transaction_count', 'spend_total', 'income_total'))
+        refresh_batch_rollups(self.batch)
+        after = sorted(DailyAccountRollup.objects.values_list(
+            'day', 'category', 'ingestion_status', 'transaction_count', 'spend_total', 'income_total'))
+        self.assertEqual(before, after)
+
+    def test_claims_do_not_bump_the_data_version_but_flushes_do(self):
+        rows = self.ingest(4)
+        version = Account.objects.get(pk=self.account.pk).data_version
+        with self.captureOnCommitCallbacks(execute=True):
+            claimed = claim_transactions(self.batch, [tx.id for tx in rows])
+        self.assertEqual(Account.objects.get(pk=self.account.pk).data_version, version)
+        writer = ResultWriter(flush_rows=100)
+        for tx in claimed:
+            tx.category = 'Transportation'
+            tx.ingestion_status = Transaction.INGESTION_STATUS_COMPLETED
+            writer.add(tx)
+        with self.captureOnCommitCallbacks(execute=True):
+            writer.flush()
+        self.assertEqual(Account.objects.get(pk=self.account.pk).data_version, version + 1)
+
+    def test_rows_lost_to_another_batch_stay_out_of_the_rollups(self):
+        account = Account.objects.create(account_id='acc_fresh', name='Fresh', type='depository')
+        winner, loser = Batch.objects.create(total_transactions=1), Batch.objects.create(total_transactions=2)
+        day = timezone.now() - datetime.timedelta(days=1)
+        transactions = [
+            {
+                'transaction_id': f'tx_race_{i}', 'account_id': 'acc_fresh', 'amount': Decimal('-5.00'),
+                'iso_currency_code': 'USD', 'name': 'Uber', 'pending': False, 'date': day,
+            }
+            for i in range(2)
+        ]
+        bulk_create = Transaction.objects.bulk_create
+
+        def lose_race(objs, **kwargs):
+            # Another batch commits tx_race_0 between our existence check and our INSERT.
+            Transaction.objects.create(
+                transaction_id='tx_race_0', account=account, amount=Decimal('-5.00'),
+                currency='USD', date=day, batch=winner,
+            )
+            return bulk_create(objs, **kwargs)
+
+        with mock.patch.object(Transaction.objects, 'bulk_create', side_effect=lose_race), \
+                db_transaction.atomic():
+            owned = insert_transactions(transactions, {'acc_fresh': account.pk}, loser)
+        self.assertEqual(owned, 1)
+        # The winner's row was created directly, so only our one row is in the rollups.
+        self.assertEqual(
+            list(DailyAccountRollup.objects.values_list('transaction_count', 'spend_total')),
+            [(1, Decimal('-5.00'))],
+        )
+
+
+class SummaryQueryTests(TestCase):
+    def setUp(self):
+        self.account = Account.objects.create(
+            account_id='acc_ny', name='A', type='depository', timezone='America/New_York'
+        )
+        batch = Batch.objects.create(total_transactions=2)
+        for i, moment in enumerate(['2025-01-02T03:00:00Z', '2025-01-02T06:00:00Z']):
+            Transaction.objects.create(
+                transaction_id=f'tx_ny{i}', account=self.account, amount=Decimal('-10.00'), currency='USD',
+                date=datetime.datetime.fromisoformat(moment.replace('Z', '+00:00')), category='Food', batch=batch,
+            )
+        refresh_batch_rollups(batch)
+
+    def test_days_follow_the_account_timezone(self):
+        self.assertEqual(
+            sorted(DailyAccountRollup.objects.values_list('day', 'transaction_count')),
+            [(datetime.date(2025, 1, 1), 1), (datetime.date(2025, 1, 2), 1)],
+        )
+        for summarize in (account_summary, raw_account_summary):
+            with self.subTest(summarize=summarize.__name__):
+                new_years_eve = summarize('acc_ny', datetime.date(2025, 1, 1), datetime.date(2025, 1, 1))
+                self.assertEqual(new_years_eve['metrics']['total_transactions'], 1)
+
+    def test_summary_is_one_round_trip_on_raw_timestamps(self):
+        today = timezone.localdate()
+        with CaptureQueriesContext(connection) as queries:
+            summary = account_summary('acc_ny', datetime.date(2024, 12, 1), today)
+        self.assertEqual(summary['metrics']['total_transactions'], 2)
+        # The account lookup, then rollups and today's raw rows in one UNION ALL query.
+        self.assertEqual(len(queries), 2)
+        self.assertIn('UNION ALL', queries[1]['sql'])
+        # No per-row date conversion of the timestamp column (SQLite and PostgreSQL spellings).
+        self.assertNotIn('cast_date', queries[1]['sql'])
+        self.assertNotIn('AT TIME ZONE', queries[1]['sql'])
+
+
+@skipUnless(connection.vendor == 'postgresql', "EXPLAIN plans are PostgreSQL-specific")
+class SummaryQueryPlanTests(TestCase):
+    def explain(self, queryset):
+        with connection.cursor() as cursor:
+            # Test tables are tiny; make the planner cost them like production-sized ones.
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('SET LOCAL enable_bitmapscan = off')
+        return queryset.explain()
+
+    def test_raw_range_is_index_only_scan(self):
+        lower, upper = day_bounds(datetime.date(2025, 1, 1), datetime.date(2025, 1, 31), datetime.timezone.utc)
+        plan = self.explain(_raw_groups(1, lower, upper))
+        self.assertIn('Index Only Scan using tx_account_date_cover_idx', plan)
+
+    def test_rollup_range_is_index_only_scan(self):
+        plan = self.explain(_rollup_groups(1, datetime.date(2025, 1, 1), datetime.date(2025, 1, 31)))
+        self.assertIn('Index Only Scan using unique_daily_account_rollup', plan)
+
+
+@override_settings(SUMMARY_CACHE_ENABLED=False)
+class PortfolioSummaryTests(TestCase):
+    def setUp(self):
+        self.rng = random.Random(5)
+        self.account_ids = [f'acc_p{i}' for i in range(6)]
+        batch = Batch.objects.create(total_transactions=0)
+        now = timezone.now()
+        for i, account_id in enumerate(self.account_ids):
+            account = Account.objects.create(
+                account_id=account_id, name='A', type='depository',
+                timezone=['UTC', 'America/New_York', 'Asia/Tokyo'][i % 3],
+            )
+            for j in range(8):
+                Transaction.objects.create(
+                    transaction_id=f'tx_{account_id}_{j}', account=account,
+                    amount=Decimal(self.rng.choice([-1, 1]) * self.rng.randint(100, 50000)) / 100, currency='USD',
+                    date=now - datetime.timedelta(days=self.rng.randint(0, 5), hours=self.rng.randint(0, 20)),
+                    category=self.rng.choice([None, 'Food', 'Software', 'Transport']),
+                    ingestion_status=self.rng.choice(['pending', 'completed']), batch=batch,
+                )
+        refresh_batch_rollups(batch)
+        self.start = timezone.localdate() - datetime.timedelta(days=4)
+        self.end = timezone.localdate() + datetime.timedelta(days=1)
+
+    def test_matches_single_account_summaries_in_constant_queries(self):
+        url = reverse('portfolio-summary')
+        requested = self.account_ids[:4] + ['acc_unknown'] + self.account_ids[4:]
+        # Repeated and comma-separated account_ids are both accepted.
+        query = (
+            f"account_ids={','.join(requested[:3])}&account_ids={','.join(requested[3:])}"
+            f"&start_date={self.start}&end_date={self.end}"
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().get(f"{url}?{query}")
+        self.assertEqual(response.status_code, 200)
+        # Account lookup plus one UNION ALL of rollup and raw groups, for any number of accounts.
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(response.data['unknown_account_ids'], ['acc_unknown'])
+        self.assertEqual([a['account_id'] for a in response.data['accounts']], self.account_ids)
+
+        total = 0
+        for entry in response.data['accounts']:
+            expected = raw_account_summary(entry['account_id'], self.start, self.end)
+            self.assertEqual({k: entry[k] for k in expected}, expected)
+            total += expected['metrics']['total_transactions']
+        self.assertGreater(total, 0)
+        self.assertEqual(response.data['totals']['metrics']['total_transactions'], total)
+
+        not_modified = APIClient().get(f"{url}?{query}", headers={'If-None-Match': response['ETag']})
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_requires_account_ids(self):
+        response = APIClient().get(reverse('portfolio-summary'), {
+            'start_date': self.start.isoformat(), 'end_date': self.end.isoformat(),
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('account_ids', response.data)
+
+
+class AccountSeriesTests(TestCase):
+    def setUp(self):
+        self.account = Account.objects.create(account_id='acc_series', name='A', type='depository')
+        self.batch = Batch.objects.create(total_transactions=0)
+        self.today = timezone.localdate()
+        now = timezone.now()
+        rows = [(0, '-10.00', 'Food'), (0, '25.00', None), (1, '-5.00', 'Food'), (1, '-7.50', 'Software'),
+                (9, '-3.00', 'Food'), (40, '100.00', None)]
+        for i, (days_ago, amount, category) in enumerate(rows):
+            Transaction.objects.create(
+                transaction_id=f'tx_s{i}', account=self.account, amount=Decimal(amount), currency='USD',
+                date=now - datetime.timedelta(days=days_ago), category=category, batch=self.batch,
+            )
+        refresh_batch_rollups(self.batch)
+        self.start = self.today - datetime.timedelta(days=60)
+
+    def fetch(self, **params):
+        response = APIClient().get(reverse('account-series', args=['acc_series']), {
+            'start_date': self.start.isoformat(), 'end_date': self.today.isoformat(), **params,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return json.loads(b''.join(response.streaming_content))
+
+    def expected(self, interval, by_category=False):
+        """Bucket raw rows in Python as the reference."""
+        buckets = {}
+        for tx in Transaction.objects.filter(account=self.account):
+            day = timezone.localtime(tx.date).date()
+            if interval == 'week':
+                day -= datetime.timedelta(days=day.weekday())
+            elif interval == 'month':
+                day = day.replace(day=1)
+            key = (day, tx.category or None) if by_category else (day,)
+            count, spend, income = buckets.get(key, (0, Decimal(0), Decimal(0)))
+            buckets[key] = (count + 1, spend + min(tx.amount, 0), income + max(tx.amount, 0))
+        points = []
+        for key in sorted(buckets, key=lambda k: (k[0], k[1] or '') if by_category else k):
+            count, spend, income = buckets[key]
+            point = {'period_start': key[0].isoformat()}
+            if by_category:
+                point['category'] = key[1]
+            point.update({'count': count, 'spend': float(abs(spend)), 'income': float(income),
+                          'net': float(spend + income)})
+            points.append(point)
+        return points
+
+    def test_series_matches_raw_bucketing(self):
+        for interval in ('day', 'week', 'month'):
+            for by_category in (False, True):
+                with self.subTest(interval=interval, by_category=by_category):
+                    body = self.fetch(interval=interval, by_category=str(by_category).lower())
+                    self.assertEqual(body['series'], self.expected(interval, by_category))
+
+    def test_rejects_unknown_interval(self):
+        response = APIClient().get(reverse('account-series', args=['acc_series']), {
+            'start_date': self.start.isoformat(), 'end_date': self.today.isoformat(), 'interval': 'hour',
+        })
+        self.assertEqual(response.status_code, 400)
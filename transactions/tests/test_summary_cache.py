@@ -0,0 +1,105 @@
+import datetime
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from prometheus_client import REGISTRY
+from rest_framework.test import APIClient
+
+from transactions.models import Account, Batch, Transaction
+from transactions.summary_cache import summary_cache
+from transactions.tasks import process_batch_enrichment
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                       'LOCATION': 'summary-cache-tests'}})
+class SummaryCacheTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.client = APIClient()
+        self.account = Account.objects.create(account_id='acc_sc', name='A', type='depository')
+        self.batch = Batch.objects.create(total_transactions=1)
+        Transaction.objects.create(
+            transaction_id='tx_sc0', account=self.account, amount=Decimal('-20.00'), currency='USD',
+            date=timezone.now(), merchant_name='Uber', batch=self.batch,
+        )
+        today = timezone.localdate()
+        self.url = reverse('account-summary', args=['acc_sc'])
+        self.params = {'start_date': (today - datetime.timedelta(days=7)).isoformat(), 'end_date': today.isoformat()}
+
+    def get(self, **headers):
+        return self.client.get(self.url, self.params, headers=headers)
+
+    def lookups(self):
+        return {
+            result: REGISTRY.get_sample_value('lucro_summary_cache_lookups_total', {'result': result}) or 0
+            for result in ('hit', 'miss', 'not_modified')
+        }
+
+    def test_hit_after_miss_and_not_modified(self):
+        stats = summary_cache.stats()
+        counted = self.lookups()
+        first = self.get()
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertTrue(first['ETag'].startswith('W/"'))
+
+        second = self.get()
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second.data['metrics'], first.data['metrics'])
+
+        # A conditional request costs only the account lookup.
+        with self.assertNumQueries(1):
+            not_modified = self.get(if_none_match=first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], first['ETag'])
+
+        after = summary_cache.stats()
+        self.assertEqual(after['hits'] - stats['hits'], 1)
+        self.assertEqual(after['misses'] - stats['misses'], 1)
+        self.assertEqual(after['not_modified'] - stats['not_modified'], 1)
+        # The same counts are exported to Prometheus, across every worker process.
+        self.assertEqual(
+            {result: count - counted[result] for result, count in self.lookups().items()},
+            {'hit': 1, 'miss': 1, 'not_modified': 1},
+        )
+
+    def test_ingestion_and_enrichment_invalidate(self):
+        first = self.get()
+        payload = {
+            "accounts": [{"account_id": "acc_sc", "name": "A", "type": "depository"}],
+            "transactions": [{
+                "transaction_id": "tx_sc1", "account_id": "acc_sc", "amount": -5.00,
+                "iso_currency_code": "USD", "date": timezone.now().isoformat(),
+                "name": "Starbucks", "merchant_name": "Starbucks", "pending": False,
+            }],
+            "total_transactions": 1,
+        }
+        with mock.patch('transactions.tasks.process_batch_enrichment.apply_async'), \
+                self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(self.client.post(reverse('ingest-transactions'), payload, format='json').status_code, 202)
+        # The version moves once the write has committed, not inside its transaction.
+        self.assertEqual(self.get(if_none_match=first['ETag']).status_code, 304)
+        for callback in callbacks:
+            callback()
+
+        after_ingest = self.get(if_none_match=first['ETag'])
+        self.assertEqual(after_ingest.status_code, 200)
+        self.assertEqual(after_ingest['X-Cache'], 'MISS')
+        self.assertEqual(after_ingest.data['metrics']['total_transactions'], 2)
+        self.assertEqual(after_ingest.data['processing_status']['pending'], 2)
+
+        with mock.patch('transactions.enrichment.time.sleep'), self.captureOnCommitCallbacks(execute=True):
+            process_batch_enrichment(str(self.batch.batch_id))
+        after_enrichment = self.get(if_none_match=after_ingest['ETag'])
+        self.assertEqual(after_enrichment.status_code, 200)
+        self.assertEqual(after_enrichment.data['processing_status']['completed'], 1)
+
+    def test_unknown_account_is_not_cached(self):
+        response = self.client.get(reverse('account-summary', args=['acc_missing']), self.params)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+        self.assertEqual(response.data['metrics']['total_transactions'], 0)
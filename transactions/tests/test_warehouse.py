@@ -0,0 +1,119 @@
+import datetime
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from decimal import Decimal
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from transactions import warehouse
+from transactions.models import Account, Batch, Transaction
+from transactions.warehouse import export_snapshot, pa, pq, read_watermark
+
+
+@unittest.skipUnless(pa is not None, "pyarrow is not installed")
+@override_settings(WAREHOUSE_EXPORT_OVERLAP_SECONDS=0)
+class WarehouseExportTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.batch = Batch.objects.create(total_transactions=4)
+        self.account = Account.objects.create(account_id='acc/wh', name='A', type='depository')
+        self.other = Account.objects.create(account_id='acc_wh2', name='B', type='credit')
+        self.add('tx_wh0', self.account, datetime.datetime(2026, 1, 31, 23, 0), category='Food')
+        self.add('tx_wh1', self.account, datetime.datetime(2026, 2, 1, 1, 0))
+        self.add('tx_wh2', self.account, datetime.datetime(2026, 2, 10, 12, 0), category='Food')
+        self.add('tx_wh3', self.other, datetime.datetime(2026, 2, 3, 9, 0), category='Travel')
+        an_hour_ago = timezone.now() - datetime.timedelta(hours=1)
+        Transaction.objects.update(updated_at=an_hour_ago)
+        Account.objects.update(updated_at=an_hour_ago)
+
+    def add(self, transaction_id, account, date, category=None):
+        return Transaction.objects.create(
+            transaction_id=transaction_id, account=account, amount=Decimal('-12.34'), currency='USD',
+            date=date.replace(tzinfo=datetime.timezone.utc), category=category, batch=self.batch,
+        )
+
+    def read(self, *parts):
+        return pq.read_table(os.path.join(self.root, *parts))
+
+    def test_full_export_partitions_and_types(self):
+        # Tiny chunks: partitions span several record batches and fetches.
+        result = export_snapshot(self.root, chunk_size=2)
+        self.assertEqual(result['rows'], {"transactions": 4, "accounts": 2, "batches": 1})
+
+        transactions = pq.read_table(os.path.join(self.root, 'transactions'))
+        self.assertEqual(transactions.num_rows, 4)
+        partitions = sorted(
+            os.path.relpath(os.path.dirname(path), self.root) for path in result['files'] if '/transactions/' in path
+        )
+        self.assertEqual(partitions, [
+            'transactions/account=acc%2Fwh/month=2026-01',
+            'transactions/account=acc%2Fwh/month=2026-02',
+            'transactions/account=acc_wh2/month=2026-02',
+        ])
+
+        february = pq.read_table(os.path.dirname(result['files'][1]))
+        self.assertEqual(february.column('transaction_id').to_pylist(), ['tx_wh1', 'tx_wh2'])
+        for column in ('category', 'currency', 'ingestion_status'):
+            self.assertTrue(pa.types.is_dictionary(february.schema.field(column).type), column)
+        self.assertEqual(february.column('category').to_pylist(), [None, 'Food'])
+        self.assertEqual(february.column('amount').to_pylist(), [Decimal('-12.34')] * 2)
+        self.assertEqual(february.column('batch_id').to_pylist(), [str(self.batch.batch_id)] * 2)
+
+        accounts = self.read('accounts', f"part-{result['run_id']}.parquet")
+        self.assertEqual(accounts.column('account_id').to_pylist(), ['acc/wh', 'acc_wh2'])
+        self.assertEqual(read_watermark(self.root), result['watermark'])
+        self.assertFalse([name for _, _, names in os.walk(self.root) for name in names if name.endswith('.tmp')])
+
+    def test_incremental_export_writes_only_changed_rows(self):
+        first = export_snapshot(self.root)
+
+        Transaction.objects.filter(transaction_id='tx_wh2').update(category='Groceries', updated_at=timezone.now())
+        self.add('tx_wh4', self.other, datetime.datetime(2026, 3, 1, 9, 0))
+        second = export_snapshot(self.root)
+
+        self.assertEqual(second['since'], first['watermark'])
+        self.assertEqual(second['rows']['transactions'], 2)
+        self.assertEqual(second['rows']['accounts'], 0)
+        changed = pq.read_table([path for path in second['files'] if '/transactions/' in path])
+        self.assertEqual(sorted(changed.column('transaction_id').to_pylist()), ['tx_wh2', 'tx_wh4'])
+        self.assertIn('Groceries', changed.column('category').to_pylist())
+
+        # --full ignores the watermark.
+        self.assertEqual(export_snapshot(self.root, full=True)['rows']['transactions'], 5)
+
+    def test_failure_removes_files_and_keeps_watermark(self):
+        first = export_snapshot(self.root)
+        Transaction.objects.update(updated_at=timezone.now())
+        files_before = sorted(os.path.join(d, n) for d, _, names in os.walk(self.root) for n in names)
+
+        real_record_batch = warehouse.record_batch
+        calls = []
+
+        def fail_on_third(*args):
+            calls.append(1)
+            if len(calls) == 3:
+                raise OSError("disk full")
+            return real_record_batch(*args)
+
+        with mock.patch('transactions.warehouse.record_batch', side_effect=fail_on_third):
+            with self.assertRaises(OSError):
+                export_snapshot(self.root)
+
+        files_after = sorted(os.path.join(d, n) for d, _, names in os.walk(self.root) for n in names)
+        self.assertEqual(files_after, files_before)
+        self.assertEqual(read_watermark(self.root), first['watermark'])
+
+    def test_command(self):
+        stdout = io.StringIO()
+        call_command('export_warehouse', '--output', self.root, '--compression', 'snappy', stdout=stdout)
+        self.assertIn('transactions=4', stdout.getvalue())
+        stdout = io.StringIO()
+        call_command('export_warehouse', '--output', self.root, stdout=stdout)
+        self.assertIn('transactions=0', stdout.getvalue())
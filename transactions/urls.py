@@ -1,8 +1,27 @@
 from django.urls import path
-from .views import TransactionIngestAPIView, AccountSummaryAPIView, HealthCheckAPIView
+from .views import (
+    TransactionIngestAPIView,
+    TransactionStreamIngestAPIView,
+    AccountSummaryAPIView,
+    AccountSeriesAPIView,
+    PortfolioSummaryAPIView,
+    TransactionExportAPIView,
+    HealthCheckAPIView,
+    LivenessAPIView,
+    MetricsAPIView,
+    BatchProgressAPIView,
+)
 
 urlpatterns = [
     path('health/', HealthCheckAPIView.as_view(), name='health-check'),
+    path('health/live', LivenessAPIView.as_view(), name='health-live'),
+    path('health/ready', HealthCheckAPIView.as_view(), name='health-ready'),
+    path('metrics', MetricsAPIView.as_view(), name='metrics'),
     path('integrations/transactions/', TransactionIngestAPIView.as_view(), name='ingest-transactions'),
+    path('integrations/transactions/stream/', TransactionStreamIngestAPIView.as_view(), name='ingest-transactions-stream'),
+    path('batches/<uuid:batch_id>', BatchProgressAPIView.as_view(), name='batch-progress'),
     path('reports/account/<str:account_id>/summary', AccountSummaryAPIView.as_view(), name='account-summary'),
+    path('reports/account/<str:account_id>/series', AccountSeriesAPIView.as_view(), name='account-series'),
+    path('reports/portfolio/summary', PortfolioSummaryAPIView.as_view(), name='portfolio-summary'),
+    path('exports/transactions', TransactionExportAPIView.as_view(), name='export-transactions'),
 ]
@@ -1,20 +1,37 @@
+import itertools
 import logging
 import time
 import uuid
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.db import transaction as db_transaction, IntegrityError
-from django.http import JsonResponse
-from django.db import connection
-import redis
+from django.db import transaction as db_transaction
+import json
+
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.conf import settings
 from rest_framework.generics import GenericAPIView
 from rest_framework import serializers
-from django.db.models import Sum, Count, Q
+from rest_framework.exceptions import NotFound, ParseError
 
 from .serializers import IngestBatchSerializer
-from .models import Account, Transaction, Batch
-from .tasks import process_batch_enrichment
+from .fast_validation import get_validator_class
+from .ingestion import ingest_batch, StreamIngestor, StreamRecordError
+from .parsers import NDJSONParser
+from .models import Transaction, Batch
+from .progress import batch_progress
+from .export import CONTENT_TYPES, EXPORT_FORMATS, export_queryset, stream_export
+from . import health, metrics
+from .rollups import (
+    SERIES_INTERVALS,
+    account_series,
+    account_summary,
+    get_account_ref,
+    get_account_refs,
+    portfolio_summary,
+)
+from .summary_cache import etag_matches, portfolio_etag, summary_cache, summary_etag
+from .tasks import enqueue_batch_enrichment
 
 # Structured logger
 logger = logging.getLogger(__name__)
@@ -24,43 +41,38 @@ logger = logging.getLogger(__name__)
 # CORRELATION ID UTIL
 ############################
 def get_correlation_id(request):
-    return request.headers.get("X-Correlation-ID", str(uuid.uuid4()))
+    # ObservabilityMiddleware sets it (from X-Correlation-ID or new) before the view runs.
+    return getattr(request, "correlation_id", None) or request.headers.get("X-Correlation-ID", str(uuid.uuid4()))
 
 
 class HealthCheckAPIView(GenericAPIView):
+    """Readiness: the database and Redis answer (checked in parallel, cached briefly); 503 if not."""
+
     def get(self, request):
-        
-        correlation_id = get_correlation_id(request)
+        checks, cached = health.readiness()
+        healthy = all(result == "ok" for result in checks.values())
+        status_obj = {
+            "status": "ok" if healthy else "unhealthy",
+            "correlation_id": get_correlation_id(request),
+            **checks,
+            "cached": cached,
+        }
+        return JsonResponse(status_obj, status=200 if healthy else 503)
 
-        logger.info("healthcheck_requested", extra={"correlation_id": correlation_id})
 
-        status_obj = {"status": "ok", "correlation_id": correlation_id}
+class LivenessAPIView(GenericAPIView):
+    """Liveness: the process serves requests. Touches no dependency, so an outage does not restart it."""
 
-        # DB Check
-        try:
-            with connection.cursor() as cursor:
-                cursor.execute("SELECT 1;")
-        except Exception as e:
-            logger.error("database_unhealthy", extra={"error": str(e)})
-            status_obj["database"] = f"error: {str(e)}"
-            status_obj["status"] = "unhealthy"
-        else:
-            status_obj["database"] = "ok"
+    def get(self, request):
+        return JsonResponse({"status": "ok"})
 
-        # Redis Check
-        try:
-            r = redis.Redis(host="redis", port=6379, db=0)
-            r.ping()
-        except Exception as e:
-            logger.error("redis_unhealthy", extra={"error": str(e)})
-            status_obj["redis"] = f"error: {str(e)}"
-            status_obj["status"] = "unhealthy"
-        else:
-            status_obj["redis"] = "ok"
 
-        logger.info("healthcheck_response", extra=status_obj)
+class MetricsAPIView(GenericAPIView):
+    """Prometheus scrape target: every process's metrics in the text exposition format."""
 
-        return JsonResponse(status_obj)
+    def get(self, request):
+        body, content_type = metrics.exposition()
+        return HttpResponse(body, content_type=content_type)
 
 
 class TransactionIngestAPIView(APIView):
@@ -73,75 +85,44 @@ class TransactionIngestAPIView(APIView):
             "transaction_ingest_received",
             extra={
                 "correlation_id": correlation_id,
-                "payload_bytes": len(request.body or b"")
+                # Content-Length, not len(request.body): reading the body here would keep a raw copy.
+                "payload_bytes": int(request.META.get("CONTENT_LENGTH") or 0)
             }
         )
 
-        serializer = IngestBatchSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
+        with metrics.INGEST_VALIDATION_SECONDS.labels('batch').time():
+            serializer = get_validator_class(IngestBatchSerializer)(data=request.data)
+            serializer.is_valid(raise_exception=True)
         data = serializer.validated_data
+        metrics.INGEST_ROWS.labels('batch').observe(len(data['transactions']))
 
         try:
-            with db_transaction.atomic():
+            with metrics.INGEST_DB_WRITE_SECONDS.labels('batch').time(), db_transaction.atomic():
 
                 logger.info(
                     "creating_batch",
                     extra={"correlation_id": correlation_id, "transaction_count": len(data['transactions'])}
                 )
 
-                batch = Batch.objects.create(
-                    request_id=data.get('request_id'),
-                    total_transactions=len(data['transactions'])
-                )
-
-                accounts_map = {}
-                for acc in data['accounts']:
-                    account_obj, _ = Account.objects.get_or_create(
-                        account_id=acc['account_id'],
-                        defaults={
-                            'name': acc['name'],
-                            'type': acc['type'],
-                            'subtype': acc.get('subtype'),
-                            'mask': acc.get('mask'),
-                        }
-                    )
-                    accounts_map[acc['account_id']] = account_obj
-
-                transaction_objs = []
-                for tx in data['transactions']:
-                    acct = accounts_map.get(tx['account_id'])
-                    if not acct:
-                        raise IntegrityError(f"Account {tx['account_id']} missing in payload")
-
-                    tx_obj, created = Transaction.objects.get_or_create(
-                        transaction_id=tx['transaction_id'],
-                        defaults={
-                            'account': acct,
-                            'amount': tx['amount'],
-                            'currency': tx['iso_currency_code'],
-                            'date': tx['date'],
-                            'authorized_date': tx.get('authorized_date'),
-                            'merchant_name': tx.get('merchant_name') or tx.get('name'),
-                            'description': tx.get('name'),
-                            'ingestion_status': Transaction.INGESTION_STATUS_PENDING,
-                            'batch': batch
-                        }
-                    )
-                    transaction_objs.append(tx_obj)
+                result = ingest_batch(data)
+                batch = result.batch
 
             logger.info(
                 "dispatching_enrichment_task",
                 extra={"correlation_id": correlation_id, "batch_id": str(batch.batch_id)}
             )
 
-            process_batch_enrichment.delay(str(batch.batch_id))
+            enqueue_batch_enrichment(str(batch.batch_id), correlation_id)
 
             duration = round(time.time() - start_time, 3)
+            metrics.INGEST_SECONDS.labels('batch').observe(time.time() - start_time)
             logger.info(
                 "transaction_ingest_success",
                 extra={
                     "correlation_id": correlation_id,
                     "batch_id": str(batch.batch_id),
+                    "inserted": result.inserted,
+                    "duplicates": result.duplicates,
                     "duration_sec": duration
                 }
             )
@@ -150,6 +131,8 @@ class TransactionIngestAPIView(APIView):
                 {
                     "batch_id": str(batch.batch_id),
                     "total_transactions": batch.total_transactions,
+                    "inserted": result.inserted,
+                    "duplicates": result.duplicates,
                     "correlation_id": correlation_id,
                     "duration_sec": duration,
                 },
@@ -167,6 +150,112 @@ class TransactionIngestAPIView(APIView):
             )
 
 
+class TransactionStreamIngestAPIView(APIView):
+    """
+    NDJSON ingestion for very large batches.
+
+    The body is parsed line by line, validated and inserted in fixed-size chunks, and
+    each chunk is committed on its own. On a bad line the chunks already committed are
+    kept (and enriched); the response reports the offending line and what was stored.
+    """
+    parser_classes = [NDJSONParser]
+
+    def post(self, request):
+
+        start_time = time.time()
+        correlation_id = get_correlation_id(request)
+
+        logger.info(
+            "transaction_stream_received",
+            extra={
+                "correlation_id": correlation_id,
+                "payload_bytes": request.META.get("CONTENT_LENGTH"),
+            }
+        )
+
+        # An empty body is rejected before a Batch is created for it.
+        records = iter(request.data)
+        try:
+            first = next(records, None)
+        except ParseError as e:
+            return Response(
+                {"detail": {"errors": e.detail}, "correlation_id": correlation_id},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if first is None:
+            return Response(
+                {"detail": "Empty stream: expected at least one NDJSON record", "correlation_id": correlation_id},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        ingestor = StreamIngestor(request_id=request.query_params.get('request_id'))
+        error = None
+        try:
+            ingestor.consume(itertools.chain([first], records))
+        except ParseError as e:
+            error = {"errors": e.detail}
+        except StreamRecordError as e:
+            error = {"line": e.line, "errors": e.errors}
+
+        result = ingestor.result()
+        batch = result.batch
+
+        if result.inserted:
+            logger.info(
+                "dispatching_enrichment_task",
+                extra={"correlation_id": correlation_id, "batch_id": str(batch.batch_id)}
+            )
+            enqueue_batch_enrichment(str(batch.batch_id), correlation_id)
+
+        duration = round(time.time() - start_time, 3)
+        metrics.INGEST_SECONDS.labels('stream').observe(time.time() - start_time)
+        metrics.INGEST_ROWS.labels('stream').observe(result.received)
+        metrics.INGEST_VALIDATION_SECONDS.labels('stream').observe(ingestor.validation_seconds)
+        metrics.INGEST_DB_WRITE_SECONDS.labels('stream').observe(ingestor.write_seconds)
+        body = {
+            "batch_id": str(batch.batch_id),
+            "total_transactions": result.received,
+            "inserted": result.inserted,
+            "duplicates": result.duplicates,
+            "chunks": ingestor.chunks,
+            "correlation_id": correlation_id,
+            "duration_sec": duration,
+        }
+
+        if error is not None:
+            logger.warning(
+                "transaction_stream_rejected",
+                extra={"correlation_id": correlation_id, "batch_id": str(batch.batch_id), "error": str(error)}
+            )
+            return Response({**body, "detail": error}, status=status.HTTP_400_BAD_REQUEST)
+
+        logger.info(
+            "transaction_stream_success",
+            extra={
+                "correlation_id": correlation_id,
+                "batch_id": str(batch.batch_id),
+                "inserted": result.inserted,
+                "duplicates": result.duplicates,
+                "duration_sec": duration
+            }
+        )
+        return Response(body, status=status.HTTP_202_ACCEPTED)
+
+
+class BatchProgressAPIView(GenericAPIView):
+    """Status counters and timings for one ingested batch; cheap enough to poll."""
+
+    def get(self, request, batch_id):
+        try:
+            batch = Batch.objects.get(batch_id=batch_id)
+        except Batch.DoesNotExist:
+            raise NotFound("Batch not found")
+        return Response(
+            {**batch_progress(batch), "correlation_id": get_correlation_id(request)},
+            headers={"Cache-Control": "no-store"},
+        )
+
+
 class DateRangeParamsSerializer(serializers.Serializer):
     start_date = serializers.DateField()
     end_date = serializers.DateField()
@@ -188,70 +277,230 @@ class AccountSummaryAPIView(GenericAPIView):
         start = params.validated_data['start_date']
         end = params.validated_data['end_date']
 
-        qs = Transaction.objects.filter(
-            account__account_id=account_id,
-            date__date__gte=start,
-            date__date__lte=end,
+        account = get_account_ref(account_id)
+        etag = summary_etag(account, start, end) if account else None
+
+        if etag and etag_matches(request.headers.get("If-None-Match"), etag):
+            summary_cache.record_not_modified()
+            logger.info(
+                "account_summary_not_modified",
+                extra={"correlation_id": correlation_id, "account_id": account_id}
+            )
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        def compute():
+            with metrics.SUMMARY_QUERY_SECONDS.labels('account').time():
+                return account_summary(account_id, start, end, account=account)
+
+        if account:
+            summary, hit = summary_cache.get_or_compute(account, start, end, compute)
+        else:
+            summary, hit = compute(), False
+
+        duration = round(time.time() - start_time, 3)
+
+        logger.info(
+            "account_summary_response",
+            extra={
+                "correlation_id": correlation_id,
+                "account_id": account_id,
+                "duration_sec": duration,
+                "cache": "hit" if hit else "miss",
+                "total_transactions": summary['metrics']['total_transactions'],
+            }
         )
 
-        metrics = qs.aggregate(
-            total_transactions=Count('id'),
-            total_spend=Sum('amount', filter=Q(amount__lt=0)),
-            total_income=Sum('amount', filter=Q(amount__gt=0)),
+        headers = {"X-Cache": "HIT" if hit else "MISS"}
+        if etag:
+            headers["ETag"] = etag
+        return Response(
+            {
+                "account_id": account_id,
+                "date_range": {"start": start.isoformat(), "end": end.isoformat()},
+                **summary,
+                "correlation_id": correlation_id,
+                "duration_sec": duration
+            },
+            headers=headers,
         )
 
-        total_spend = metrics['total_spend'] or 0
-        total_income = metrics['total_income'] or 0
-        net = (total_spend or 0) + (total_income or 0)
 
-        top = (
-            qs
-            .filter(category__isnull=False)
-            .values('category')
-            .annotate(total_spend=Sum('amount', filter=Q(amount__lt=0)), transaction_count=Count('id'))
-            .order_by('total_spend')[:3]
+class SeriesParamsSerializer(DateRangeParamsSerializer):
+    interval = serializers.ChoiceField(choices=SERIES_INTERVALS, default='day')
+    by_category = serializers.BooleanField(default=False)
+
+
+class AccountSeriesAPIView(GenericAPIView):
+    """
+    Spend/income/net/count per day, week or month (optionally per category).
+
+    The body is streamed point by point as a JSON document, so large ranges never sit in
+    memory; a bucket's `period_start` may precede `start_date` for week/month intervals.
+    """
+
+    def get(self, request, account_id):
+        correlation_id = get_correlation_id(request)
+        params = SeriesParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        start = params.validated_data['start_date']
+        end = params.validated_data['end_date']
+        interval = params.validated_data['interval']
+        by_category = params.validated_data['by_category']
+
+        logger.info(
+            "account_series_requested",
+            extra={"correlation_id": correlation_id, "account_id": account_id, "interval": interval}
         )
 
-        status_counts = qs.values('ingestion_status').annotate(count=Count('id'))
-        status_map = {s['ingestion_status']: s['count'] for s in status_counts}
+        account = get_account_ref(account_id)
+        points = account_series(account, start, end, interval, by_category) if account else iter(())
+        header = {
+            "account_id": account_id,
+            "date_range": {"start": start.isoformat(), "end": end.isoformat()},
+            "interval": interval,
+            "by_category": by_category,
+            "correlation_id": correlation_id,
+        }
+        return StreamingHttpResponse(self._stream(header, points), content_type="application/json")
 
+    @staticmethod
+    def _stream(header, points):
+        yield json.dumps(header)[:-1] + ', "series": ['
+        for i, point in enumerate(points):
+            yield (", " if i else "") + json.dumps(point)
+        yield "]}"
+
+
+class PortfolioParamsSerializer(DateRangeParamsSerializer):
+    account_ids = serializers.ListField(
+        child=serializers.CharField(max_length=128),
+        allow_empty=False,
+        max_length=settings.PORTFOLIO_MAX_ACCOUNTS,
+    )
+
+
+class PortfolioSummaryAPIView(GenericAPIView):
+    """Per-account summaries and portfolio totals for many accounts in two queries."""
+
+    def get(self, request):
+        start_time = time.time()
+        correlation_id = get_correlation_id(request)
+
+        # account_ids may be repeated and/or comma-separated.
+        account_ids = list(dict.fromkeys(
+            account_id.strip()
+            for value in request.query_params.getlist("account_ids")
+            for account_id in value.split(",")
+            if account_id.strip()
+        ))
+        params = PortfolioParamsSerializer(data={
+            "start_date": request.query_params.get("start_date"),
+            "end_date": request.query_params.get("end_date"),
+            "account_ids": account_ids,
+        })
+        params.is_valid(raise_exception=True)
+        start = params.validated_data['start_date']
+        end = params.validated_data['end_date']
+
+        logger.info(
+            "portfolio_summary_requested",
+            extra={"correlation_id": correlation_id, "account_count": len(account_ids)}
+        )
+
+        accounts = get_account_refs(account_ids)
+        etag = portfolio_etag(account_ids, accounts, start, end)
+        if etag_matches(request.headers.get("If-None-Match"), etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        with metrics.SUMMARY_QUERY_SECONDS.labels('portfolio').time():
+            per_account, totals = portfolio_summary(accounts, start, end)
         duration = round(time.time() - start_time, 3)
 
         logger.info(
-            "account_summary_response",
+            "portfolio_summary_response",
             extra={
                 "correlation_id": correlation_id,
-                "account_id": account_id,
+                "account_count": len(accounts),
                 "duration_sec": duration,
-                "total_transactions": metrics['total_transactions'] or 0,
+                "total_transactions": totals['metrics']['total_transactions'],
             }
         )
 
         return Response(
             {
-                "account_id": account_id,
                 "date_range": {"start": start.isoformat(), "end": end.isoformat()},
-                "metrics": {
-                    "total_transactions": metrics['total_transactions'] or 0,
-                    "total_spend": float(abs(total_spend)) if total_spend else 0.0,
-                    "total_income": float(total_income) if total_income else 0.0,
-                    "net": float(net),
-                },
-                "top_categories": [
-                    {
-                        "category": t['category'],
-                        "total_spend": float(abs(t['total_spend'])) if t['total_spend'] else 0.0,
-                        "transaction_count": t['transaction_count']
-                    }
-                    for t in top
+                "accounts": [
+                    {"account_id": account_id, **per_account[account_id]}
+                    for account_id in account_ids if account_id in per_account
                 ],
-                "processing_status": {
-                    "pending": status_map.get(Transaction.INGESTION_STATUS_PENDING, 0),
-                    "processing": status_map.get(Transaction.INGESTION_STATUS_PROCESSING, 0),
-                    "completed": status_map.get(Transaction.INGESTION_STATUS_COMPLETED, 0),
-                    "failed": status_map.get(Transaction.INGESTION_STATUS_FAILED, 0),
-                },
+                "unknown_account_ids": [account_id for account_id in account_ids if account_id not in accounts],
+                "totals": totals,
                 "correlation_id": correlation_id,
                 "duration_sec": duration
+            },
+            headers={"ETag": etag},
+        )
+
+
+class ExportParamsSerializer(serializers.Serializer):
+    # Not `format`: DRF reserves that query parameter for renderer negotiation.
+    output = serializers.ChoiceField(choices=EXPORT_FORMATS, default='csv')
+    account_id = serializers.CharField(max_length=128, required=False)
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    status = serializers.ListField(
+        child=serializers.ChoiceField(choices=[choice for choice, _ in Transaction.INGESTION_STATUS_CHOICES]),
+        required=False,
+    )
+    after = serializers.IntegerField(min_value=0, required=False)
+
+    def validate(self, attrs):
+        if attrs.get('start_date') and attrs.get('end_date') and attrs['start_date'] > attrs['end_date']:
+            raise serializers.ValidationError("start_date must not be after end_date")
+        return attrs
+
+
+class TransactionExportAPIView(GenericAPIView):
+    """
+    Stream transactions as CSV or NDJSON, ordered by `cursor`.
+
+    Rows come from a server-side cursor and are written as they are read, so memory stays
+    flat however many rows match. To resume an interrupted export, repeat the request with
+    `after=<last cursor received>`.
+    """
+
+    def get(self, request):
+        correlation_id = get_correlation_id(request)
+        params = ExportParamsSerializer(data={
+            **request.query_params.dict(),
+            "status": request.query_params.getlist("status"),
+        })
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+        fmt = data['output']
+
+        logger.info(
+            "transaction_export_requested",
+            extra={
+                "correlation_id": correlation_id,
+                "account_id": data.get('account_id'),
+                "output": fmt,
+                "after": data.get('after'),
             }
         )
+
+        queryset = export_queryset(
+            account_id=data.get('account_id'),
+            start=data.get('start_date'),
+            end=data.get('end_date'),
+            statuses=data.get('status'),
+            after=data.get('after'),
+        )
+        # A resumed CSV export omits the header so the parts can be concatenated.
+        response = StreamingHttpResponse(
+            stream_export(fmt, queryset, header=data.get('after') is None),
+            content_type=CONTENT_TYPES[fmt],
+        )
+        response["Content-Disposition"] = f'attachment; filename="transactions.{fmt}"'
+        response["X-Correlation-ID"] = correlation_id
+        return response